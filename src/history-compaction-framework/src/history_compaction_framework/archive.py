@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+
+from .models import (
+    ArchivedRange,
+    ArchiveIndex,
+    ArchiveSegment,
+    CollapseState,
+    CommittedSpan,
+    TurnRecord,
+)
+from .storage import ARCHIVE_DIRNAME, _fsync_directory, rewrite_turns
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional compression backend
+    zstandard = None
+
+
+INDEX_FILENAME = "index.json"
+ZSTD_LEVEL = 10
+
+
+def archive_root(state_root: Path) -> Path:
+    return state_root / ARCHIVE_DIRNAME
+
+
+def archive_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def load_archive_index(state_root: Path) -> ArchiveIndex:
+    path = archive_root(state_root) / INDEX_FILENAME
+    if not path.exists():
+        return ArchiveIndex()
+    raw = path.read_text(encoding="utf-8").strip()
+    return ArchiveIndex.model_validate_json(raw) if raw else ArchiveIndex()
+
+
+def save_archive_index(state_root: Path, index: ArchiveIndex) -> None:
+    root = archive_root(state_root)
+    _write_atomic(root, INDEX_FILENAME, json.dumps(index.model_dump(mode="json"), indent=2).encode("utf-8"))
+
+
+def archive_collapsed_turns(
+    state_root: Path,
+    turns: Sequence[TurnRecord],
+    state: CollapseState,
+    *,
+    min_turns: int,
+) -> ArchiveSegment | None:
+    index = load_archive_index(state_root)
+    already_archived = {
+        archived.collapse_id
+        for segment in index.segments
+        for archived in segment.ranges
+    }
+    ranges = _collapsed_ranges(turns, state.committed_spans)
+
+    # Ranges already in cold storage but still hot were interrupted before the
+    # history rewrite; finishing them needs no new segment.
+    stub_ranges = [
+        (span, start, end)
+        for span, start, end in ranges
+        if span.collapse_id in already_archived
+    ]
+    new_ranges = [
+        (span, start, end)
+        for span, start, end in ranges
+        if span.collapse_id not in already_archived
+    ]
+    new_turn_count = sum(end - start + 1 for _, start, end in new_ranges)
+    if new_turn_count < max(1, min_turns):
+        new_ranges = []
+    if not new_ranges and not stub_ranges:
+        return None
+
+    segment = None
+    if new_ranges:
+        archived_turns = [
+            turn
+            for _, start, end in new_ranges
+            for turn in turns[start : end + 1]
+        ]
+        payload = "".join(turn.model_dump_json() + "\n" for turn in archived_turns).encode("utf-8")
+        codec = archive_codec()
+        segment_id = index.next_segment_id
+        filename = f"segment-{segment_id:06d}.jsonl.{'zst' if codec == 'zstd' else 'gz'}"
+        compressed = _compress(payload, codec)
+        _write_atomic(archive_root(state_root), filename, compressed)
+        segment = ArchiveSegment(
+            segment_id=segment_id,
+            filename=filename,
+            codec=codec,
+            turn_count=len(archived_turns),
+            raw_bytes=len(payload),
+            stored_bytes=len(compressed),
+            ranges=[
+                ArchivedRange(
+                    collapse_id=span.collapse_id,
+                    start_turn_id=span.start_turn_id,
+                    end_turn_id=span.end_turn_id,
+                    turn_count=end - start + 1,
+                )
+                for span, start, end in new_ranges
+            ],
+        )
+        index.segments.append(segment)
+        save_archive_index(state_root, index)
+
+    rewrite_turns(state_root, _hot_turns(turns, [*stub_ranges, *new_ranges]))
+    return segment
+
+
+def load_segment_turns(state_root: Path, segment: ArchiveSegment) -> list[TurnRecord]:
+    compressed = (archive_root(state_root) / segment.filename).read_bytes()
+    payload = _decompress(compressed, segment.codec).decode("utf-8")
+    return [
+        TurnRecord.model_validate_json(line)
+        for line in payload.splitlines()
+        if line.strip()
+    ]
+
+
+def iter_history_turns(
+    state_root: Path,
+    turns: Iterable[TurnRecord],
+    index: ArchiveIndex | None = None,
+) -> Iterator[TurnRecord]:
+    index = index or load_archive_index(state_root)
+    range_by_start = {
+        archived.start_turn_id: (segment, archived)
+        for segment in index.segments
+        for archived in segment.ranges
+    }
+    loaded_segment_id: int | None = None
+    segment_turns: list[TurnRecord] = []
+    skip_until: str | None = None
+    for turn in turns:
+        if skip_until is not None:
+            if turn.turn_id == skip_until:
+                skip_until = None
+            continue
+        located = range_by_start.get(turn.turn_id) if turn.archived else None
+        if located is None:
+            yield turn
+            continue
+        segment, archived = located
+        if segment.segment_id != loaded_segment_id:
+            segment_turns = load_segment_turns(state_root, segment)
+            loaded_segment_id = segment.segment_id
+        positions = {archived_turn.turn_id: position for position, archived_turn in enumerate(segment_turns)}
+        start = positions[archived.start_turn_id]
+        end = positions[archived.end_turn_id]
+        yield from segment_turns[start : end + 1]
+        if archived.end_turn_id != turn.turn_id:
+            skip_until = archived.end_turn_id
+
+
+def _collapsed_ranges(
+    turns: Sequence[TurnRecord],
+    committed_spans: Sequence[CommittedSpan],
+) -> list[tuple[CommittedSpan, int, int]]:
+    turn_index = {turn.turn_id: index for index, turn in enumerate(turns)}
+    ranges: list[tuple[CommittedSpan, int, int]] = []
+    for span in committed_spans:
+        start = turn_index.get(span.start_turn_id)
+        end = turn_index.get(span.end_turn_id)
+        if start is None or end is None or end < start:
+            continue
+        if all(turn.archived for turn in turns[start : end + 1]):
+            continue
+        ranges.append((span, start, end))
+    ranges.sort(key=lambda item: item[1])
+    return ranges
+
+
+def _hot_turns(
+    turns: Sequence[TurnRecord],
+    ranges: Sequence[tuple[CommittedSpan, int, int]],
+) -> list[TurnRecord]:
+    # Keep stub records at each span boundary so projection and staging still
+    # resolve the committed span without loading its raw messages.
+    boundaries: dict[int, bool] = {}
+    for _, start, end in ranges:
+        for position in range(start, end + 1):
+            boundaries[position] = position in {start, end}
+    hot: list[TurnRecord] = []
+    for position, turn in enumerate(turns):
+        keep = boundaries.get(position)
+        if keep is None:
+            hot.append(turn)
+        elif keep:
+            hot.append(
+                turn.model_copy(
+                    update={"user_text": "", "messages": [], "archived": True},
+                ),
+            )
+    return hot
+
+
+def _compress(payload: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return gzip.compress(payload)
+
+
+def _decompress(payload: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive segment is zstd-compressed but zstandard is not installed.")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return gzip.decompress(payload)
+
+
+def _write_atomic(directory: Path, filename: str, payload: bytes) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / filename
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(payload)
+        handle.flush()
+        os.fsync(handle.fileno())
+    tmp_path.replace(path)
+    _fsync_directory(directory)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from .models import TurnRecord
+from .storage import (
+    HISTORY_FILENAME,
+    TOKEN_SIDECAR_FILENAME,
+    deserialize_model_messages,
+)
+from .token_estimation import (
+    encoding_name_for_model,
+    estimate_text_tokens_batch,
+    message_text_chunks,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional columnar sidecar support
+    pa = None
+    pq = None
+
+
+DEFAULT_BATCH_TURNS = 512
+IN_FLIGHT_BATCHES_PER_WORKER = 4
+
+_worker_model_name: str | None = None
+
+
+@dataclass(slots=True)
+class BackfillResult:
+    history_path: Path
+    sidecar_path: Path
+    turns: int = 0
+    payload_tokens: int = 0
+
+
+def token_sidecar_path(state_root: Path) -> Path:
+    return state_root / TOKEN_SIDECAR_FILENAME
+
+
+def load_token_counts(state_root: Path, *, model_name: str | None) -> dict[str, int]:
+    path = token_sidecar_path(state_root)
+    if pq is None or not path.exists():
+        return {}
+    table = pq.read_table(path, columns=["turn_id", "payload_tokens"])
+    metadata = table.schema.metadata or {}
+    # Counts are only reusable for the encoding they were produced with.
+    if metadata.get(b"encoding", b"").decode("utf-8") != encoding_name_for_model(model_name):
+        return {}
+    return dict(
+        zip(
+            table.column("turn_id").to_pylist(),
+            table.column("payload_tokens").to_pylist(),
+            strict=True,
+        ),
+    )
+
+
+def discover_history_files(paths: Sequence[Path]) -> list[Path]:
+    history_files: list[Path] = []
+    for path in paths:
+        if path.is_file():
+            history_files.append(path)
+        elif (path / HISTORY_FILENAME).exists():
+            history_files.append(path / HISTORY_FILENAME)
+        else:
+            history_files.extend(sorted(path.rglob(HISTORY_FILENAME)))
+    return history_files
+
+
+def backfill_token_counts(
+    paths: Sequence[Path],
+    *,
+    model_name: str | None,
+    workers: int | None = None,
+    batch_turns: int = DEFAULT_BATCH_TURNS,
+) -> list[BackfillResult]:
+    if pa is None or pq is None:
+        raise RuntimeError("Writing token sidecars requires pyarrow; install the 'backfill' extra.")
+
+    history_files = discover_history_files(paths)
+    results = [
+        BackfillResult(history_path=path, sidecar_path=token_sidecar_path(path.parent))
+        for path in history_files
+    ]
+    schema = pa.schema(
+        [("turn_id", pa.string()), ("payload_tokens", pa.int64())],
+        metadata={
+            "encoding": encoding_name_for_model(model_name),
+            "model_name": model_name or "",
+        },
+    )
+    workers = workers or os.cpu_count() or 1
+    writer = None
+    writer_index: int | None = None
+    try:
+        with multiprocessing.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(model_name,),
+        ) as pool:
+            for source_index, turn_ids, counts in _bounded_imap(
+                pool,
+                _iter_batches(history_files, batch_turns),
+                max_in_flight=workers * IN_FLIGHT_BATCHES_PER_WORKER,
+            ):
+                if source_index != writer_index:
+                    _close_writer(writer, results[writer_index] if writer_index is not None else None)
+                    writer_index = source_index
+                    writer = pq.ParquetWriter(_tmp_path(results[source_index].sidecar_path), schema)
+                writer.write_table(pa.table({"turn_id": turn_ids, "payload_tokens": counts}, schema=schema))
+                results[source_index].turns += len(turn_ids)
+                results[source_index].payload_tokens += sum(counts)
+        _close_writer(writer, results[writer_index] if writer_index is not None else None)
+        writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+    return results
+
+
+def _bounded_imap(pool, tasks, *, max_in_flight: int) -> Iterator[tuple[int, list[str], list[int]]]:
+    # Pool.imap drains its input eagerly; keep only a window of batches queued.
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(_count_batch, (task,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _iter_batches(
+    history_files: Sequence[Path],
+    batch_turns: int,
+) -> Iterator[tuple[int, list[str]]]:
+    for source_index, path in enumerate(history_files):
+        batch: list[str] = []
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.endswith("\n"):
+                    break
+                if line.strip():
+                    batch.append(line)
+                if len(batch) >= batch_turns:
+                    yield source_index, batch
+                    batch = []
+        if batch:
+            yield source_index, batch
+
+
+def _init_worker(model_name: str | None) -> None:
+    global _worker_model_name
+    _worker_model_name = model_name
+
+
+def _count_batch(task: tuple[int, list[str]]) -> tuple[int, list[str], list[int]]:
+    source_index, lines = task
+    turn_ids: list[str] = []
+    owners: list[int] = []
+    chunks: list[str] = []
+    for line in lines:
+        record = TurnRecord.model_validate_json(line)
+        if record.archived:
+            continue
+        owner = len(turn_ids)
+        turn_ids.append(record.turn_id)
+        for message in deserialize_model_messages(record.messages):
+            for chunk in message_text_chunks(message):
+                owners.append(owner)
+                chunks.append(chunk)
+
+    counts = [0] * len(turn_ids)
+    for owner, tokens in zip(
+        owners,
+        estimate_text_tokens_batch(chunks, model_name=_worker_model_name, num_threads=1),
+        strict=True,
+    ):
+        counts[owner] += tokens
+    return source_index, turn_ids, counts
+
+
+def _close_writer(writer, result: BackfillResult | None) -> None:
+    if writer is None or result is None:
+        return
+    writer.close()
+    _tmp_path(result.sidecar_path).replace(result.sidecar_path)
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(argv)
+    started = time.monotonic()
+    results = backfill_token_counts(
+        args.paths,
+        model_name=args.model,
+        workers=args.workers,
+        batch_turns=args.batch_turns,
+    )
+    elapsed = time.monotonic() - started
+    for result in results:
+        print(f"{result.sidecar_path}: {result.turns} turns, {result.payload_tokens} tokens")
+    total_turns = sum(result.turns for result in results)
+    print(
+        f"{len(results)} history file(s), {total_turns} turns in {elapsed:.1f}s "
+        f"({total_turns / elapsed if elapsed else 0:.0f} turns/s)",
+    )
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="history-compaction-framework tokenize",
+        description=(
+            "Backfill per-turn payload token counts for recorded history into a Parquet "
+            "sidecar next to each history.jsonl, which the manager loads at startup."
+        ),
+    )
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        type=Path,
+        help="history.jsonl files, state roots, or directories searched recursively for history.jsonl.",
+    )
+    parser.add_argument("--model", default=None, help="Model name whose tokenizer is used.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument(
+        "--batch-turns",
+        type=int,
+        default=DEFAULT_BATCH_TURNS,
+        help="Turns tokenized per encode_batch call in a worker.",
+    )
+    return parser.parse_args(argv)
+
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+)
+
+from .models import CalibrationProfile, CalibrationStats, utc_now
+from .token_estimation import estimate_model_messages
+
+CALIBRATION_ALPHA = 0.2
+MIN_INPUT_CALIBRATION_FACTOR = 0.7
+MAX_INPUT_CALIBRATION_FACTOR = 1.3
+
+PLAIN_SHAPE = "plain"
+TOOL_CALLING_SHAPE = "tool-calling"
+
+
+@dataclass(slots=True)
+class CalibrationSample:
+    shape: str
+    estimated_input_tokens: int
+    actual_input_tokens: int
+
+    @property
+    def observed_ratio(self) -> float:
+        return self.actual_input_tokens / self.estimated_input_tokens
+
+
+def message_shape(messages: Sequence[ModelMessage]) -> str:
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, (ToolCallPart, ToolReturnPart)):
+                return TOOL_CALLING_SHAPE
+    return PLAIN_SHAPE
+
+
+def calibration_profile_key(model_name: str | None, shape: str) -> str:
+    return f"{model_name or 'default'}|{shape}"
+
+
+def resolve_calibration_factor(
+    calibration: CalibrationStats,
+    *,
+    model_name: str | None,
+    shape: str,
+    shared_profiles: Mapping[str, CalibrationProfile] | None = None,
+) -> float:
+    key = calibration_profile_key(model_name, shape)
+    local = calibration.profiles.get(key)
+    if local is not None and local.samples > 0:
+        return local.input_calibration_factor
+    shared = (shared_profiles or {}).get(key)
+    if shared is not None and shared.samples > 0:
+        return shared.input_calibration_factor
+    return calibration.input_calibration_factor
+
+
+def collect_request_samples(
+    new_messages: Sequence[ModelMessage],
+    *,
+    estimated_first_request_tokens: int,
+    model_name: str | None,
+) -> list[CalibrationSample]:
+    samples: list[CalibrationSample] = []
+    for index, message in enumerate(new_messages):
+        if not isinstance(message, ModelResponse):
+            continue
+        actual_input_tokens = message.usage.input_tokens
+        if not actual_input_tokens:
+            continue
+        preceding = list(new_messages[:index])
+        turn_messages = preceding[1:] if preceding and isinstance(preceding[0], ModelRequest) else preceding
+        estimated = estimated_first_request_tokens + estimate_model_messages(
+            turn_messages,
+            model_name=model_name,
+            calibration_factor=1.0,
+        )
+        if estimated <= 0:
+            continue
+        samples.append(
+            CalibrationSample(
+                shape=message_shape(preceding),
+                estimated_input_tokens=estimated,
+                actual_input_tokens=actual_input_tokens,
+            ),
+        )
+    return samples
+
+
+def apply_calibration_samples(
+    calibration: CalibrationStats,
+    samples: Sequence[CalibrationSample],
+    *,
+    model_name: str | None,
+) -> CalibrationStats:
+    profiles = dict(calibration.profiles)
+    samples_seen = calibration.samples
+    aggregate_factor = calibration.input_calibration_factor
+    for sample in samples:
+        aggregate_factor = smooth_calibration_factor(
+            aggregate_factor,
+            previous_samples=samples_seen,
+            observed_ratio=sample.observed_ratio,
+        )
+        samples_seen += 1
+        key = calibration_profile_key(model_name, sample.shape)
+        profiles[key] = update_calibration_profile(profiles.get(key), sample.observed_ratio)
+    return calibration.model_copy(
+        update={
+            "samples": samples_seen,
+            "input_calibration_factor": aggregate_factor,
+            "profiles": profiles,
+        },
+    )
+
+
+def merge_shared_calibration_samples(
+    shared_profiles: Mapping[str, CalibrationProfile],
+    samples: Sequence[CalibrationSample],
+    *,
+    model_name: str | None,
+) -> dict[str, CalibrationProfile]:
+    merged = dict(shared_profiles)
+    for sample in samples:
+        key = calibration_profile_key(model_name, sample.shape)
+        merged[key] = update_calibration_profile(merged.get(key), sample.observed_ratio)
+    return merged
+
+
+def update_calibration_profile(
+    profile: CalibrationProfile | None,
+    observed_ratio: float,
+) -> CalibrationProfile:
+    previous = profile or CalibrationProfile()
+    return CalibrationProfile(
+        samples=previous.samples + 1,
+        input_calibration_factor=smooth_calibration_factor(
+            previous.input_calibration_factor,
+            previous_samples=previous.samples,
+            observed_ratio=observed_ratio,
+        ),
+        updated_at=utc_now(),
+    )
+
+
+def smooth_calibration_factor(
+    previous_factor: float,
+    *,
+    previous_samples: int,
+    observed_ratio: float,
+) -> float:
+    if previous_samples == 0:
+        smoothed_ratio = observed_ratio
+    else:
+        smoothed_ratio = (
+            (1.0 - CALIBRATION_ALPHA) * previous_factor
+        ) + (CALIBRATION_ALPHA * observed_ratio)
+    return min(
+        MAX_INPUT_CALIBRATION_FACTOR,
+        max(MIN_INPUT_CALIBRATION_FACTOR, smoothed_ratio),
+    )
@@ -1,26 +1,44 @@
 from __future__ import annotations
 
 import argparse
+from collections.abc import Sequence
 from pathlib import Path
+import sys
 
+from .bulk_tokens import main as tokenize_main
+from .locking import FileLock
 from .models import CompactionConfig
 from .repl import run_repl
 from .session import CompactedSession
+from .simulate import main as simulate_main
 
 
 DEFAULT_MODEL = "openai:gpt-5.2"
 DEFAULT_DEMO_CONTEXT_WINDOW = 4_000
 
 
-def main() -> None:
-    args = parse_args()
+def main(argv: Sequence[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "simulate":
+        simulate_main(argv[1:])
+        return
+    if argv and argv[0] == "tokenize":
+        tokenize_main(argv[1:])
+        return
+    args = parse_args(argv)
     state_root = args.state_root.resolve()
-    config = CompactionConfig(context_window=args.context_window)
+    config = CompactionConfig(
+        context_window=args.context_window,
+        projection_policy=args.projection_policy,
+        archive_min_turns=args.archive_min_turns,
+    )
     session = CompactedSession.create(
         state_root=state_root,
         model=args.model,
         summary_model=args.summary_model,
         config=config,
+        calibration_path=args.calibration_file,
+        lock=FileLock.for_state_root(state_root) if args.process_lock else None,
     )
     session.set_recovery_notifier(lambda message: print(f"\n{message}"))
     try:
@@ -29,10 +47,14 @@ def main() -> None:
         session.close()
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
     package_root = Path(__file__).resolve().parents[2]
     parser = argparse.ArgumentParser(
-        description="Run the standalone Pydantic AI history compaction REPL.",
+        description=(
+            "Run the standalone Pydantic AI history compaction REPL. "
+            "Use 'simulate' as the first argument to replay recorded sessions under a config grid, "
+            "or 'tokenize' to backfill per-turn token counts into Parquet sidecars."
+        ),
     )
     parser.add_argument(
         "--state-root",
@@ -40,6 +62,15 @@ def parse_args() -> argparse.Namespace:
         default=package_root / "state",
         help="Directory used for the append-only raw history and collapse state.",
     )
+    parser.add_argument(
+        "--calibration-file",
+        type=Path,
+        default=package_root / "calibration.json",
+        help=(
+            "Shared token-calibration profiles keyed by model and message shape. "
+            "Reused across state roots so estimates are calibrated from the first turn."
+        ),
+    )
     parser.add_argument(
         "--model",
         default=DEFAULT_MODEL,
@@ -59,4 +90,30 @@ def parse_args() -> argparse.Namespace:
             "Defaults lower than the library default so collapse is easier to trigger."
         ),
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--process-lock",
+        action="store_true",
+        help=(
+            "Guard the state root with an advisory file lock so several processes "
+            "can share it. The default in-process lock only serializes threads."
+        ),
+    )
+    parser.add_argument(
+        "--projection-policy",
+        choices=["eager", "epoch"],
+        default="eager",
+        help=(
+            "How staged spans are committed. 'epoch' batches commits deeper below the "
+            "target so the projected prefix stays stable for provider prompt caching."
+        ),
+    )
+    parser.add_argument(
+        "--archive-min-turns",
+        type=int,
+        default=0,
+        help=(
+            "Move fully collapsed turns into compressed segments under <state-root>/archive "
+            "once at least this many are eligible. 0 keeps everything in history.jsonl."
+        ),
+    )
+    return parser.parse_args(argv)
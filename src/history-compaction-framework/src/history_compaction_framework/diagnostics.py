@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 
 from .engine import RequestBudget
-from .models import CollapseState, CompactionConfig
+from .models import ArchiveIndex, CollapseState, CompactionConfig
 
 
 def render_staged_spans(state: CollapseState) -> str:
@@ -36,6 +36,7 @@ def render_committed_spans(state: CollapseState) -> str:
                     f"start_turn_id: {span.start_turn_id}",
                     f"end_turn_id: {span.end_turn_id}",
                     f"committed_at: {span.committed_at.isoformat()}",
+                    f"source: {span.source}",
                     f"summary_text: {span.summary_text}",
                 ]
             )
@@ -49,7 +50,9 @@ def render_state_json(
     config: CompactionConfig,
     state: CollapseState,
     budget: RequestBudget,
+    archive: ArchiveIndex | None = None,
 ) -> str:
+    archive = archive or ArchiveIndex()
     payload = {
         "context_window": config.context_window,
         "pressure_threshold": config.pressure_threshold,
@@ -57,6 +60,8 @@ def render_state_json(
         "target_threshold": config.target_threshold,
         "guard_threshold": config.guard_threshold,
         "fail_threshold": config.fail_threshold,
+        "projection_policy": config.projection_policy,
+        "commit_target_threshold": config.commit_target_threshold,
         "estimated_projected_tokens": budget.projected_tokens,
         "estimated_pending_tokens": budget.pending_tokens,
         "estimated_request_tokens": budget.request_tokens,
@@ -64,8 +69,15 @@ def render_state_json(
         "last_stage_check_request_tokens": state.last_stage_check_request_tokens,
         "committed_spans": len(state.committed_spans),
         "staged_spans": len(state.staged_spans),
+        "archive": {
+            "segments": len(archive.segments),
+            "archived_turns": archive.archived_turns,
+            "raw_bytes": sum(segment.raw_bytes for segment in archive.segments),
+            "stored_bytes": sum(segment.stored_bytes for segment in archive.segments),
+        },
         "last_recovery": state.last_recovery.model_dump(mode="json"),
         "health": state.health.model_dump(mode="json"),
+        "estimated_prefix_cache_ratio": round(state.calibration.estimated_prefix_cache_ratio, 4),
         "calibration": state.calibration.model_dump(mode="json"),
     }
     return json.dumps(payload, indent=2)
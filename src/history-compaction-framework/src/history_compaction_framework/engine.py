@@ -1,19 +1,31 @@
 from __future__ import annotations
 
 from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-import threading
 import time
 from typing import Any
 
 from pydantic_ai.messages import ModelMessage
 
-from .models import CollapseState, CompactionConfig, RecoveryRunResult, StageRunResult, TurnRecord
-from .projection import build_projected_history
+from .calibration import message_shape, resolve_calibration_factor
+from .models import (
+    CalibrationProfile,
+    CollapseState,
+    CompactionConfig,
+    RecoveryRunResult,
+    StageRunResult,
+    TurnRecord,
+)
+from .journal import StateJournal
+from .locking import StateLock
+from .projection import projected_prefix_hash, provider_message_digest, shared_prefix_length
+from .snapshot import ProjectionSnapshotCache
 from .staging import CollapseStager
-from .storage import save_state
 from .token_estimation import estimate_model_messages
 
+PROVIDER_CACHE_MIN_PREFIX_TOKENS = 1_024
+
 
 @dataclass(slots=True)
 class RequestBudget:
@@ -30,10 +42,13 @@ class CollapseEngine:
         *,
         state_root,
         config: CompactionConfig,
-        lock: threading.Lock,
+        lock: StateLock,
         model_name: str | None,
         load_turns: Callable[[], list[TurnRecord]],
         load_state: Callable[[], CollapseState],
+        journal: StateJournal,
+        load_shared_calibration: Callable[[], dict[str, CalibrationProfile]] | None = None,
+        projection_cache: ProjectionSnapshotCache | None = None,
     ) -> None:
         self.state_root = state_root
         self.config = config
@@ -41,12 +56,18 @@ class CollapseEngine:
         self.model_name = model_name
         self._load_turns = load_turns
         self._load_state = load_state
+        self._journal = journal
+        self._load_shared_calibration = load_shared_calibration or dict
+        self.projection_cache = projection_cache or ProjectionSnapshotCache(model_name=model_name)
+        self._last_projected: tuple[list[str], str | None] = ([], None)
         self._stager = CollapseStager(
             state_root=state_root,
             config=config,
             lock=lock,
             model_name=model_name,
+            load_turns=load_turns,
             load_state=load_state,
+            journal=journal,
         )
 
     def stage_if_needed(self, summarizer_agent: Any) -> StageRunResult:
@@ -60,11 +81,10 @@ class CollapseEngine:
             self._update_pressure_markers(state, budget)
 
             if budget.request_tokens < self.config.stage_threshold:
-                save_state(self.state_root, state)
                 return StageRunResult(
                     status="below-stage-threshold",
                     estimated_request_tokens=budget.request_tokens,
-                    target_threshold=self.config.target_threshold,
+                    target_threshold=self.config.commit_target_threshold,
                 )
 
         while True:
@@ -75,33 +95,33 @@ class CollapseEngine:
                 estimated_after_commit = max(0, budget.request_tokens - estimated_savings_tokens)
                 self._update_pressure_markers(state, budget)
 
-                if estimated_after_commit <= self.config.target_threshold:
-                    save_state(self.state_root, state)
+                if estimated_after_commit <= self.config.commit_target_threshold:
                     return StageRunResult(
                         status="staged" if staged_count > 0 else "already-within-target",
                         staged_count=staged_count,
                         estimated_savings_tokens=estimated_savings_tokens,
                         estimated_request_tokens=budget.request_tokens,
-                        target_threshold=self.config.target_threshold,
+                        target_threshold=self.config.commit_target_threshold,
                     )
 
                 candidate = self._stager.select_next_stage_chunk(turns, state)
+                base_version = state.version
                 if not candidate:
                     if staged_count == 0:
-                        state.health.empty_stage_runs += 1
-                    save_state(self.state_root, state)
+                        self._journal.record(state, "health", increments={"empty_stage_runs": 1})
                     return StageRunResult(
                         status="no-eligible-span" if staged_count == 0 else "partial-stage",
                         staged_count=staged_count,
                         estimated_savings_tokens=estimated_savings_tokens,
                         estimated_request_tokens=budget.request_tokens,
-                        target_threshold=self.config.target_threshold,
+                        target_threshold=self.config.commit_target_threshold,
                     )
 
             try:
                 staged, expected_savings = self._stager.summarize_and_stage_candidate(
                     candidate,
                     summarizer_agent=summarizer_agent,
+                    base_version=base_version,
                 )
             except Exception as exc:
                 return StageRunResult(
@@ -109,7 +129,7 @@ class CollapseEngine:
                     staged_count=staged_count,
                     estimated_savings_tokens=estimated_savings_tokens,
                     estimated_request_tokens=budget.request_tokens,
-                    target_threshold=self.config.target_threshold,
+                    target_threshold=self.config.commit_target_threshold,
                 )
 
             if staged is None:
@@ -142,14 +162,45 @@ class CollapseEngine:
                 and recovery_summarizer_agent is not None
             )
 
+        recovery = None
         if should_recover:
-            return self.recover_request_budget(
+            budget, recovery = self.recover_request_budget(
                 pending_messages=pending_messages,
                 summarizer_agent=recovery_summarizer_agent,
                 notifier=recovery_notifier,
             )
 
-        return budget, None
+        if budget.request_tokens > self.config.fail_threshold:
+            budget = self.compact_extractively(
+                pending_messages=pending_messages,
+                notifier=recovery_notifier,
+            )
+
+        return budget, recovery
+
+    def compact_extractively(
+        self,
+        *,
+        pending_messages: list[ModelMessage],
+        notifier: Callable[[str], None] | None = None,
+    ) -> RequestBudget:
+        with self.lock:
+            turns = self._load_turns()
+            state = self._load_state()
+            budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
+            if budget.request_tokens <= self.config.fail_threshold:
+                return budget
+            if notifier is not None:
+                notifier("Condensing older conversation locally before continuing...")
+            self._journal.record(state, "health", increments={"extractive_runs": 1})
+            _, budget, _ = self._stager.commit_extractive_spans_until_target(
+                turns,
+                state,
+                pending_messages=pending_messages,
+                budget=budget,
+                build_request_budget=self.build_request_budget,
+            )
+            return budget
 
     def recover_request_budget(
         self,
@@ -162,76 +213,110 @@ class CollapseEngine:
             turns = self._load_turns()
             state = self._load_state()
             budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
-            state.last_recovery = RecoveryRunResult(
-                in_progress=True,
-                status="running",
-                starting_request_tokens=budget.request_tokens,
-                ending_request_tokens=budget.request_tokens,
+            self._journal.record(
+                state,
+                "recovery",
+                last_recovery=RecoveryRunResult(
+                    in_progress=True,
+                    status="running",
+                    starting_request_tokens=budget.request_tokens,
+                    ending_request_tokens=budget.request_tokens,
+                ).model_dump(mode="json"),
             )
-            save_state(self.state_root, state)
 
         if notifier is not None:
             notifier("Summarizing more of our conversation before continuing...")
 
         staged_count = 0
         committed_count = 0
+        launched_count = 0
         hit_chunk_limit = False
         hit_time_limit = False
         status = "recovered"
-        start_time = time.monotonic()
+        stage_error: Exception | None = None
+        deadline = time.monotonic() + self.config.max_emergency_stage_seconds
+        in_flight: dict[Future[tuple[Any, int]], tuple[list[TurnRecord], int]] = {}
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, self.config.max_emergency_stage_chunks),
+            thread_name_prefix="collapse-recovery",
+        )
 
-        while True:
-            with self.lock:
-                turns = self._load_turns()
-                state = self._load_state()
-                budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
-                if budget.request_tokens <= self.config.target_threshold:
+        try:
+            while True:
+                with self.lock:
+                    turns = self._load_turns()
+                    state = self._load_state()
+                    budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
+                    if budget.request_tokens <= self.config.target_threshold:
+                        status = "recovered"
+                        break
+                    in_flight_savings = sum(savings for _, savings in in_flight.values())
+                    for chunk, savings in self._plan_recovery_chunks(
+                        turns,
+                        state,
+                        excess_tokens=budget.request_tokens - self.config.target_threshold - in_flight_savings,
+                        exclude_turn_ids={turn.turn_id for running, _ in in_flight.values() for turn in running},
+                        limit=self.config.max_emergency_stage_chunks - launched_count,
+                    ):
+                        future = executor.submit(
+                            self._stager.summarize_and_stage_candidate,
+                            chunk,
+                            summarizer_agent=summarizer_agent,
+                            base_version=state.version,
+                        )
+                        in_flight[future] = (chunk, savings)
+                        launched_count += 1
+
+                if not in_flight:
+                    if stage_error is not None and staged_count == 0:
+                        status = f"stage-failed: {stage_error}"
+                    elif launched_count >= self.config.max_emergency_stage_chunks:
+                        hit_chunk_limit = True
+                        status = "chunk-limit-reached"
+                    elif stage_error is not None:
+                        status = f"stage-failed: {stage_error}"
+                    else:
+                        status = "no-eligible-span"
                     break
-                candidate = self._stager.select_next_stage_chunk(turns, state)
 
-            if staged_count >= self.config.max_emergency_stage_chunks:
-                hit_chunk_limit = True
-                status = "chunk-limit-reached"
-                break
-
-            if (time.monotonic() - start_time) >= self.config.max_emergency_stage_seconds:
-                hit_time_limit = True
-                status = "time-limit-reached"
-                break
-
-            if not candidate:
-                status = "no-eligible-span"
-                break
-
-            try:
-                staged, _ = self._stager.summarize_and_stage_candidate(
-                    candidate,
-                    summarizer_agent=summarizer_agent,
+                remaining_seconds = deadline - time.monotonic()
+                done = (
+                    wait(in_flight, timeout=remaining_seconds, return_when=FIRST_COMPLETED).done
+                    if remaining_seconds > 0
+                    else set()
                 )
-            except Exception as exc:
-                status = f"stage-failed: {exc}"
-                break
-
-            if staged is None:
-                continue
-
-            staged_count += 1
-            with self.lock:
-                turns = self._load_turns()
-                state = self._load_state()
-                budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
-                state, budget, committed_now = self._stager.commit_staged_spans_until_target(
-                    turns,
-                    state,
-                    pending_messages=pending_messages,
-                    budget=budget,
-                    build_request_budget=self.build_request_budget,
-                )
-            committed_count += committed_now
+                if not done:
+                    hit_time_limit = True
+                    status = "time-limit-reached"
+                    break
 
-            if budget.request_tokens <= self.config.target_threshold:
-                status = "recovered"
-                break
+                for future in done:
+                    in_flight.pop(future)
+                    try:
+                        staged, _ = future.result()
+                    except Exception as exc:
+                        stage_error = exc
+                        continue
+                    if staged is None:
+                        continue
+                    staged_count += 1
+                    with self.lock:
+                        turns = self._load_turns()
+                        state = self._load_state()
+                        budget = self.build_request_budget(turns, state, pending_messages=pending_messages)
+                        state, budget, committed_now = self._stager.commit_staged_spans_until_target(
+                            turns,
+                            state,
+                            pending_messages=pending_messages,
+                            budget=budget,
+                            build_request_budget=self.build_request_budget,
+                        )
+                    committed_count += committed_now
+        finally:
+            # Every launched chunk has its own worker, so nothing is ever queued.
+            # Summaries still running cannot be interrupted; they finish in the
+            # background and stay staged.
+            executor.shutdown(wait=False)
 
         with self.lock:
             latest_turns = self._load_turns()
@@ -241,19 +326,92 @@ class CollapseEngine:
                 latest_state,
                 pending_messages=pending_messages,
             )
-            latest_state.last_recovery = RecoveryRunResult(
-                in_progress=False,
-                status=status,
-                committed_count=committed_count,
-                staged_count=staged_count,
-                starting_request_tokens=latest_state.last_recovery.starting_request_tokens,
-                ending_request_tokens=latest_budget.request_tokens,
-                hit_chunk_limit=hit_chunk_limit,
-                hit_time_limit=hit_time_limit,
+            self._journal.record(
+                latest_state,
+                "recovery",
+                last_recovery=RecoveryRunResult(
+                    in_progress=False,
+                    status=status,
+                    committed_count=committed_count,
+                    staged_count=staged_count,
+                    starting_request_tokens=latest_state.last_recovery.starting_request_tokens,
+                    ending_request_tokens=latest_budget.request_tokens,
+                    hit_chunk_limit=hit_chunk_limit,
+                    hit_time_limit=hit_time_limit,
+                ).model_dump(mode="json"),
             )
-            save_state(self.state_root, latest_state)
             return latest_budget, latest_state.last_recovery
 
+    def _plan_recovery_chunks(
+        self,
+        turns: list[TurnRecord],
+        state: CollapseState,
+        *,
+        excess_tokens: int,
+        exclude_turn_ids: set[str],
+        limit: int,
+    ) -> list[tuple[list[TurnRecord], int]]:
+        planned: list[tuple[list[TurnRecord], int]] = []
+        planned_savings = 0
+        for chunk in self._stager.select_stage_chunks(turns, state):
+            if len(planned) >= limit or planned_savings >= excess_tokens:
+                break
+            if any(turn.turn_id in exclude_turn_ids for turn in chunk):
+                continue
+            savings = self._stager.estimate_chunk_savings(chunk)
+            planned.append((chunk, savings))
+            planned_savings += savings
+        return planned
+
+    def record_request_prefix(self, budget: RequestBudget) -> int:
+        messages = [*budget.projected_messages, *budget.pending_messages]
+        digests = [provider_message_digest(message) for message in messages]
+        prefix_hash = projected_prefix_hash(digests)
+        with self.lock:
+            state = self._load_state()
+            shared = self._shared_prefix_length(state, digests)
+            uncached_tokens = estimate_model_messages(
+                messages[shared:],
+                model_name=self.model_name,
+                calibration_factor=self.calibration_factor(state, budget.pending_messages),
+            )
+            cached_tokens = max(0, budget.request_tokens - uncached_tokens) if shared else 0
+            if cached_tokens < PROVIDER_CACHE_MIN_PREFIX_TOKENS:
+                cached_tokens = 0
+            calibration = state.calibration.model_copy(
+                update={
+                    "last_projected_digest_count": len(digests),
+                    "last_projected_prefix_hash": prefix_hash,
+                    "last_cached_prefix_tokens": cached_tokens,
+                    "prefix_tracked_requests": state.calibration.prefix_tracked_requests + 1,
+                    "prefix_tracked_request_tokens": (
+                        state.calibration.prefix_tracked_request_tokens + budget.request_tokens
+                    ),
+                    "estimated_cached_prefix_tokens": (
+                        state.calibration.estimated_cached_prefix_tokens + cached_tokens
+                    ),
+                },
+            )
+            self._journal.record(state, "calibration", calibration=calibration.model_dump(mode="json"))
+            self._last_projected = (digests, prefix_hash)
+        return cached_tokens
+
+    def _shared_prefix_length(self, state: CollapseState, digests: list[str]) -> int:
+        # The journal keeps only the count and hash of the last request's
+        # digests. The full list lives in memory for per-message matching; a
+        # fresh engine can still tell whether the whole previous request is
+        # a prefix of this one.
+        count = state.calibration.last_projected_digest_count
+        expected_hash = state.calibration.last_projected_prefix_hash
+        previous, previous_hash = self._last_projected
+        if expected_hash is None:
+            return 0
+        if len(previous) == count and previous_hash == expected_hash:
+            return shared_prefix_length(previous, digests)
+        if count <= len(digests) and projected_prefix_hash(digests[:count]) == expected_hash:
+            return count
+        return 0
+
     def build_request_budget(
         self,
         turns: list[TurnRecord],
@@ -261,16 +419,13 @@ class CollapseEngine:
         *,
         pending_messages: list[ModelMessage],
     ) -> RequestBudget:
-        projected = build_projected_history(turns, state)
-        projected_tokens = estimate_model_messages(
-            projected.messages,
-            model_name=self.model_name,
-            calibration_factor=state.calibration.input_calibration_factor,
-        )
+        projected, snapshot = self.projection_cache.project(turns, state)
+        calibration_factor = self.calibration_factor(state, pending_messages)
+        projected_tokens = snapshot.projected_tokens(calibration_factor)
         pending_tokens = estimate_model_messages(
             pending_messages,
             model_name=self.model_name,
-            calibration_factor=state.calibration.input_calibration_factor,
+            calibration_factor=calibration_factor,
         )
         return RequestBudget(
             projected_messages=projected.messages,
@@ -280,6 +435,28 @@ class CollapseEngine:
             request_tokens=projected_tokens + pending_tokens,
         )
 
+    def calibration_factor(
+        self,
+        state: CollapseState,
+        pending_messages: list[ModelMessage],
+    ) -> float:
+        return resolve_calibration_factor(
+            state.calibration,
+            model_name=self.model_name,
+            shape=message_shape(pending_messages),
+            shared_profiles=self._load_shared_calibration(),
+        )
+
     def _update_pressure_markers(self, state: CollapseState, budget: RequestBudget) -> None:
-        state.under_pressure = budget.request_tokens >= self.config.pressure_threshold
-        state.last_stage_check_request_tokens = budget.request_tokens
+        under_pressure = budget.request_tokens >= self.config.pressure_threshold
+        if (
+            state.under_pressure == under_pressure
+            and state.last_stage_check_request_tokens == budget.request_tokens
+        ):
+            return
+        self._journal.record(
+            state,
+            "pressure",
+            under_pressure=under_pressure,
+            last_stage_check_request_tokens=budget.request_tokens,
+        )
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator, Sequence
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from .models import TurnRecord
+from .projection import flatten_turns
+
+EXTRACTIVE_SOURCE = "extractive"
+MAX_SENTENCE_CHARS = 240
+MAX_TOOL_ARGS_CHARS = 120
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def build_extractive_summary(turns: Sequence[TurnRecord]) -> str:
+    seen: set[str] = set()
+    lines: list[str] = []
+    for turn in turns:
+        for line in _turn_lines(turn):
+            key = " ".join(line.lower().split())
+            if key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+    return "\n".join(lines) if lines else "(no retained content)"
+
+
+def _turn_lines(turn: TurnRecord) -> Iterator[str]:
+    for message in flatten_turns([turn]):
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    yield from _prefixed("User", _edge_sentences(part.content))
+                elif isinstance(part, ToolReturnPart):
+                    yield f"Tool {part.tool_name} returned a result (body omitted)."
+        elif isinstance(message, ModelResponse):
+            for part in message.parts:
+                if isinstance(part, TextPart):
+                    yield from _prefixed("Assistant", _edge_sentences(part.content))
+                elif isinstance(part, ToolCallPart):
+                    yield f"Assistant called {part.tool_name}({_clip(part.args_as_json_str(), MAX_TOOL_ARGS_CHARS)})."
+
+
+def _edge_sentences(text: str) -> list[str]:
+    sentences = [sentence for sentence in _SENTENCE_BOUNDARY.split(" ".join(text.split())) if sentence]
+    if len(sentences) <= 2:
+        return [_clip(sentence, MAX_SENTENCE_CHARS) for sentence in sentences]
+    return [
+        _clip(sentences[0], MAX_SENTENCE_CHARS),
+        "...",
+        _clip(sentences[-1], MAX_SENTENCE_CHARS),
+    ]
+
+
+def _prefixed(speaker: str, sentences: list[str]) -> Iterator[str]:
+    if sentences:
+        yield f"{speaker}: {' '.join(sentences)}"
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
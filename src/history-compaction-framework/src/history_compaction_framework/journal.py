@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError
+
+from .models import (
+    CalibrationStats,
+    CollapseState,
+    CommittedSpan,
+    RecoveryRunResult,
+    StagedSpan,
+)
+
+JOURNAL_FILENAME = "collapse_state.wal"
+CHECKPOINT_INTERVAL = 64
+TORN_TAIL_READ_BYTES = 4_096
+
+
+class StateDelta(BaseModel):
+    version: int
+    op: str
+    payload: dict[str, Any] = Field(default_factory=dict)
+
+
+def journal_path(state_root: Path) -> Path:
+    return state_root / JOURNAL_FILENAME
+
+
+def read_deltas(state_root: Path) -> list[StateDelta]:
+    path = journal_path(state_root)
+    if not path.exists():
+        return []
+    deltas: list[StateDelta] = []
+    with path.open("r", encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            stripped = line.strip()
+            if not line.endswith("\n") or not stripped:
+                continue
+            try:
+                deltas.append(StateDelta.model_validate_json(stripped))
+            except ValidationError:
+                # A line torn by a crash mid-append is skipped; the records
+                # appended after it are still valid.
+                continue
+    return deltas
+
+
+def replay_deltas(state: CollapseState, deltas: list[StateDelta]) -> CollapseState:
+    for delta in deltas:
+        if delta.version <= state.version:
+            continue
+        apply_delta(state, delta)
+    return state
+
+
+def apply_delta(state: CollapseState, delta: StateDelta) -> None:
+    payload = delta.payload
+    if delta.op == "pressure":
+        state.under_pressure = payload["under_pressure"]
+        state.last_stage_check_request_tokens = payload["last_stage_check_request_tokens"]
+    elif delta.op == "health":
+        for field_name, increment in payload.get("increments", {}).items():
+            setattr(state.health, field_name, getattr(state.health, field_name) + increment)
+        if "last_error" in payload:
+            state.health.last_error = payload["last_error"]
+    elif delta.op == "stage":
+        span = StagedSpan.model_validate(payload["span"])
+        if not _span_exists(state, span.start_turn_id, span.end_turn_id):
+            state.staged_spans.append(span)
+            state.health.last_error = None
+    elif delta.op == "commit":
+        span = CommittedSpan.model_validate(payload["span"])
+        state.staged_spans = [
+            staged
+            for staged in state.staged_spans
+            if (staged.start_turn_id, staged.end_turn_id) != (span.start_turn_id, span.end_turn_id)
+        ]
+        if not any(committed.collapse_id == span.collapse_id for committed in state.committed_spans):
+            state.committed_spans.append(span)
+            if span.source == "extractive":
+                state.health.extractive_commits += 1
+            else:
+                state.health.committed_from_staging += 1
+        state.next_collapse_id = max(state.next_collapse_id, int(span.collapse_id) + 1)
+    elif delta.op == "recovery":
+        state.last_recovery = RecoveryRunResult.model_validate(payload["last_recovery"])
+    elif delta.op == "calibration":
+        state.calibration = CalibrationStats.model_validate(payload["calibration"])
+    else:
+        raise ValueError(f"Unknown collapse state delta: {delta.op!r}")
+    state.version = delta.version
+
+
+class StateJournal:
+    def __init__(self, state_root: Path) -> None:
+        self.state_root = state_root
+
+    def record(self, state: CollapseState, op: str, **payload: Any) -> StateDelta:
+        delta = StateDelta(version=state.version + 1, op=op, payload=payload)
+        self._append(delta)
+        apply_delta(state, delta)
+        if delta.version % CHECKPOINT_INTERVAL == 0:
+            self.checkpoint(state)
+        return delta
+
+    def checkpoint(self, state: CollapseState) -> None:
+        from .storage import save_state
+
+        save_state(self.state_root, state)
+        self.truncate()
+
+    def recover(self) -> CollapseState:
+        from .storage import load_state
+
+        state = load_state(self.state_root)
+        self.checkpoint(state)
+        return state
+
+    def truncate(self) -> None:
+        path = journal_path(self.state_root)
+        if not path.exists():
+            return
+        with path.open("r+b") as handle:
+            handle.truncate(0)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def _append(self, delta: StateDelta) -> None:
+        self.state_root.mkdir(parents=True, exist_ok=True)
+        line = (delta.model_dump_json() + "\n").encode("utf-8")
+        fd = os.open(journal_path(self.state_root), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            _drop_torn_tail(fd)
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _drop_torn_tail(fd: int) -> None:
+    # Callers hold the state lock, so nothing else is appending. A crash
+    # mid-append can leave a fragment without a newline; it is cut back to
+    # the last complete record so the next record starts on its own line.
+    size = os.fstat(fd).st_size
+    end = size
+    while end > 0:
+        start = max(0, end - TORN_TAIL_READ_BYTES)
+        block = os.pread(fd, end - start, start)
+        if end == size and block.endswith(b"\n"):
+            return
+        newline = block.rfind(b"\n")
+        if newline >= 0:
+            os.ftruncate(fd, start + newline + 1)
+            return
+        end = start
+    if size:
+        os.ftruncate(fd, 0)
+
+
+def _span_exists(state: CollapseState, start_turn_id: str, end_turn_id: str) -> bool:
+    return any(
+        span.start_turn_id == start_turn_id and span.end_turn_id == end_turn_id
+        for span in [*state.staged_spans, *state.committed_spans]
+    )
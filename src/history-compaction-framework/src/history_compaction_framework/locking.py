@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Protocol
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - advisory file locks are POSIX-only
+    fcntl = None
+
+
+LOCK_FILENAME = "collapse_state.lock"
+LOCK_POLL_SECONDS = 0.05
+
+
+class StateLock(Protocol):
+    def __enter__(self) -> Any: ...
+
+    def __exit__(self, *exc_info: object) -> Any: ...
+
+
+def file_locking_available() -> bool:
+    return fcntl is not None
+
+
+class FileLock:
+    def __init__(self, path: Path) -> None:
+        if fcntl is None:
+            raise RuntimeError("FileLock requires fcntl, which is only available on POSIX systems.")
+        self.path = path
+        # flock is held per open file description, so threads of one process
+        # must also be serialized in-process.
+        self._thread_lock = threading.Lock()
+        self._fd: int | None = None
+
+    @classmethod
+    def for_state_root(cls, state_root: Path) -> FileLock:
+        state_root.mkdir(parents=True, exist_ok=True)
+        return cls(state_root / LOCK_FILENAME)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        deadline = None if timeout < 0 else time.monotonic() + timeout
+        if not self._thread_lock.acquire(blocking, timeout if blocking else -1):
+            return False
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            self._thread_lock.release()
+            raise
+        flags = fcntl.LOCK_EX if blocking and deadline is None else fcntl.LOCK_EX | fcntl.LOCK_NB
+        while True:
+            try:
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    os.close(fd)
+                    self._thread_lock.release()
+                    return False
+                time.sleep(LOCK_POLL_SECONDS)
+                continue
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+            return True
+
+    def release(self) -> None:
+        fd = self._fd
+        if fd is None:
+            raise RuntimeError("release unlocked FileLock")
+        self._fd = None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            self._thread_lock.release()
+
+    def locked(self) -> bool:
+        return self._thread_lock.locked()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterator, Sequence
 from datetime import datetime, timezone
+from contextlib import nullcontext
 from pathlib import Path
 import threading
 from typing import Any
@@ -10,14 +11,26 @@ from uuid import uuid4
 from pydantic_ai import RunContext
 from pydantic_ai.messages import ModelMessage
 
+from .archive import archive_collapsed_turns, iter_history_turns, load_archive_index
+from .bulk_tokens import load_token_counts
+from .calibration import (
+    CalibrationSample,
+    apply_calibration_samples,
+    collect_request_samples,
+    merge_shared_calibration_samples,
+    message_shape,
+)
 from .diagnostics import (
     render_committed_spans,
     render_staged_spans,
     render_state_json,
 )
 from .engine import CollapseEngine, RequestBudget
+from .journal import StateJournal
+from .locking import FileLock, StateLock, file_locking_available
 from .models import (
-    CalibrationStats,
+    ArchiveSegment,
+    CalibrationProfile,
     CollapseState,
     CompactionConfig,
     RecoveryRunResult,
@@ -26,26 +39,24 @@ from .models import (
 )
 from .projection import (
     ProjectedHistory,
-    build_projected_history,
-    flatten_turns,
-    render_projected_messages,
-    render_turns,
+    iter_projected_message_blocks,
+    iter_turn_blocks,
 )
+from .paging import PageSelection, select_page
+from .snapshot import ProjectionSnapshotCache
 from .storage import (
     append_turn,
     ensure_layout,
+    iter_turns,
+    load_calibration_profiles,
     load_state,
     load_turns,
     reset_state_root,
-    save_state,
+    save_calibration_profiles,
     serialize_model_messages,
 )
 from .token_estimation import estimate_model_messages
 
-CALIBRATION_ALPHA = 0.2
-MIN_INPUT_CALIBRATION_FACTOR = 0.7
-MAX_INPUT_CALIBRATION_FACTOR = 1.3
-
 
 class ProjectedHistoryOverflowError(RuntimeError):
     def __init__(self, *, estimated_tokens: int, threshold: int) -> None:
@@ -63,16 +74,27 @@ class HistoryCompactionManager:
         state_root: Path,
         *,
         config: CompactionConfig | None = None,
-        lock: threading.Lock | None = None,
+        lock: StateLock | None = None,
         model_name: str | None = None,
+        calibration_path: Path | None = None,
     ) -> None:
         self.state_root = state_root.resolve()
         self.config = config or CompactionConfig()
         self.lock = lock or threading.Lock()
         self.model_name = model_name
+        self.calibration_path = calibration_path.resolve() if calibration_path else None
+        self._shared_calibration: dict[str, CalibrationProfile] = {}
+        self._shared_calibration_mtime_ns: int | None = None
         self._recovery_summarizer_agent: Any | None = None
         self._recovery_notifier: Callable[[str], None] | None = None
         ensure_layout(self.state_root)
+        self._journal = StateJournal(self.state_root)
+        self._projection_cache = ProjectionSnapshotCache(
+            model_name=self.model_name,
+            token_counts=load_token_counts(self.state_root, model_name=self.model_name),
+        )
+        with self.lock:
+            self._journal.recover()
         self._engine = CollapseEngine(
             state_root=self.state_root,
             config=self.config,
@@ -80,6 +102,9 @@ class HistoryCompactionManager:
             model_name=self.model_name,
             load_turns=self.load_turns,
             load_state=self.load_state,
+            journal=self._journal,
+            load_shared_calibration=self.load_shared_calibration,
+            projection_cache=self._projection_cache,
         )
 
     def build_history_processor(
@@ -112,15 +137,29 @@ class HistoryCompactionManager:
     def load_state(self) -> CollapseState:
         return load_state(self.state_root)
 
+    def load_shared_calibration(self) -> dict[str, CalibrationProfile]:
+        if self.calibration_path is None:
+            return {}
+        try:
+            mtime_ns = self.calibration_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime_ns != self._shared_calibration_mtime_ns:
+            self._shared_calibration = load_calibration_profiles(self.calibration_path)
+            self._shared_calibration_mtime_ns = mtime_ns
+        return self._shared_calibration
+
     def clear_state(self) -> None:
         with self.lock:
             reset_state_root(self.state_root)
+            self._projection_cache.reset()
 
     def raw_message_history(self) -> list[ModelMessage]:
-        return flatten_turns(self.load_turns())
+        return self._projection_cache.raw_messages(self.load_turns())
 
     def preview_projected_history(self) -> ProjectedHistory:
-        return build_projected_history(self.load_turns(), self.load_state())
+        projected, _ = self._projection_cache.project(self.load_turns(), self.load_state())
+        return projected
 
     def prepare_projected_history_for_run(
         self,
@@ -133,10 +172,19 @@ class HistoryCompactionManager:
         self._raise_if_request_exceeds_fail_threshold(budget)
         return budget.projected_messages
 
+    def prepare_request_budget(
+        self,
+        *,
+        pending_messages: Sequence[ModelMessage] | None = None,
+    ) -> tuple[RequestBudget, RecoveryRunResult | None]:
+        return self._prepare_request_budget_with_recovery(
+            pending_messages=list(pending_messages or []),
+        )
+
     def project_request_messages(self, incoming: Sequence[ModelMessage]) -> list[ModelMessage]:
         with self.lock:
             turns = self.load_turns()
-            raw = flatten_turns(turns)
+            raw = self._projection_cache.raw_messages(turns)
             pending = self._pending_suffix(raw, list(incoming))
         budget, _ = self._prepare_request_budget_with_recovery(pending_messages=pending)
         self._raise_if_request_exceeds_fail_threshold(budget)
@@ -151,6 +199,7 @@ class HistoryCompactionManager:
         actual_input_tokens: int | None = None,
         actual_output_tokens: int | None = None,
         request_count: int | None = None,
+        actual_cache_read_tokens: int | None = None,
     ) -> TurnRecord:
         with self.lock:
             state = self.load_state()
@@ -170,25 +219,55 @@ class HistoryCompactionManager:
                 request_count=request_count,
             )
             append_turn(self.state_root, record)
-            if (
-                actual_input_tokens is not None
-                and estimated_request_input_tokens is not None
-                and estimated_request_input_tokens > 0
-                and (request_count is None or request_count == 1)
-            ):
-                state.calibration = self._update_calibration(
-                    state.calibration,
-                    estimated_request_input_tokens=estimated_request_input_tokens,
-                    actual_input_tokens=actual_input_tokens,
-                    actual_output_tokens=actual_output_tokens,
-                    request_count=request_count,
+            samples = self._calibration_samples(
+                new_messages,
+                estimated_request_input_tokens=estimated_request_input_tokens,
+                actual_input_tokens=actual_input_tokens,
+                request_count=request_count,
+            )
+            calibration = state.calibration
+            if samples:
+                calibration = apply_calibration_samples(
+                    calibration,
+                    samples,
+                    model_name=self.model_name,
+                ).model_copy(
+                    update={
+                        "last_estimated_request_input_tokens": estimated_request_input_tokens,
+                        "last_actual_input_tokens": actual_input_tokens,
+                        "last_actual_output_tokens": actual_output_tokens,
+                        "last_request_count": request_count,
+                    },
+                )
+                self._record_shared_calibration(samples)
+            if actual_cache_read_tokens is not None:
+                calibration = calibration.model_copy(
+                    update={"last_actual_cache_read_tokens": actual_cache_read_tokens},
                 )
-                save_state(self.state_root, state)
+            if calibration != state.calibration:
+                self._journal.record(state, "calibration", calibration=calibration.model_dump(mode="json"))
             return record
 
     def stage_if_needed(self, summarizer_agent: Any) -> StageRunResult:
         return self._engine.stage_if_needed(summarizer_agent)
 
+    def archive_if_needed(self) -> ArchiveSegment | None:
+        if self.config.archive_min_turns <= 0:
+            return None
+        with self.lock:
+            segment = archive_collapsed_turns(
+                self.state_root,
+                self.load_turns(),
+                self.load_state(),
+                min_turns=self.config.archive_min_turns,
+            )
+            if segment is not None:
+                self._projection_cache.reset()
+        return segment
+
+    def iter_history_turns(self) -> Iterator[TurnRecord]:
+        return iter_history_turns(self.state_root, iter_turns(self.state_root))
+
     def recover_request_budget(
         self,
         *,
@@ -203,11 +282,29 @@ class HistoryCompactionManager:
         )
 
     def render_raw_history(self) -> str:
-        return render_turns(self.load_turns())
+        return "\n\n".join(self.iter_raw_history_blocks())
 
     def render_projected_history(self) -> str:
+        return "\n\n".join(self.iter_projected_history_blocks())
+
+    def iter_raw_history_blocks(self, selection: PageSelection | None = None) -> Iterator[str]:
+        selection = selection or PageSelection()
+        rendered = False
+        for block in iter_turn_blocks(select_page(self.iter_history_turns(), selection)):
+            rendered = True
+            yield block
+        if not rendered:
+            yield "(no turns recorded)" if selection.is_full else "(no turns in the selected range)"
+
+    def iter_projected_history_blocks(self, selection: PageSelection | None = None) -> Iterator[str]:
+        selection = selection or PageSelection()
         projected = self.preview_projected_history()
-        return render_projected_messages(projected.messages)
+        rendered = False
+        for block in iter_projected_message_blocks(select_page(projected.messages, selection)):
+            rendered = True
+            yield block
+        if not rendered:
+            yield "(projected history is empty)" if selection.is_full else "(no messages in the selected range)"
 
     def render_staged_spans(self) -> str:
         return render_staged_spans(self.load_state())
@@ -223,6 +320,7 @@ class HistoryCompactionManager:
             config=self.config,
             state=state,
             budget=budget,
+            archive=load_archive_index(self.state_root),
         )
 
     def _prepare_request_budget_with_recovery(
@@ -230,11 +328,13 @@ class HistoryCompactionManager:
         *,
         pending_messages: list[ModelMessage],
     ) -> tuple[RequestBudget, RecoveryRunResult | None]:
-        return self._engine.prepare_request_budget_with_recovery(
+        budget, recovery = self._engine.prepare_request_budget_with_recovery(
             pending_messages=pending_messages,
             recovery_summarizer_agent=self._recovery_summarizer_agent,
             recovery_notifier=self._recovery_notifier,
         )
+        self._engine.record_request_prefix(budget)
+        return budget, recovery
 
     def _pending_suffix(
         self,
@@ -259,36 +359,48 @@ class HistoryCompactionManager:
             return False
         return serialize_model_messages(left) == serialize_model_messages(right)
 
-    def _update_calibration(
+    def _calibration_samples(
         self,
-        calibration: CalibrationStats,
+        new_messages: Sequence[ModelMessage],
         *,
-        estimated_request_input_tokens: int,
-        actual_input_tokens: int,
-        actual_output_tokens: int | None,
+        estimated_request_input_tokens: int | None,
+        actual_input_tokens: int | None,
         request_count: int | None,
-    ) -> CalibrationStats:
-        observed_ratio = actual_input_tokens / estimated_request_input_tokens
-        previous_samples = calibration.samples
-        next_samples = previous_samples + 1
-        if previous_samples == 0:
-            smoothed_ratio = observed_ratio
-        else:
-            smoothed_ratio = (
-                (1.0 - CALIBRATION_ALPHA) * calibration.input_calibration_factor
-            ) + (CALIBRATION_ALPHA * observed_ratio)
-        bounded_ratio = min(
-            MAX_INPUT_CALIBRATION_FACTOR,
-            max(MIN_INPUT_CALIBRATION_FACTOR, smoothed_ratio),
+    ) -> list[CalibrationSample]:
+        if estimated_request_input_tokens is None or estimated_request_input_tokens <= 0:
+            return []
+        samples = collect_request_samples(
+            new_messages,
+            estimated_first_request_tokens=estimated_request_input_tokens,
+            model_name=self.model_name,
         )
-        return CalibrationStats(
-            samples=next_samples,
-            input_calibration_factor=bounded_ratio,
-            last_estimated_request_input_tokens=estimated_request_input_tokens,
-            last_actual_input_tokens=actual_input_tokens,
-            last_actual_output_tokens=actual_output_tokens,
-            last_request_count=request_count,
+        if samples:
+            return samples
+        if actual_input_tokens is None or (request_count is not None and request_count != 1):
+            return []
+        return [
+            CalibrationSample(
+                shape=message_shape(list(new_messages)[:1]),
+                estimated_input_tokens=estimated_request_input_tokens,
+                actual_input_tokens=actual_input_tokens,
+            ),
+        ]
+
+    def _record_shared_calibration(self, samples: Sequence[CalibrationSample]) -> None:
+        if self.calibration_path is None:
+            return
+        file_lock = (
+            FileLock(self.calibration_path.with_suffix(".lock"))
+            if file_locking_available()
+            else nullcontext()
         )
+        with file_lock:
+            merged = merge_shared_calibration_samples(
+                load_calibration_profiles(self.calibration_path),
+                samples,
+                model_name=self.model_name,
+            )
+            save_calibration_profiles(self.calibration_path, merged)
 
     def _raise_if_request_exceeds_fail_threshold(self, budget: RequestBudget) -> None:
         if budget.request_tokens > self.config.fail_threshold:
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -20,6 +20,7 @@ class TurnRecord(BaseModel):
     actual_input_tokens: int | None = None
     actual_output_tokens: int | None = None
     request_count: int | None = None
+    archived: bool = False
 
 
 class StagedSpan(BaseModel):
@@ -42,6 +43,7 @@ class CommittedSpan(BaseModel):
     summary_text: str
     projected_message_text: str
     committed_at: datetime = Field(default_factory=utc_now)
+    source: Literal["summarizer", "extractive"] = "summarizer"
 
 
 class CollapseHealth(BaseModel):
@@ -49,16 +51,40 @@ class CollapseHealth(BaseModel):
     staging_failures: int = 0
     empty_stage_runs: int = 0
     committed_from_staging: int = 0
+    stale_stage_results: int = 0
+    extractive_runs: int = 0
+    extractive_commits: int = 0
     last_error: str | None = None
 
 
+class CalibrationProfile(BaseModel):
+    samples: int = 0
+    input_calibration_factor: float = 1.0
+    updated_at: datetime = Field(default_factory=utc_now)
+
+
 class CalibrationStats(BaseModel):
     samples: int = 0
     input_calibration_factor: float = 1.0
+    profiles: dict[str, CalibrationProfile] = Field(default_factory=dict)
     last_estimated_request_input_tokens: int | None = None
     last_actual_input_tokens: int | None = None
     last_actual_output_tokens: int | None = None
     last_request_count: int | None = None
+    last_actual_cache_read_tokens: int | None = None
+    projection_epoch: int = 0
+    last_projected_digest_count: int = 0
+    last_projected_prefix_hash: str | None = None
+    last_cached_prefix_tokens: int | None = None
+    prefix_tracked_requests: int = 0
+    prefix_tracked_request_tokens: int = 0
+    estimated_cached_prefix_tokens: int = 0
+
+    @property
+    def estimated_prefix_cache_ratio(self) -> float:
+        if self.prefix_tracked_request_tokens <= 0:
+            return 0.0
+        return self.estimated_cached_prefix_tokens / self.prefix_tracked_request_tokens
 
 
 class RecoveryRunResult(BaseModel):
@@ -73,6 +99,7 @@ class RecoveryRunResult(BaseModel):
 
 
 class CollapseState(BaseModel):
+    version: int = 0
     committed_spans: list[CommittedSpan] = Field(default_factory=list)
     staged_spans: list[StagedSpan] = Field(default_factory=list)
     under_pressure: bool = False
@@ -83,6 +110,36 @@ class CollapseState(BaseModel):
     last_recovery: RecoveryRunResult = Field(default_factory=RecoveryRunResult)
 
 
+class ArchivedRange(BaseModel):
+    collapse_id: str
+    start_turn_id: str
+    end_turn_id: str
+    turn_count: int
+
+
+class ArchiveSegment(BaseModel):
+    segment_id: int
+    filename: str
+    codec: Literal["zstd", "gzip"]
+    turn_count: int
+    raw_bytes: int
+    stored_bytes: int
+    created_at: datetime = Field(default_factory=utc_now)
+    ranges: list[ArchivedRange] = Field(default_factory=list)
+
+
+class ArchiveIndex(BaseModel):
+    segments: list[ArchiveSegment] = Field(default_factory=list)
+
+    @property
+    def archived_turns(self) -> int:
+        return sum(segment.turn_count for segment in self.segments)
+
+    @property
+    def next_segment_id(self) -> int:
+        return max((segment.segment_id for segment in self.segments), default=0) + 1
+
+
 class StageSummary(BaseModel):
     summary_text: str
     risk: float = 0.25
@@ -122,6 +179,10 @@ class CompactionConfig:
     max_stage_turns: int = 6
     max_emergency_stage_chunks: int = 3
     max_emergency_stage_seconds: float = 10.0
+    expected_summary_ratio: float = 0.15
+    projection_policy: Literal["eager", "epoch"] = "eager"
+    epoch_target_ratio: float = 0.70
+    archive_min_turns: int = 0
 
     @property
     def pressure_threshold(self) -> int:
@@ -135,6 +196,16 @@ class CompactionConfig:
     def target_threshold(self) -> int:
         return max(1, int(self.context_window * self.target_ratio))
 
+    @property
+    def epoch_target_threshold(self) -> int:
+        return max(1, int(self.context_window * min(self.epoch_target_ratio, self.target_ratio)))
+
+    @property
+    def commit_target_threshold(self) -> int:
+        if self.projection_policy == "epoch":
+            return self.epoch_target_threshold
+        return self.target_threshold
+
     @property
     def guard_threshold(self) -> int:
         return max(1, int(self.context_window * self.guard_ratio))
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+PAGE_USAGE = "expected no argument, a 1-based range like '100-200' or '100-', or '--tail N'"
+
+
+@dataclass(slots=True)
+class PageSelection:
+    start: int | None = None
+    end: int | None = None
+    tail: int | None = None
+
+    @property
+    def is_full(self) -> bool:
+        return self.start is None and self.end is None and self.tail is None
+
+
+def parse_page_selection(argument: str) -> PageSelection:
+    tokens = argument.split()
+    if not tokens:
+        return PageSelection()
+    if tokens[0] == "--tail":
+        if len(tokens) != 2:
+            raise ValueError(PAGE_USAGE)
+        return PageSelection(tail=_positive_int(tokens[1]))
+    if len(tokens) != 1:
+        raise ValueError(PAGE_USAGE)
+    start_text, separator, end_text = tokens[0].partition("-")
+    start = _positive_int(start_text)
+    if not separator:
+        return PageSelection(start=start, end=start)
+    end = _positive_int(end_text) if end_text else None
+    if end is not None and end < start:
+        raise ValueError(f"range end {end} is before start {start}")
+    return PageSelection(start=start, end=end)
+
+
+def select_page[T](items: Iterable[T], selection: PageSelection) -> Iterator[tuple[int, T]]:
+    numbered = enumerate(items, start=1)
+    if selection.tail is not None:
+        # Only the last N items are held, however long the source is.
+        yield from deque(numbered, maxlen=selection.tail)
+        return
+    start = selection.start or 1
+    for number, item in numbered:
+        if number < start:
+            continue
+        if selection.end is not None and number > selection.end:
+            return
+        yield number, item
+
+
+def _positive_int(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(PAGE_USAGE) from None
+    if value < 1:
+        raise ValueError(PAGE_USAGE)
+    return value
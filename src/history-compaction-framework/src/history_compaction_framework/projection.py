@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
+import hashlib
 import json
 from typing import Any
 
 from pydantic_ai.messages import ModelMessage, ModelRequest, UserPromptPart
 
 from .models import CollapseState, CommittedSpan, TurnRecord
+from .token_estimation import iter_part_text
 
 
 @dataclass(slots=True)
@@ -74,27 +76,72 @@ def build_projected_summary_request(span: CommittedSpan) -> ModelRequest:
     )
 
 
+def provider_message_digest(message: ModelMessage) -> str:
+    digest = hashlib.sha1(message.kind.encode("utf-8"))
+    instructions = getattr(message, "instructions", None)
+    if instructions:
+        digest.update(b"\x00instructions\x00")
+        digest.update(instructions.encode("utf-8"))
+    for part in message.parts:
+        digest.update(b"\x00part\x00")
+        for chunk in iter_part_text(part):
+            digest.update(chunk.encode("utf-8"))
+            digest.update(b"\x1f")
+    return digest.hexdigest()[:16]
+
+
+def projected_prefix_hash(digests: Sequence[str]) -> str:
+    digest = hashlib.sha1()
+    for item in digests:
+        digest.update(item.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:16]
+
+
+def shared_prefix_length(left: Sequence[str], right: Sequence[str]) -> int:
+    shared = 0
+    for left_item, right_item in zip(left, right, strict=False):
+        if left_item != right_item:
+            break
+        shared += 1
+    return shared
+
+
 def render_turns(turns: Sequence[TurnRecord]) -> str:
     if not turns:
         return "(no turns recorded)"
-    sections = []
-    for turn in turns:
-        sections.append(f"=== {turn.turn_id} @ {turn.timestamp.isoformat()} ===")
-        sections.append(f"[user]\n{turn.user_text}")
-        sections.append("[messages]")
-        sections.append(json.dumps(turn.messages, indent=2, default=str))
-    return "\n\n".join(sections)
+    return "\n\n".join(iter_turn_blocks(enumerate(turns, start=1)))
+
+
+def iter_turn_blocks(numbered_turns: Iterable[tuple[int, TurnRecord]]) -> Iterator[str]:
+    for number, turn in numbered_turns:
+        yield "\n\n".join(
+            [
+                f"=== turn {number}: {turn.turn_id} @ {turn.timestamp.isoformat()} ===",
+                f"[user]\n{turn.user_text}",
+                "[messages]",
+                json.dumps(turn.messages, indent=2, default=str),
+            ],
+        )
 
 
 def render_projected_messages(messages: Sequence[ModelMessage]) -> str:
     if not messages:
         return "(projected history is empty)"
-    lines: list[str] = []
-    for index, message in enumerate(messages, start=1):
-        lines.append(f"=== message {index} ===")
-        lines.append(type(message).__name__)
-        lines.append(json.dumps(message_to_jsonable(message), indent=2, default=str))
-    return "\n\n".join(lines)
+    return "\n\n".join(iter_projected_message_blocks(enumerate(messages, start=1)))
+
+
+def iter_projected_message_blocks(
+    numbered_messages: Iterable[tuple[int, ModelMessage]],
+) -> Iterator[str]:
+    for index, message in numbered_messages:
+        yield "\n\n".join(
+            [
+                f"=== message {index} ===",
+                type(message).__name__,
+                json.dumps(message_to_jsonable(message), indent=2, default=str),
+            ],
+        )
 
 
 def message_to_jsonable(message: ModelMessage) -> dict[str, Any]:
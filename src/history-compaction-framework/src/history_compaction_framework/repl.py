@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from pathlib import Path
 
+from .paging import parse_page_selection
 from .session import CompactedSession
 
 
@@ -10,8 +12,10 @@ HELP_TEXT = "\n".join(
         "Commands:",
         "  /help       Show this help text",
         "  /clear      Start fresh by wiping raw history and collapse state",
-        "  /raw        Print the canonical raw history",
+        "  /raw        Print the canonical raw history, including archived turns",
+        "              /raw 100-200, /raw 100-, /raw --tail 20 print a page of turns",
         "  /projected  Print the current projected provider-facing history",
+        "              /projected 1-10, /projected --tail 20 print a page of messages",
         "  /staged     Print staged spans",
         "  /committed  Print committed spans",
         "  /state      Print thresholds, estimates, and health counters",
@@ -49,6 +53,13 @@ def run_repl(*, session: CompactedSession, state_root: Path) -> None:
         print(f"\nAssistant: {assistant_text}")
 
 
+def print_blocks(blocks: Iterable[str]) -> None:
+    for index, block in enumerate(blocks):
+        if index:
+            print()
+        print(block, flush=True)
+
+
 def handle_command(session: CompactedSession, command: str) -> bool:
     manager = session.manager
     if command == "/help":
@@ -58,11 +69,19 @@ def handle_command(session: CompactedSession, command: str) -> bool:
         session.clear()
         print("Cleared raw history and collapse state.")
         return True
-    if command == "/raw":
-        print(manager.render_raw_history())
-        return True
-    if command == "/projected":
-        print(manager.render_projected_history())
+    name, _, argument = command.partition(" ")
+    if name in {"/raw", "/projected"}:
+        try:
+            selection = parse_page_selection(argument)
+        except ValueError as exc:
+            print(f"{name}: {exc}")
+            return True
+        blocks = (
+            manager.iter_raw_history_blocks(selection)
+            if name == "/raw"
+            else manager.iter_projected_history_blocks(selection)
+        )
+        print_blocks(blocks)
         return True
     if command == "/staged":
         print(manager.render_staged_spans())
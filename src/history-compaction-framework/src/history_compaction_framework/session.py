@@ -8,6 +8,7 @@ from pydantic_ai.messages import ModelRequest, UserPromptPart
 
 from .agents import build_main_agent, build_summarizer_agent
 from .background import StageJob, StageRunner
+from .locking import StateLock
 from .manager import HistoryCompactionManager
 from .models import CompactionConfig
 from .token_estimation import estimate_model_messages
@@ -22,13 +23,16 @@ class CompactedSession:
         summarizer_agent: Any,
         model_name: str,
         config: CompactionConfig | None = None,
+        calibration_path: Path | None = None,
+        lock: StateLock | None = None,
     ) -> None:
-        self.lock = threading.Lock()
+        self.lock = lock or threading.Lock()
         self.manager = HistoryCompactionManager(
             state_root,
             config=config,
             lock=self.lock,
             model_name=model_name,
+            calibration_path=calibration_path,
         )
         self.main_agent = main_agent
         self.summarizer_agent = summarizer_agent
@@ -49,6 +53,8 @@ class CompactedSession:
         model: str,
         summary_model: str | None = None,
         config: CompactionConfig | None = None,
+        calibration_path: Path | None = None,
+        lock: StateLock | None = None,
     ) -> "CompactedSession":
         return cls(
             state_root=state_root,
@@ -56,6 +62,8 @@ class CompactedSession:
             summarizer_agent=build_summarizer_agent(summary_model or model),
             model_name=model,
             config=config,
+            calibration_path=calibration_path,
+            lock=lock,
         )
 
     def run_sync(self, user_text: str) -> str:
@@ -80,6 +88,7 @@ class CompactedSession:
             actual_input_tokens=usage.input_tokens,
             actual_output_tokens=usage.output_tokens,
             request_count=usage.requests,
+            actual_cache_read_tokens=usage.cache_read_tokens,
         )
         self.stage_runner.submit(StageJob(reason="post-turn"))
         return result.output
@@ -100,6 +109,7 @@ class CompactedSession:
 
     def _run_stage_job(self, job: StageJob) -> None:
         self.manager.stage_if_needed(self.summarizer_agent)
+        self.manager.archive_if_needed()
 
     def _notify_recovery(self, message: str) -> None:
         if self._recovery_notifier is not None:
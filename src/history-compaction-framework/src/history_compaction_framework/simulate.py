@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import tempfile
+import threading
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.usage import RequestUsage
+
+from .archive import iter_history_turns
+from .manager import HistoryCompactionManager
+from .models import CompactionConfig, StageSummary, TurnRecord
+from .storage import deserialize_model_messages, iter_turns
+from .token_estimation import estimate_text_tokens
+
+
+@dataclass(slots=True)
+class StubResult:
+    output: StageSummary
+
+
+class StubSummarizer:
+    def __init__(self, *, compression_ratio: float, model_name: str | None) -> None:
+        self.compression_ratio = compression_ratio
+        self.model_name = model_name
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def run_sync(self, prompt: str) -> StubResult:
+        prompt_tokens = estimate_text_tokens(prompt, model_name=self.model_name)
+        summary_tokens = max(1, int(prompt_tokens * self.compression_ratio))
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += prompt_tokens
+            self.output_tokens += summary_tokens
+        return StubResult(output=StageSummary(summary_text=self._filler_text(summary_tokens)))
+
+    def _filler_text(self, tokens: int) -> str:
+        words = ["summary"] * tokens
+        estimated = estimate_text_tokens(" ".join(words), model_name=self.model_name)
+        if estimated > tokens:
+            # The character heuristic counts a word as more than one token.
+            words = words[: max(1, tokens * tokens // estimated)]
+        return " ".join(words)
+
+
+@dataclass(slots=True)
+class SimulationReport:
+    session: str
+    config: dict[str, Any]
+    turns: int
+    summarizer_calls: int
+    background_calls: int
+    recovery_calls: int
+    critical_path_recoveries: int
+    critical_path_seconds: float
+    extractive_commits: int
+    overflow_errors: int
+    peak_request_tokens: int
+    main_input_tokens: int
+    summarizer_input_tokens: int
+    summarizer_output_tokens: int
+    estimated_cost: float
+    estimated_prefix_cache_ratio: float
+
+
+def load_recorded_turns(path: Path) -> list[TurnRecord]:
+    if path.is_dir():
+        return list(iter_history_turns(path, iter_turns(path)))
+    return [
+        TurnRecord.model_validate_json(line)
+        for line in path.read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+
+
+def _without_usage(messages: Sequence[ModelMessage]) -> list[ModelMessage]:
+    # Recorded provider usage belongs to the original run's projection, not the
+    # simulated one, so replayed turns must not calibrate the estimator.
+    return [
+        replace(message, usage=RequestUsage()) if isinstance(message, ModelResponse) else message
+        for message in messages
+    ]
+
+
+def simulate_session(
+    turns: Sequence[TurnRecord],
+    config: CompactionConfig,
+    *,
+    session: str,
+    model_name: str | None,
+    compression_ratio: float,
+    latency_seconds: float,
+    input_price: float,
+    output_price: float,
+) -> SimulationReport:
+    summarizer = StubSummarizer(
+        compression_ratio=compression_ratio,
+        model_name=model_name,
+    )
+    recovery_calls = 0
+    critical_path_recoveries = 0
+    critical_path_seconds = 0.0
+    overflow_errors = 0
+    peak_request_tokens = 0
+    main_input_tokens = 0
+
+    with tempfile.TemporaryDirectory(prefix="compaction-sim-") as state_root:
+        manager = HistoryCompactionManager(
+            Path(state_root),
+            config=replace(config, archive_min_turns=0),
+            model_name=model_name,
+        )
+        manager.configure_recovery(summarizer_agent=summarizer)
+        for turn in turns:
+            messages = _without_usage(deserialize_model_messages(turn.messages))
+            pending = messages[:1]
+            calls_before = summarizer.calls
+            budget, recovery = manager.prepare_request_budget(pending_messages=pending)
+            calls = summarizer.calls - calls_before
+            if recovery is not None and calls > 0:
+                # Recoveries served from staged inventory never wait on the
+                # summarizer, so they are not on the critical path.
+                recovery_calls += calls
+                critical_path_recoveries += 1
+                waves = math.ceil(calls / max(1, config.max_emergency_stage_chunks))
+                critical_path_seconds += waves * latency_seconds
+            if budget.request_tokens > config.fail_threshold:
+                overflow_errors += 1
+            peak_request_tokens = max(peak_request_tokens, budget.request_tokens)
+            main_input_tokens += budget.request_tokens
+            manager.record_turn(turn.user_text, messages)
+            manager.stage_if_needed(summarizer)
+        state = manager.load_state()
+
+    return SimulationReport(
+        session=session,
+        config=asdict(config),
+        turns=len(turns),
+        summarizer_calls=summarizer.calls,
+        background_calls=summarizer.calls - recovery_calls,
+        recovery_calls=recovery_calls,
+        critical_path_recoveries=critical_path_recoveries,
+        critical_path_seconds=round(critical_path_seconds, 3),
+        extractive_commits=state.health.extractive_commits,
+        overflow_errors=overflow_errors,
+        peak_request_tokens=peak_request_tokens,
+        main_input_tokens=main_input_tokens,
+        summarizer_input_tokens=summarizer.input_tokens,
+        summarizer_output_tokens=summarizer.output_tokens,
+        estimated_cost=round(
+            ((main_input_tokens + summarizer.input_tokens) * input_price
+             + summarizer.output_tokens * output_price) / 1_000_000,
+            4,
+        ),
+        estimated_prefix_cache_ratio=round(state.calibration.estimated_prefix_cache_ratio, 4),
+    )
+
+
+def config_grid(args: argparse.Namespace) -> list[CompactionConfig]:
+    grid = itertools.product(
+        args.context_window,
+        args.stage_ratio,
+        args.target_ratio,
+        args.guard_ratio,
+        args.max_stage_turns,
+        args.projection_policy,
+    )
+    return [
+        CompactionConfig(
+            context_window=context_window,
+            stage_ratio=stage_ratio,
+            target_ratio=target_ratio,
+            guard_ratio=guard_ratio,
+            max_stage_turns=max_stage_turns,
+            projection_policy=projection_policy,
+        )
+        for context_window, stage_ratio, target_ratio, guard_ratio, max_stage_turns, projection_policy in grid
+    ]
+
+
+def render_reports(reports: Sequence[SimulationReport]) -> str:
+    headers = [
+        "session",
+        "window",
+        "stage",
+        "target",
+        "guard",
+        "max_turns",
+        "policy",
+        "calls",
+        "recoveries",
+        "crit_s",
+        "extractive",
+        "overflows",
+        "peak",
+        "cache",
+        "cost",
+    ]
+    rows = [
+        [
+            report.session,
+            str(report.config["context_window"]),
+            f"{report.config['stage_ratio']:.2f}",
+            f"{report.config['target_ratio']:.2f}",
+            f"{report.config['guard_ratio']:.2f}",
+            str(report.config["max_stage_turns"]),
+            report.config["projection_policy"],
+            str(report.summarizer_calls),
+            str(report.critical_path_recoveries),
+            f"{report.critical_path_seconds:.1f}",
+            str(report.extractive_commits),
+            str(report.overflow_errors),
+            str(report.peak_request_tokens),
+            f"{report.estimated_prefix_cache_ratio:.2f}",
+            f"{report.estimated_cost:.4f}",
+        ]
+        for report in reports
+    ]
+    widths = [max(len(row[index]) for row in [headers, *rows]) for index in range(len(headers))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)).rstrip()
+        for row in [headers, *rows]
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(argv)
+    reports: list[SimulationReport] = []
+    for path in args.sessions:
+        turns = load_recorded_turns(path)
+        for config in config_grid(args):
+            reports.append(
+                simulate_session(
+                    turns,
+                    config,
+                    session=str(path),
+                    model_name=args.model,
+                    compression_ratio=args.compression_ratio,
+                    latency_seconds=args.summary_latency,
+                    input_price=args.input_price,
+                    output_price=args.output_price,
+                ),
+            )
+    if args.json:
+        print(json.dumps([asdict(report) for report in reports], indent=2))
+    else:
+        print(render_reports(reports))
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="history-compaction-framework simulate",
+        description=(
+            "Replay recorded sessions under a grid of compaction configs with a stub summarizer "
+            "and report summarizer calls, critical-path recoveries, peak request tokens, and cost."
+        ),
+    )
+    parser.add_argument(
+        "sessions",
+        nargs="+",
+        type=Path,
+        help="Recorded history.jsonl files or state roots (archived turns are expanded).",
+    )
+    parser.add_argument("--model", default=None, help="Model name used for token estimation.")
+    parser.add_argument("--context-window", type=_int_list, default=[4_000], help="Comma-separated values.")
+    parser.add_argument("--stage-ratio", type=_float_list, default=[0.88], help="Comma-separated values.")
+    parser.add_argument("--target-ratio", type=_float_list, default=[0.90], help="Comma-separated values.")
+    parser.add_argument("--guard-ratio", type=_float_list, default=[0.95], help="Comma-separated values.")
+    parser.add_argument("--max-stage-turns", type=_int_list, default=[6], help="Comma-separated values.")
+    parser.add_argument(
+        "--projection-policy",
+        type=_policy_list,
+        default=["eager"],
+        help="Comma-separated values from 'eager' and 'epoch'.",
+    )
+    parser.add_argument(
+        "--compression-ratio",
+        type=float,
+        default=0.05,
+        help=(
+            "Stub summary tokens per summarizer prompt token. The prompt renders turns as "
+            "indented JSON, so 0.05 is roughly a 5:1 reduction of the turns' payload."
+        ),
+    )
+    parser.add_argument(
+        "--summary-latency",
+        type=float,
+        default=2.0,
+        help="Modeled seconds per stub summarizer call; only recovery calls count toward the critical path.",
+    )
+    parser.add_argument("--input-price", type=float, default=1.25, help="Price per million input tokens.")
+    parser.add_argument("--output-price", type=float, default=10.0, help="Price per million output tokens.")
+    parser.add_argument("--json", action="store_true", help="Print reports as JSON instead of a table.")
+    return parser.parse_args(argv)
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _float_list(value: str) -> list[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def _policy_list(value: str) -> list[str]:
+    policies = [item.strip() for item in value.split(",") if item.strip()]
+    for policy in policies:
+        if policy not in {"eager", "epoch"}:
+            raise argparse.ArgumentTypeError(f"unknown projection policy: {policy!r}")
+    return policies
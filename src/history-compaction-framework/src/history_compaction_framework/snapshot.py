@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+from pydantic_ai.messages import ModelMessage
+
+from .models import CollapseState, CommittedSpan, TurnRecord
+from .projection import ProjectedHistory, build_projected_summary_request, flatten_turns
+from .token_estimation import estimate_model_messages
+
+
+@dataclass(slots=True)
+class ProjectedSegment:
+    turn_ids: list[str]
+    messages: list[ModelMessage]
+    raw_tokens: int
+    collapse_id: str | None = None
+
+
+@dataclass(slots=True)
+class ProjectionSnapshot:
+    turn_count: int
+    first_turn_id: str | None
+    last_turn_id: str | None
+    collapse_ids: tuple[str, ...]
+    segments: list[ProjectedSegment] = field(default_factory=list)
+
+    @property
+    def raw_tokens(self) -> int:
+        return sum(segment.raw_tokens for segment in self.segments)
+
+    def projected_tokens(self, calibration_factor: float) -> int:
+        return int(self.raw_tokens * max(1.0, calibration_factor))
+
+    def to_projected_history(self) -> ProjectedHistory:
+        messages: list[ModelMessage] = []
+        covered_turn_ids: list[str] = []
+        for segment in self.segments:
+            messages.extend(segment.messages)
+            covered_turn_ids.extend(segment.turn_ids)
+        return ProjectedHistory(messages=messages, covered_turn_ids=covered_turn_ids)
+
+
+class ProjectionSnapshotCache:
+    def __init__(
+        self,
+        *,
+        model_name: str | None,
+        token_counts: Mapping[str, int] | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.token_counts = dict(token_counts or {})
+        self._lock = threading.Lock()
+        self._snapshot: ProjectionSnapshot | None = None
+        self._turn_messages: dict[str, list[ModelMessage]] = {}
+        self.rebuilds = 0
+        self.incremental_updates = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._turn_messages = {}
+
+    def project(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+    ) -> tuple[ProjectedHistory, ProjectionSnapshot]:
+        with self._lock:
+            snapshot = self._update(turns, state)
+            self._snapshot = snapshot
+            return snapshot.to_projected_history(), snapshot
+
+    def raw_messages(self, turns: Sequence[TurnRecord]) -> list[ModelMessage]:
+        with self._lock:
+            messages: list[ModelMessage] = []
+            for turn in turns:
+                messages.extend(self._messages_for_turn(turn))
+            return messages
+
+    def _update(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+    ) -> ProjectionSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or not self._extends(snapshot, turns):
+            return self._rebuild(turns, state)
+
+        known_ids = set(snapshot.collapse_ids)
+        current_ids = {span.collapse_id for span in state.committed_spans}
+        if not known_ids <= current_ids:
+            return self._rebuild(turns, state)
+
+        segments = list(snapshot.segments)
+        for turn in turns[snapshot.turn_count :]:
+            segments.append(self._raw_segment(turn))
+
+        new_spans = sorted(
+            (span for span in state.committed_spans if span.collapse_id not in known_ids),
+            key=lambda span: (span.committed_at, span.collapse_id),
+        )
+        for span in new_spans:
+            spliced = self._splice_span(segments, span)
+            if spliced is None:
+                return self._rebuild(turns, state)
+            segments = spliced
+
+        self.incremental_updates += 1
+        return self._snapshot_for(turns, state, segments)
+
+    def _rebuild(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+    ) -> ProjectionSnapshot:
+        live_turn_ids = {turn.turn_id for turn in turns if not turn.archived}
+        self._turn_messages = {
+            turn_id: messages
+            for turn_id, messages in self._turn_messages.items()
+            if turn_id in live_turn_ids
+        }
+        turn_index = {turn.turn_id: index for index, turn in enumerate(turns)}
+        committed = sorted(
+            state.committed_spans,
+            key=lambda span: (turn_index.get(span.start_turn_id, 10**9), span.committed_at),
+        )
+        span_by_start = {span.start_turn_id: span for span in committed}
+
+        segments: list[ProjectedSegment] = []
+        applied: set[str] = set()
+        index = 0
+        while index < len(turns):
+            turn = turns[index]
+            span = span_by_start.get(turn.turn_id)
+            end_index = turn_index.get(span.end_turn_id) if span is not None else None
+            if span is None or end_index is None or end_index < index:
+                segments.append(self._raw_segment(turn))
+                index += 1
+                continue
+            segments.append(
+                self._summary_segment(
+                    span,
+                    [covered.turn_id for covered in turns[index : end_index + 1]],
+                ),
+            )
+            applied.add(span.collapse_id)
+            index = end_index + 1
+
+        self.rebuilds += 1
+        snapshot = self._snapshot_for(turns, state, segments)
+        if len(applied) != len(state.committed_spans):
+            # Spans that do not project cleanly cannot be tracked incrementally.
+            snapshot.collapse_ids = ()
+            snapshot.turn_count = -1
+        return snapshot
+
+    def _splice_span(
+        self,
+        segments: list[ProjectedSegment],
+        span: CommittedSpan,
+    ) -> list[ProjectedSegment] | None:
+        start = next(
+            (
+                position
+                for position, segment in enumerate(segments)
+                if segment.collapse_id is None and segment.turn_ids[0] == span.start_turn_id
+            ),
+            None,
+        )
+        if start is None:
+            return None
+        end = None
+        for position in range(start, len(segments)):
+            segment = segments[position]
+            if segment.collapse_id is not None:
+                return None
+            if segment.turn_ids[-1] == span.end_turn_id:
+                end = position
+                break
+        if end is None:
+            return None
+        covered_turn_ids = [
+            turn_id
+            for segment in segments[start : end + 1]
+            for turn_id in segment.turn_ids
+        ]
+        return [
+            *segments[:start],
+            self._summary_segment(span, covered_turn_ids),
+            *segments[end + 1 :],
+        ]
+
+    def _extends(self, snapshot: ProjectionSnapshot, turns: Sequence[TurnRecord]) -> bool:
+        if snapshot.turn_count < 0 or len(turns) < snapshot.turn_count:
+            return False
+        if snapshot.turn_count == 0:
+            return True
+        return (
+            turns[0].turn_id == snapshot.first_turn_id
+            and turns[snapshot.turn_count - 1].turn_id == snapshot.last_turn_id
+        )
+
+    def _snapshot_for(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+        segments: list[ProjectedSegment],
+    ) -> ProjectionSnapshot:
+        return ProjectionSnapshot(
+            turn_count=len(turns),
+            first_turn_id=turns[0].turn_id if turns else None,
+            last_turn_id=turns[-1].turn_id if turns else None,
+            collapse_ids=tuple(span.collapse_id for span in state.committed_spans),
+            segments=segments,
+        )
+
+    def _raw_segment(self, turn: TurnRecord) -> ProjectedSegment:
+        messages = self._messages_for_turn(turn)
+        raw_tokens = self.token_counts.get(turn.turn_id)
+        if raw_tokens is None:
+            raw_tokens = estimate_model_messages(
+                messages,
+                model_name=self.model_name,
+                calibration_factor=1.0,
+            )
+        return ProjectedSegment(
+            turn_ids=[turn.turn_id],
+            messages=messages,
+            raw_tokens=raw_tokens,
+        )
+
+    def _summary_segment(self, span: CommittedSpan, turn_ids: list[str]) -> ProjectedSegment:
+        message = build_projected_summary_request(span)
+        return ProjectedSegment(
+            turn_ids=turn_ids,
+            messages=[message],
+            raw_tokens=estimate_model_messages(
+                [message],
+                model_name=self.model_name,
+                calibration_factor=1.0,
+            ),
+            collapse_id=span.collapse_id,
+        )
+
+    def _messages_for_turn(self, turn: TurnRecord) -> list[ModelMessage]:
+        messages = self._turn_messages.get(turn.turn_id)
+        if messages is None:
+            messages = flatten_turns([turn])
+            self._turn_messages[turn.turn_id] = messages
+        return messages
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from collections.abc import Callable, Sequence
-import threading
 from typing import Any
 
 from .models import (
@@ -17,8 +16,10 @@ from .projection import (
     flatten_turns,
     render_turns_for_summary,
 )
+from .extractive import EXTRACTIVE_SOURCE, build_extractive_summary
+from .journal import StateJournal
+from .locking import StateLock
 from .prompts import build_projected_message_text, build_summary_prompt
-from .storage import save_state
 from .token_estimation import estimate_model_messages
 
 
@@ -28,15 +29,19 @@ class CollapseStager:
         *,
         state_root,
         config: CompactionConfig,
-        lock: threading.Lock,
+        lock: StateLock,
         model_name: str | None,
+        load_turns: Callable[[], list[TurnRecord]],
         load_state: Callable[[], CollapseState],
+        journal: StateJournal,
     ) -> None:
         self.state_root = state_root
         self.config = config
         self.lock = lock
         self.model_name = model_name
+        self._load_turns = load_turns
         self._load_state = load_state
+        self._journal = journal
 
     def select_next_stage_chunk(
         self,
@@ -46,17 +51,42 @@ class CollapseStager:
         chunks = self._stage_chunks(turns, state)
         return chunks[0] if chunks else []
 
+    def select_stage_chunks(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+    ) -> list[list[TurnRecord]]:
+        return self._stage_chunks(turns, state)
+
+    def estimate_chunk_savings(self, candidate: Sequence[TurnRecord]) -> int:
+        raw_tokens = 0
+        for turn in candidate:
+            if turn.estimated_turn_payload_tokens is not None:
+                raw_tokens += turn.estimated_turn_payload_tokens
+            else:
+                raw_tokens += estimate_model_messages(
+                    flatten_turns([turn]),
+                    model_name=self.model_name,
+                    calibration_factor=1.0,
+                )
+        return int(raw_tokens * max(0.0, 1.0 - self.config.expected_summary_ratio))
+
     def summarize_and_stage_candidate(
         self,
         candidate: Sequence[TurnRecord],
         *,
         summarizer_agent: Any,
+        base_version: int | None = None,
     ) -> tuple[StagedSpan | None, int]:
         summary = self._summarize_candidate(
             candidate,
             summarizer_agent=summarizer_agent,
         )
-        return self._stage_summary_for_candidate(candidate, summary)
+        return self._stage_summary_for_candidate(
+            candidate,
+            summary,
+            base_version=base_version,
+        )
 
     def commit_staged_spans_until_target(
         self,
@@ -71,25 +101,59 @@ class CollapseStager:
         if budget.request_tokens <= self.config.guard_threshold:
             return state, budget, committed_count
 
-        while budget.request_tokens > self.config.target_threshold and state.staged_spans:
+        commit_target = self.config.commit_target_threshold
+        while budget.request_tokens > commit_target and state.staged_spans:
             staged = sorted(
                 state.staged_spans,
                 key=lambda span: (span.staged_at, span.start_turn_id),
             )[0]
-            state.staged_spans = [span for span in state.staged_spans if span != staged]
-            collapse_id = self._next_collapse_id(state)
-            state.committed_spans.append(
-                CommittedSpan(
-                    collapse_id=collapse_id,
-                    start_turn_id=staged.start_turn_id,
-                    end_turn_id=staged.end_turn_id,
-                    summary_text=staged.summary_text,
-                    projected_message_text=build_projected_message_text(
-                        staged.summary_text
-                    ),
-                )
+            committed = CommittedSpan(
+                collapse_id=self._next_collapse_id(state),
+                start_turn_id=staged.start_turn_id,
+                end_turn_id=staged.end_turn_id,
+                summary_text=staged.summary_text,
+                projected_message_text=build_projected_message_text(
+                    staged.summary_text,
+                ),
+            )
+            self._journal.record(state, "commit", span=committed.model_dump(mode="json"))
+            committed_count += 1
+            budget = build_request_budget(
+                turns,
+                state,
+                pending_messages=pending_messages,
+            )
+
+        if committed_count:
+            calibration = state.calibration.model_copy(
+                update={"projection_epoch": state.calibration.projection_epoch + 1},
+            )
+            self._journal.record(state, "calibration", calibration=calibration.model_dump(mode="json"))
+        return state, budget, committed_count
+
+    def commit_extractive_spans_until_target(
+        self,
+        turns: Sequence[TurnRecord],
+        state: CollapseState,
+        *,
+        pending_messages,
+        budget,
+        build_request_budget: Callable[..., Any],
+    ) -> tuple[CollapseState, Any, int]:
+        committed_count = 0
+        for chunk in self._stage_chunks(turns, state):
+            if budget.request_tokens <= self.config.target_threshold:
+                break
+            summary_text = build_extractive_summary(chunk)
+            committed = CommittedSpan(
+                collapse_id=self._next_collapse_id(state),
+                start_turn_id=chunk[0].turn_id,
+                end_turn_id=chunk[-1].turn_id,
+                summary_text=summary_text,
+                projected_message_text=build_projected_message_text(summary_text),
+                source=EXTRACTIVE_SOURCE,
             )
-            state.health.committed_from_staging += 1
+            self._journal.record(state, "commit", span=committed.model_dump(mode="json"))
             committed_count += 1
             budget = build_request_budget(
                 turns,
@@ -97,7 +161,11 @@ class CollapseStager:
                 pending_messages=pending_messages,
             )
 
-        save_state(self.state_root, state)
+        if committed_count:
+            calibration = state.calibration.model_copy(
+                update={"projection_epoch": state.calibration.projection_epoch + 1},
+            )
+            self._journal.record(state, "calibration", calibration=calibration.model_dump(mode="json"))
         return state, budget, committed_count
 
     def estimate_span_savings(
@@ -130,9 +198,7 @@ class CollapseStager:
         return max(0, raw_tokens - projected_message_tokens)
 
     def _next_collapse_id(self, state: CollapseState) -> str:
-        collapse_id = f"{state.next_collapse_id:016d}"
-        state.next_collapse_id += 1
-        return collapse_id
+        return f"{state.next_collapse_id:016d}"
 
     def _span_exists(self, state: CollapseState, start_turn_id: str, end_turn_id: str) -> bool:
         for span in state.staged_spans:
@@ -197,8 +263,7 @@ class CollapseStager:
         )
         with self.lock:
             state = self._load_state()
-            state.health.staging_attempts += 1
-            save_state(self.state_root, state)
+            self._journal.record(state, "health", increments={"staging_attempts": 1})
 
         try:
             result = summarizer_agent.run_sync(prompt)
@@ -211,15 +276,20 @@ class CollapseStager:
         except Exception as exc:
             with self.lock:
                 state = self._load_state()
-                state.health.staging_failures += 1
-                state.health.last_error = str(exc)
-                save_state(self.state_root, state)
+                self._journal.record(
+                    state,
+                    "health",
+                    increments={"staging_failures": 1},
+                    last_error=str(exc),
+                )
             raise
 
     def _stage_summary_for_candidate(
         self,
         candidate: Sequence[TurnRecord],
         summary: StageSummary,
+        *,
+        base_version: int | None = None,
     ) -> tuple[StagedSpan | None, int]:
         staged = StagedSpan(
             start_turn_id=candidate[0].turn_id,
@@ -235,14 +305,31 @@ class CollapseStager:
         with self.lock:
             state = self._load_state()
             if self._span_exists(state, staged.start_turn_id, staged.end_turn_id):
-                save_state(self.state_root, state)
                 return None, 0
-            state.staged_spans.append(staged)
-            state.health.last_error = None
-            save_state(self.state_root, state)
+            if (
+                base_version is not None
+                and state.version != base_version
+                and not self._candidate_is_current(candidate, state)
+            ):
+                self._journal.record(state, "health", increments={"stale_stage_results": 1})
+                return None, 0
+            self._journal.record(state, "stage", span=staged.model_dump(mode="json"))
 
         return staged, expected_savings
 
+    def _candidate_is_current(
+        self,
+        candidate: Sequence[TurnRecord],
+        state: CollapseState,
+    ) -> bool:
+        turns = self._load_turns()
+        known_turn_ids = {turn.turn_id for turn in turns}
+        candidate_turn_ids = {turn.turn_id for turn in candidate}
+        if not candidate_turn_ids <= known_turn_ids:
+            return False
+        covered = self._covered_turn_ids(turns, [*state.committed_spans, *state.staged_spans])
+        return not (candidate_turn_ids & covered)
+
     def _covered_turn_ids(
         self,
         turns: Sequence[TurnRecord],
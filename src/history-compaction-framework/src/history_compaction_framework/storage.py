@@ -2,15 +2,21 @@ from __future__ import annotations
 
 from pathlib import Path
 import json
-from typing import Any, Sequence, cast
+import os
+import shutil
+from collections.abc import Iterator, Sequence
+from typing import Any, cast
 
 from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 
-from .models import CollapseState, TurnRecord
+from .models import CalibrationProfile, CollapseState, TurnRecord
 
 
 HISTORY_FILENAME = "history.jsonl"
 STATE_FILENAME = "collapse_state.json"
+ARCHIVE_DIRNAME = "archive"
+TOKEN_SIDECAR_FILENAME = "token_counts.parquet"
+LOAD_STATE_ATTEMPTS = 3
 
 
 def ensure_layout(state_root: Path) -> None:
@@ -50,40 +56,116 @@ def append_turn(state_root: Path, record: TurnRecord) -> None:
     with history_path(state_root).open("a", encoding="utf-8") as handle:
         handle.write(record.model_dump_json())
         handle.write("\n")
+        handle.flush()
+        os.fsync(handle.fileno())
 
 
 def load_turns(state_root: Path) -> list[TurnRecord]:
+    return list(iter_turns(state_root))
+
+
+def iter_turns(state_root: Path) -> Iterator[TurnRecord]:
     ensure_layout(state_root)
-    records: list[TurnRecord] = []
     with history_path(state_root).open("r", encoding="utf-8") as handle:
         for line in handle:
+            if not line.endswith("\n"):
+                break
             stripped = line.strip()
             if not stripped:
                 continue
-            records.append(TurnRecord.model_validate_json(stripped))
-    return records
+            yield TurnRecord.model_validate_json(stripped)
+
+
+def rewrite_turns(state_root: Path, records: Sequence[TurnRecord]) -> None:
+    ensure_layout(state_root)
+    path = history_path(state_root)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(record.model_dump_json())
+            handle.write("\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+    tmp_path.replace(path)
+    _fsync_directory(state_root)
 
 
 def load_state(state_root: Path) -> CollapseState:
+    from .journal import read_deltas, replay_deltas
+
     ensure_layout(state_root)
-    raw = collapse_state_path(state_root).read_text(encoding="utf-8").strip()
-    if not raw:
-        return CollapseState()
-    return CollapseState.model_validate_json(raw)
+    for _ in range(LOAD_STATE_ATTEMPTS):
+        raw = collapse_state_path(state_root).read_text(encoding="utf-8").strip()
+        state = CollapseState.model_validate_json(raw) if raw else CollapseState()
+        deltas = read_deltas(state_root)
+        # A gap means another process checkpointed between the two reads.
+        if not deltas or deltas[0].version <= state.version + 1:
+            break
+    return replay_deltas(state, deltas)
 
 
 def save_state(state_root: Path, state: CollapseState) -> None:
     state_root.mkdir(parents=True, exist_ok=True)
     path = collapse_state_path(state_root)
     tmp_path = path.with_suffix(".tmp")
-    tmp_path.write_text(
-        json.dumps(state.model_dump(mode="json"), indent=2),
-        encoding="utf-8",
-    )
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        handle.write(json.dumps(state.model_dump(mode="json"), indent=2))
+        handle.flush()
+        os.fsync(handle.fileno())
     tmp_path.replace(path)
+    _fsync_directory(state_root)
 
 
 def reset_state_root(state_root: Path) -> None:
+    from .journal import journal_path
+
     state_root.mkdir(parents=True, exist_ok=True)
     history_path(state_root).write_text("", encoding="utf-8")
+    journal_path(state_root).unlink(missing_ok=True)
+    shutil.rmtree(state_root / ARCHIVE_DIRNAME, ignore_errors=True)
+    (state_root / TOKEN_SIDECAR_FILENAME).unlink(missing_ok=True)
     save_state(state_root, CollapseState())
+
+
+def load_calibration_profiles(path: Path) -> dict[str, CalibrationProfile]:
+    if not path.exists():
+        return {}
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {
+        key: CalibrationProfile.model_validate(value)
+        for key, value in payload.get("profiles", {}).items()
+    }
+
+
+def save_calibration_profiles(path: Path, profiles: dict[str, CalibrationProfile]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "profiles": {
+                    key: profile.model_dump(mode="json")
+                    for key, profile in sorted(profiles.items())
+                },
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(path)
+
+
+def _fsync_directory(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
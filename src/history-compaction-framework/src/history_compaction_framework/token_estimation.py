@@ -13,6 +13,7 @@ except ImportError:  # pragma: no cover - optional import during partial install
 
 
 _ENCODING_CACHE: dict[str, Any] = {}
+HEURISTIC_ENCODING = "chars/4"
 
 
 def get_encoding_for_model(model_name: str | None) -> Any | None:
@@ -60,20 +61,43 @@ def estimate_message_tokens(
     *,
     model_name: str | None = None,
 ) -> int:
+    return sum(
+        estimate_text_tokens(chunk, model_name=model_name)
+        for chunk in message_text_chunks(message)
+    )
+
+
+def message_text_chunks(message: ModelMessage) -> list[str]:
     if isinstance(message, ModelRequest):
-        parts = message.parts
-        instructions = message.instructions or ""
-        total = estimate_text_tokens(instructions, model_name=model_name)
-        total += sum(
-            estimate_part_tokens(part, model_name=model_name) for part in parts
-        )
-        return total
-    if isinstance(message, ModelResponse):
-        return sum(
-            estimate_part_tokens(part, model_name=model_name)
-            for part in message.parts
-        )
-    return 0
+        chunks = [message.instructions or ""]
+    elif isinstance(message, ModelResponse):
+        chunks = []
+    else:
+        return []
+    for part in message.parts:
+        chunks.extend(iter_part_text(part))
+    return chunks
+
+
+def estimate_text_tokens_batch(
+    texts: Sequence[str],
+    *,
+    model_name: str | None = None,
+    num_threads: int = 8,
+) -> list[int]:
+    cleaned = [text.strip() for text in texts]
+    encoding = get_encoding_for_model(model_name)
+    if encoding is None:
+        return [max(1, math.ceil(len(text) / 4)) if text else 0 for text in cleaned]
+
+    non_empty = [text for text in cleaned if text]
+    encoded = iter(encoding.encode_batch(non_empty, num_threads=num_threads) if non_empty else [])
+    return [max(1, len(next(encoded))) if text else 0 for text in cleaned]
+
+
+def encoding_name_for_model(model_name: str | None) -> str:
+    encoding = get_encoding_for_model(model_name)
+    return encoding.name if encoding is not None else HEURISTIC_ENCODING
 
 
 def estimate_part_tokens(part: Any, *, model_name: str | None = None) -> int:
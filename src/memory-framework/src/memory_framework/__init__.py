@@ -6,39 +6,66 @@ from .agent_tools import (
     grep_memory,
     list_memory_files,
     read_memory_file,
+    search_memory,
     write_memory_file,
 )
 from .caps import EntrypointTruncation, truncate_entrypoint_content
-from .consolidation_runner import ConsolidationJob, ConsolidationRunner
 from .deps import MemoryDeps
-from .extraction_runner import ExtractionJob, ExtractionRunner
-from .memory_maintenance import audit_memory_store, normalize_memory_index
-from .memory_scan import MemoryHeader, scan_memory_headers
-from .memory_select import select_relevant_memories
+from .extraction_runner import ExtractionJob
+from .memory_maintenance import (
+    TopicCatalog,
+    audit_memory_store,
+    load_topic_catalog,
+    normalize_memory_index,
+    run_preconsolidation,
+)
+from .memory_embeddings import MemoryEmbeddingIndex
+from .memory_scan import MemoryHeader, MemoryHeaderCache, scan_memory_headers
+from .memory_select import (
+    MemorySelector,
+    PreselectionStats,
+    aselect_relevant_memories,
+    select_relevant_memories,
+)
 from .memory_surface import surface_selected_memories
+from .selection_cache import SelectionCache, shared_selection_cache
+from .service import MemoryService
+from .tokenizer import count_tokens
+from .session import AsyncMemorySession
 from .store import ensure_memory_layout, read_index
 
 __all__ = [
+    "AsyncMemorySession",
     "MemoryDeps",
     "EntrypointTruncation",
-    "ConsolidationJob",
-    "ConsolidationRunner",
     "ExtractionJob",
-    "ExtractionRunner",
+    "MemoryEmbeddingIndex",
     "MemoryHeader",
+    "MemoryHeaderCache",
+    "MemorySelector",
+    "MemoryService",
+    "PreselectionStats",
+    "SelectionCache",
+    "TopicCatalog",
+    "aselect_relevant_memories",
     "audit_memory_store",
     "delete_memory_file",
     "build_main_agent",
     "build_extract_agent",
     "build_consolidate_agent",
+    "count_tokens",
     "ensure_memory_layout",
     "grep_memory",
     "list_memory_files",
+    "load_topic_catalog",
     "normalize_memory_index",
     "read_index",
     "read_memory_file",
+    "run_preconsolidation",
     "scan_memory_headers",
+    "search_memory",
     "select_relevant_memories",
+    "shared_selection_cache",
     "surface_selected_memories",
     "truncate_entrypoint_content",
     "write_memory_file",
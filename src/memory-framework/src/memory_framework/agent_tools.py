@@ -3,7 +3,14 @@ from __future__ import annotations
 from pydantic_ai import RunContext
 
 from .deps import MemoryDeps
-from .store import iter_memory_files, resolve_memory_path
+from .memory_search import open_search_index, tokenize, update_search_index
+from .store import (
+    extract_frontmatter_description,
+    iter_memory_files,
+    resolve_memory_path,
+)
+
+MAX_SEARCH_RESULTS = 25
 
 
 def list_memory_files(ctx: RunContext[MemoryDeps]) -> str:
@@ -33,12 +40,25 @@ def grep_memory(ctx: RunContext[MemoryDeps], query: str) -> str:
 
     matches: list[str] = []
     lowered = needle.lower()
-    for path in iter_memory_files(ctx.deps.memory_root):
+    candidates = None
+    if tokenize(needle):
+        # The candidates must be a superset of the matching files, so files
+        # edited outside these tools are re-indexed first. Like tool writes,
+        # the refreshed entries are saved by the next hygiene run.
+        index = open_search_index(ctx.deps.memory_root, refresh=False)
+        index.refresh(save=False)
+        candidates = index.candidate_documents(needle)
+    if candidates is None:
+        paths = iter_memory_files(ctx.deps.memory_root)
+    else:
+        paths = [ctx.deps.memory_root / relative for relative in sorted(candidates, key=lambda item: item.split("/"))]
+    for path in paths:
         relative = path.relative_to(ctx.deps.memory_root).as_posix()
-        for line_number, line in enumerate(
-            path.read_text(encoding="utf-8").splitlines(),
-            start=1,
-        ):
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        for line_number, line in enumerate(text.splitlines(), start=1):
             if lowered in line.lower():
                 matches.append(f"{relative}:{line_number}: {line}")
                 if len(matches) >= 20:
@@ -46,15 +66,40 @@ def grep_memory(ctx: RunContext[MemoryDeps], query: str) -> str:
     return "\n".join(matches) if matches else "(no matches)"
 
 
+def search_memory(ctx: RunContext[MemoryDeps], query: str, limit: int = 10) -> str:
+    """Rank memory files by relevance to a query. Wrap words in double quotes to require an exact phrase."""
+    if not query.strip():
+        raise ValueError("Search query must not be empty.")
+
+    hits = open_search_index(ctx.deps.memory_root, refresh=False).search(
+        query,
+        limit=max(1, min(limit, MAX_SEARCH_RESULTS)),
+    )
+    lines: list[str] = []
+    for hit in hits:
+        path = ctx.deps.memory_root / hit.path
+        if not path.is_file():
+            continue
+        summary = extract_frontmatter_description(path) if path.suffix == ".md" and path.name != "MEMORY.md" else ""
+        line = f"- {hit.path} (score {hit.score:.2f})"
+        lines.append(f"{line}: {summary}" if summary else line)
+    return "\n".join(lines) if lines else "(no matches)"
+
+
 def write_memory_file(ctx: RunContext[MemoryDeps], path: str, content: str) -> str:
     """Write a memory file by relative path inside the memory directory."""
     resolved = resolve_memory_path(ctx.deps.memory_root, path)
+    relative = resolved.relative_to(ctx.deps.memory_root).as_posix()
     resolved.parent.mkdir(parents=True, exist_ok=True)
     try:
+        if resolved.is_file() and resolved.read_text(encoding="utf-8") == content:
+            return f"Wrote {relative} (unchanged)"
         resolved.write_text(content, encoding="utf-8")
     except OSError as exc:
         return f"Could not write memory file {path}: {exc}"
-    return f"Wrote {resolved.relative_to(ctx.deps.memory_root).as_posix()}"
+    ctx.deps.touched_paths.add(relative)
+    update_search_index(ctx.deps.memory_root, [relative], save=False)
+    return f"Wrote {relative}"
 
 
 def delete_memory_file(ctx: RunContext[MemoryDeps], path: str) -> str:
@@ -68,4 +113,7 @@ def delete_memory_file(ctx: RunContext[MemoryDeps], path: str) -> str:
         resolved.unlink()
     except OSError as exc:
         return f"Could not delete memory file {path}: {exc}"
-    return f"Deleted {resolved.relative_to(ctx.deps.memory_root).as_posix()}"
+    relative = resolved.relative_to(ctx.deps.memory_root).as_posix()
+    ctx.deps.touched_paths.add(relative)
+    update_search_index(ctx.deps.memory_root, [relative], save=False)
+    return f"Deleted {relative}"
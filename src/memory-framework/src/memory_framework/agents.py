@@ -6,6 +6,7 @@ from .agent_tools import (
     delete_memory_file,
     list_memory_files,
     read_memory_file,
+    search_memory,
     write_memory_file,
 )
 from .deps import MemoryDeps
@@ -44,6 +45,7 @@ def build_extract_agent(model: str) -> Agent[MemoryDeps, str]:
         tools=[
             list_memory_files,
             read_memory_file,
+            search_memory,
             write_memory_file,
             delete_memory_file,
         ],
@@ -58,6 +60,7 @@ def build_consolidate_agent(model: str) -> Agent[MemoryDeps, str]:
         tools=[
             list_memory_files,
             read_memory_file,
+            search_memory,
             write_memory_file,
             delete_memory_file,
         ],
@@ -1,35 +1,25 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 from pathlib import Path
 import threading
-from textwrap import dedent
 from typing import Any
 
-from .agents import build_consolidate_agent, build_extract_agent, build_main_agent
-from .caps import truncate_entrypoint_content
-from .consolidation_runner import ConsolidationJob, ConsolidationRunner
+from .agents import build_consolidate_agent
+from .consolidation_runner import prepare_consolidation
 from .deps import MemoryDeps
-from .extraction_runner import ExtractionJob, ExtractionRunner
-from .memory_maintenance import (
-    apply_post_consolidation_hygiene,
-    apply_write_hygiene,
-    audit_memory_store,
-    format_audit_for_prompt,
-    mark_consolidated,
-    record_memory_activity,
-    should_run_consolidation,
-)
-from .memory_scan import scan_memory_headers
-from .memory_select import select_relevant_memories
-from .memory_surface import surface_selected_memories
-from .prompts import build_consolidation_prompt, build_extract_prompt
+from .extraction_runner import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_LATENCY_SECONDS
+from .memory_maintenance import apply_post_consolidation_hygiene, mark_consolidated
+from .memory_embeddings import MemoryEmbeddingIndex, embeddings_available
+from .memory_surface import DEFAULT_SURFACE_TOKEN_BUDGET
+from .service import MemoryService
+from .session import AsyncMemorySession
 from .store import (
     diff_touched_paths,
     ensure_memory_layout,
-    read_index,
     render_memory_tree,
-    snapshot_memory_files,
+    stat_memory_files,
 )
 
 
@@ -45,7 +35,27 @@ def main() -> None:
         run_consolidation_only(memory_root=memory_root, model=args.model)
         return
 
-    run_repl(memory_root=memory_root, model=args.model)
+    if args.async_session:
+        asyncio.run(
+            run_async_repl(
+                memory_root=memory_root,
+                model=args.model,
+                local_preselect=not args.no_local_preselect,
+                extraction_batch_size=args.extraction_batch_size,
+                extraction_max_latency=args.extraction_max_latency,
+                surface_token_budget=args.surface_token_budget,
+            ),
+        )
+        return
+
+    run_repl(
+        memory_root=memory_root,
+        model=args.model,
+        local_preselect=not args.no_local_preselect,
+        extraction_batch_size=args.extraction_batch_size,
+        extraction_max_latency=args.extraction_max_latency,
+        surface_token_budget=args.surface_token_budget,
+    )
 
 
 def parse_args() -> argparse.Namespace:
@@ -69,36 +79,62 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_MODEL,
         help="Pydantic AI model string to use for all agents.",
     )
+    parser.add_argument(
+        "--no-local-preselect",
+        action="store_true",
+        help="Always ask the selector model instead of shortlisting memories with the local embedding index first.",
+    )
+    parser.add_argument(
+        "--extraction-batch-size",
+        type=int,
+        default=DEFAULT_MAX_BATCH_SIZE,
+        help="Maximum number of turns folded into one background extraction pass.",
+    )
+    parser.add_argument(
+        "--extraction-max-latency",
+        type=float,
+        default=DEFAULT_MAX_LATENCY_SECONDS,
+        help="Seconds a finished turn may wait for more turns before extraction starts.",
+    )
+    parser.add_argument(
+        "--surface-token-budget",
+        type=int,
+        default=DEFAULT_SURFACE_TOKEN_BUDGET,
+        help="Total tokens of selected topic memories surfaced into each main turn.",
+    )
+    parser.add_argument(
+        "--async-session",
+        action="store_true",
+        help="Run turns through the asyncio memory session, which answers from the index while slow selection finishes.",
+    )
     return parser.parse_args()
 
 
-def run_repl(*, memory_root: Path, model: str) -> None:
+def run_repl(
+    *,
+    memory_root: Path,
+    model: str,
+    local_preselect: bool = True,
+    extraction_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    extraction_max_latency: float = DEFAULT_MAX_LATENCY_SECONDS,
+    surface_token_budget: int = DEFAULT_SURFACE_TOKEN_BUDGET,
+) -> None:
     print(f"Using model: {model}")
     print(f"Memory root: {memory_root}")
     print("Type your message and press Enter. Type 'quit' to exit.")
 
-    main_agent = build_main_agent(model)
-    extract_agent = build_extract_agent(model)
-    consolidate_agent = build_consolidate_agent(model)
+    # One REPL is a single-tenant MemoryService: maintenance for the root is
+    # serialized by the service rather than a REPL-wide lock.
+    service = MemoryService(
+        model=model,
+        max_workers=2,
+        extraction_batch_size=extraction_batch_size,
+        extraction_max_latency=extraction_max_latency,
+        local_preselect=local_preselect,
+        surface_token_budget=surface_token_budget,
+    )
     message_history: list[Any] = []
     already_surfaced: set[str] = set()
-    turn_number = 0
-    maintenance_lock = threading.Lock()
-    consolidation_runner = ConsolidationRunner(
-        run_consolidation=lambda job: run_consolidation_pass(
-            memory_root=job.memory_root,
-            agent=consolidate_agent,
-            maintenance_lock=maintenance_lock,
-        ),
-    )
-    extraction_runner = ExtractionRunner(
-        run_extraction=lambda job: run_extract_pass(
-            job=job,
-            extract_agent=extract_agent,
-            consolidation_runner=consolidation_runner,
-            maintenance_lock=maintenance_lock,
-        ),
-    )
 
     try:
         while True:
@@ -114,44 +150,99 @@ def run_repl(*, memory_root: Path, model: str) -> None:
                 print("Exiting.")
                 break
 
-            assistant_text, new_messages = run_main_turn(
-                user_text=user_text,
+            assistant_text, new_messages = service.run_turn(
                 memory_root=memory_root,
-                model=model,
-                main_agent=main_agent,
+                user_text=user_text,
                 message_history=message_history,
                 already_surfaced=already_surfaced,
             )
             print(f"\nAssistant: {assistant_text}")
-
-            turn_number += 1
-            extraction_runner.submit(
-                ExtractionJob(
-                    turn_number=turn_number,
-                    user_text=user_text,
-                    assistant_text=assistant_text,
-                    memory_root=memory_root,
-                ),
-            )
             message_history.extend(new_messages)
     finally:
-        extraction_runner.close()
-        consolidation_runner.close()
+        service.close()
+        if service.stats.extraction_jobs_run:
+            print(
+                f"Memory extraction: {service.stats.extraction_jobs_run} turns in "
+                f"{service.stats.extraction_batches_run} extraction passes",
+            )
+        selector = service.tenant(memory_root).selector
+        if selector.stats.turns:
+            print(selector.stats.format_summary())
+            print(selector.cache.format_summary())
+
+
+async def run_async_repl(
+    *,
+    memory_root: Path,
+    model: str,
+    local_preselect: bool = True,
+    extraction_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    extraction_max_latency: float = DEFAULT_MAX_LATENCY_SECONDS,
+    surface_token_budget: int = DEFAULT_SURFACE_TOKEN_BUDGET,
+) -> None:
+    print(f"Using model: {model}")
+    print(f"Memory root: {memory_root}")
+    print("Type your message and press Enter. Type 'quit' to exit.")
+
+    embedding_index = None
+    if local_preselect and embeddings_available():
+        embedding_index = MemoryEmbeddingIndex(memory_root)
+    session = AsyncMemorySession(
+        memory_root=memory_root,
+        model=model,
+        embedding_index=embedding_index,
+        extraction_batch_size=extraction_batch_size,
+        extraction_max_latency=extraction_max_latency,
+        surface_token_budget=surface_token_budget,
+    )
+
+    try:
+        while True:
+            try:
+                # Reading input in a thread keeps background extraction and
+                # consolidation running while the prompt waits.
+                user_text = (await asyncio.to_thread(input, "\n> ")).strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nExiting.")
+                break
+
+            if not user_text:
+                continue
+            if user_text.lower() in {"quit", "/quit"}:
+                print("Exiting.")
+                break
+
+            assistant_text = await session.run_turn(user_text)
+            print(f"\nAssistant: {assistant_text}")
+    finally:
+        await session.aclose()
+        if session.extraction_jobs_run:
+            print(
+                f"Memory extraction: {session.extraction_jobs_run} turns in "
+                f"{session.extraction_batches_run} extraction passes",
+            )
+        if session.speculative_starts:
+            print(
+                f"Speculative answers: {session.speculative_kept} of "
+                f"{session.speculative_starts} kept while memory selection was slow",
+            )
+        if session.selection_stats.turns:
+            print(session.selection_stats.format_summary())
+            print(session.selector.cache.format_summary())
 
 
 def run_consolidation_only(*, memory_root: Path, model: str) -> None:
     print(f"Using model: {model}")
     print(f"Memory root: {memory_root}")
 
-    before = snapshot_memory_files(memory_root)
+    before = stat_memory_files(memory_root)
     agent = build_consolidate_agent(model)
     result = run_consolidation_pass(
         memory_root=memory_root,
         agent=agent,
         maintenance_lock=threading.Lock(),
     )
-    after = snapshot_memory_files(memory_root)
-    touched_paths = diff_touched_paths(before, after)
+    touched_paths = diff_touched_paths(before, stat_memory_files(memory_root))
 
     print("\n=== Consolidation Summary ===")
     print(result)
@@ -166,71 +257,6 @@ def run_consolidation_only(*, memory_root: Path, model: str) -> None:
     print(render_memory_tree(memory_root))
 
 
-def run_main_turn(
-    *,
-    user_text: str,
-    memory_root: Path,
-    model: str,
-    main_agent: Any,
-    message_history: list[Any],
-    already_surfaced: set[str],
-) -> tuple[str, list[Any]]:
-    index_snippet = truncate_entrypoint_content(read_index(memory_root)).content
-    headers = scan_memory_headers(memory_root)
-    selected_headers = select_relevant_memories(
-        model=model,
-        query=user_text,
-        headers=headers,
-        already_surfaced=already_surfaced,
-    )
-    selected_memories_text = surface_selected_memories(selected_headers)
-    result = main_agent.run_sync(
-        user_text,
-        message_history=message_history,
-        deps=MemoryDeps(
-            memory_root=memory_root,
-            index_snippet=index_snippet,
-            selected_memories_text=selected_memories_text,
-        ),
-    )
-    already_surfaced.update(header.filename for header in selected_headers)
-    return result.output, list(result.new_messages())
-
-
-def run_extract_pass(
-    *,
-    job: ExtractionJob,
-    extract_agent: Any,
-    consolidation_runner: ConsolidationRunner,
-    maintenance_lock: threading.Lock,
-) -> None:
-    transcript = render_turn_transcript(
-        user_text=job.user_text,
-        assistant_text=job.assistant_text,
-    )
-    prompt = build_extract_prompt(
-        turn_transcript=transcript,
-        new_message_count=2,
-        existing_memories_manifest=_format_existing_memories_manifest(job.memory_root),
-    )
-    before = snapshot_memory_files(job.memory_root)
-    with maintenance_lock:
-        extract_agent.run_sync(prompt, deps=MemoryDeps(memory_root=job.memory_root))
-        after_extract = snapshot_memory_files(job.memory_root)
-        touched_after_extract = diff_touched_paths(before, after_extract)
-        apply_write_hygiene(
-            job.memory_root,
-            touched_paths=touched_after_extract,
-        )
-        after = snapshot_memory_files(job.memory_root)
-        touched_paths = diff_touched_paths(before, after)
-        record_memory_activity(job.memory_root, touched_paths)
-        audit = audit_memory_store(job.memory_root)
-        should_schedule = should_run_consolidation(job.memory_root, audit)
-    if should_schedule:
-        consolidation_runner.submit(ConsolidationJob(memory_root=job.memory_root))
-
-
 def run_consolidation_pass(
     *,
     memory_root: Path,
@@ -238,35 +264,15 @@ def run_consolidation_pass(
     maintenance_lock: threading.Lock,
 ) -> str:
     with maintenance_lock:
-        audit = audit_memory_store(memory_root)
-        result = agent.run_sync(
-            build_consolidation_prompt(
-                str(memory_root),
-                audit_summary=format_audit_for_prompt(audit),
-            ),
-            deps=MemoryDeps(memory_root=memory_root),
-        )
+        preconsolidation, prompt = prepare_consolidation(memory_root)
+        if prompt is None:
+            # Nothing left that needs judgment, so the agent is not started.
+            mark_consolidated(memory_root)
+            return preconsolidation.format_summary()
+        result = agent.run_sync(prompt, deps=MemoryDeps(memory_root=memory_root))
         apply_post_consolidation_hygiene(memory_root)
         mark_consolidated(memory_root)
-    return result.output
-
-
-def render_turn_transcript(*, user_text: str, assistant_text: str) -> str:
-    return dedent(
-        f"""\
-        [user]
-        {user_text}
-
-        [assistant]
-        {assistant_text}
-        """
-    ).strip()
-
-
-def _format_existing_memories_manifest(memory_root: Path) -> str:
-    from .memory_scan import format_memory_manifest
-
-    return format_memory_manifest(scan_memory_headers(memory_root))
+    return f"{preconsolidation.format_summary()}\n{result.output}"
 
 
 if __name__ == "__main__":
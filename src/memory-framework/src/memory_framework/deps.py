@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
@@ -11,3 +11,4 @@ class MemoryDeps:
     max_index_bytes: int = 25_000
     index_snippet: str = ""
     selected_memories_text: str = ""
+    touched_paths: set[str] = field(default_factory=set)
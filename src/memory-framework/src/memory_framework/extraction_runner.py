@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from concurrent.futures import Future, ThreadPoolExecutor
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-import threading
-from typing import Callable
+
+from .memory_scan import format_memory_manifest, scan_memory_headers
+from .prompts import build_extract_prompt, render_turn_transcript
+
+
+DEFAULT_MAX_BATCH_SIZE = 4
+DEFAULT_MAX_LATENCY_SECONDS = 15.0
 
 
 @dataclass(slots=True)
@@ -15,69 +19,48 @@ class ExtractionJob:
     memory_root: Path
 
 
-class ExtractionRunner:
-    def __init__(
-        self,
-        *,
-        run_extraction: Callable[[ExtractionJob], None],
-    ) -> None:
-        self._run_extraction = run_extraction
-        self._lock = threading.Lock()
-        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-extract")
-        self._current_future: Future[None] | None = None
-        self._pending_job: ExtractionJob | None = None
-        self._closed = False
-        self._accepting_submissions = True
-        self.last_completed_turn = 0
+def build_extraction_prompt(jobs: list[ExtractionJob]) -> str:
+    # Every turn in a batch shares one memory root and one extraction pass.
+    transcript = "\n\n".join(
+        render_turn_transcript(user_text=job.user_text, assistant_text=job.assistant_text)
+        for job in jobs
+    )
+    return build_extract_prompt(
+        turn_transcript=transcript,
+        new_message_count=2 * len(jobs),
+        existing_memories_manifest=format_memory_manifest(scan_memory_headers(jobs[0].memory_root)),
+    )
 
-    def submit(self, job: ExtractionJob) -> None:
-        with self._lock:
-            if not self._accepting_submissions:
-                return
-            if self._current_future is None or self._current_future.done():
-                self._schedule_locked(job)
-                return
-            self._pending_job = job
 
-    def drain(self) -> None:
-        while True:
-            with self._lock:
-                current = self._current_future
-                pending = self._pending_job
-            if current is not None:
-                current.result()
-                continue
-            if pending is not None:
-                with self._lock:
-                    if self._current_future is None and self._pending_job is not None:
-                        self._schedule_locked(self._pending_job)
-                        self._pending_job = None
-                continue
-            break
+@dataclass(slots=True)
+class ExtractionBatcher:
+    # The one batching policy behind MemoryService and AsyncMemorySession: a
+    # pass starts once a full batch is waiting or the oldest turn has waited
+    # out the latency bound. Callers supply the clock and the locking.
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+    max_latency_seconds: float = DEFAULT_MAX_LATENCY_SECONDS
+    pending: list[tuple[float, ExtractionJob]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.max_batch_size = max(1, self.max_batch_size)
+        self.max_latency_seconds = max(0.0, self.max_latency_seconds)
 
-    def close(self) -> None:
-        with self._lock:
-            self._accepting_submissions = False
-        self.drain()
-        with self._lock:
-            self._closed = True
-        self._executor.shutdown(wait=True)
+    def add(self, job: ExtractionJob, *, now: float) -> None:
+        # Turns that arrive while a batch runs queue up for the next one
+        # instead of replacing each other.
+        self.pending.append((now, job))
 
-    def _schedule_locked(self, job: ExtractionJob) -> None:
-        self._current_future = self._executor.submit(self._run_job, job)
+    def seconds_until_due(self, *, now: float) -> float | None:
+        if not self.pending:
+            return None
+        if len(self.pending) >= self.max_batch_size:
+            return 0.0
+        return max(0.0, self.pending[0][0] + self.max_latency_seconds - now)
 
-    def _run_job(self, job: ExtractionJob) -> None:
-        try:
-            self._run_extraction(job)
-            self.last_completed_turn = max(self.last_completed_turn, job.turn_number)
-        except Exception:
-            # Extraction is best-effort in the tutorial, matching the harness intent.
-            pass
-        finally:
-            next_job: ExtractionJob | None = None
-            with self._lock:
-                self._current_future = None
-                if self._pending_job is not None:
-                    next_job = self._pending_job
-                    self._pending_job = None
-                    self._schedule_locked(next_job)
+    def take_batch(self, *, now: float, force: bool = False) -> list[ExtractionJob]:
+        due = self.seconds_until_due(now=now)
+        if due is None or (due > 0 and not force):
+            return []
+        batch = [job for _, job in self.pending[: self.max_batch_size]]
+        del self.pending[: len(batch)]
+        return batch
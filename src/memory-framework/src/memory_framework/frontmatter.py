@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+FRONTMATTER_FENCE = "---"
+FRONTMATTER_MAX_LINES = 30
+FRONTMATTER_MAX_BYTES = 4_096
+
+
+def read_frontmatter_block(
+    path: Path,
+    *,
+    max_lines: int = FRONTMATTER_MAX_LINES,
+    max_bytes: int = FRONTMATTER_MAX_BYTES,
+) -> str:
+    lines = _read_leading_lines(path, max_lines=max_lines, max_bytes=max_bytes)
+    end_index = _closing_fence_index(lines)
+    if end_index is not None:
+        return "\n".join(lines[1:end_index])
+    return "\n".join(lines)
+
+
+def read_frontmatter_fields(
+    path: Path,
+    *,
+    max_lines: int = FRONTMATTER_MAX_LINES,
+    max_bytes: int = FRONTMATTER_MAX_BYTES,
+) -> dict[str, str]:
+    lines = _read_leading_lines(path, max_lines=max_lines, max_bytes=max_bytes)
+    if not lines or lines[0].strip() != FRONTMATTER_FENCE:
+        return {}
+    end_index = _closing_fence_index(lines)
+    return parse_frontmatter_fields(lines[1:end_index])
+
+
+def parse_frontmatter_fields(lines: list[str]) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    for line in lines:
+        if ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        fields[key.strip()] = value.strip()
+    return fields
+
+
+def _read_leading_lines(path: Path, *, max_lines: int, max_bytes: int) -> list[str]:
+    # Stream only the head of the file: stop at the closing fence, the line
+    # cap, or the byte budget, whichever comes first.
+    lines: list[str] = []
+    remaining = max_bytes
+    with path.open("rb") as handle:
+        while remaining > 0 and len(lines) < max_lines:
+            raw = handle.readline(remaining)
+            if not raw:
+                break
+            remaining -= len(raw)
+            line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+            lines.append(line)
+            if len(lines) > 1 and lines[0].strip() == FRONTMATTER_FENCE and line.strip() == FRONTMATTER_FENCE:
+                break
+    return lines
+
+
+def _closing_fence_index(lines: list[str]) -> int | None:
+    if len(lines) < 2 or lines[0].strip() != FRONTMATTER_FENCE:
+        return None
+    return next(
+        (index for index, line in enumerate(lines[1:], start=1) if line.strip() == FRONTMATTER_FENCE),
+        None,
+    )
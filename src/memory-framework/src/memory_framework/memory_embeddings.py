@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from .memory_scan import MemoryHeader
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional local preselection support
+    numpy = None
+
+
+EMBEDDING_INDEX_FILENAME = ".memory-framework-embeddings.npz"
+EMBEDDING_INDEX_VERSION = 1
+EMBEDDING_DIMENSIONS = 4_096
+EMBEDDING_BODY_BYTES = 2_048
+DESCRIPTION_WEIGHT = 2.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    (
+        "a", "about", "an", "and", "are", "as", "at", "be", "but", "by", "can", "could", "do",
+        "does", "for", "from", "get", "has", "have", "how", "i", "if", "in", "is", "it", "its",
+        "just", "like", "me", "my", "need", "no", "not", "of", "on", "or", "our", "should", "so",
+        "that", "the", "their", "them", "then", "there", "these", "they", "this", "to", "use",
+        "was", "we", "were", "what", "when", "where", "which", "who", "will", "with", "would",
+        "you", "your",
+    ),
+)
+
+
+@dataclass(slots=True)
+class ScoredMemory:
+    header: MemoryHeader
+    score: float
+
+
+def embeddings_available() -> bool:
+    return numpy is not None
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def embed_text(text: str, *, weight: float = 1.0, dimensions: int = EMBEDDING_DIMENSIONS) -> dict[int, float]:
+    # Hashing-trick features over unigrams and bigrams: no model download, and
+    # the same text always lands in the same buckets across processes.
+    tokens = tokenize(text)
+    counts: dict[str, int] = {}
+    for feature in [*tokens, *(f"{left} {right}" for left, right in zip(tokens, tokens[1:], strict=False))]:
+        counts[feature] = counts.get(feature, 0) + 1
+    buckets: dict[int, float] = {}
+    for feature, count in counts.items():
+        digest = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        bucket = digest % dimensions
+        buckets[bucket] = buckets.get(bucket, 0.0) + sign * weight * (1.0 + math.log(count))
+    return buckets
+
+
+class MemoryEmbeddingIndex:
+    def __init__(self, memory_root: Path, *, dimensions: int = EMBEDDING_DIMENSIONS) -> None:
+        if numpy is None:
+            raise RuntimeError("Local memory preselection requires numpy; install the 'embeddings' extra.")
+        self.memory_root = memory_root
+        self.dimensions = dimensions
+        self._filenames: list[str] = []
+        self._mtimes = numpy.zeros(0, dtype=numpy.float64)
+        self._matrix = numpy.zeros((0, dimensions), dtype=numpy.float32)
+        self._row_by_filename: dict[str, int] = {}
+        self._loaded = False
+        # Concurrent turns for one root share this index; refresh swaps the
+        # matrix and row map together, so readers must not see them mid-swap.
+        self._lock = threading.RLock()
+        self.embedded_files = 0
+
+    @property
+    def path(self) -> Path:
+        return self.memory_root / EMBEDDING_INDEX_FILENAME
+
+    def refresh(self, headers: list[MemoryHeader]) -> None:
+        with self._lock:
+            self._refresh(headers)
+
+    def _refresh(self, headers: list[MemoryHeader]) -> None:
+        if not self._loaded:
+            self._load()
+        same_files = len(headers) == len(self._filenames) and all(
+            header.filename in self._row_by_filename for header in headers
+        )
+        if same_files:
+            # The usual turn: the same files, at most a few rewritten. Stale
+            # rows are re-embedded in place and the matrix is kept.
+            changed = False
+            for header in headers:
+                row = self._row_by_filename[header.filename]
+                if self._mtimes[row] != header.mtime_ms:
+                    self._matrix[row] = self._embed_header(header)
+                    self._mtimes[row] = header.mtime_ms
+                    self.embedded_files += 1
+                    changed = True
+            if changed:
+                self._save()
+            return
+
+        matrix = numpy.zeros((len(headers), self.dimensions), dtype=numpy.float32)
+        mtimes = numpy.array([header.mtime_ms for header in headers], dtype=numpy.float64)
+        for row, header in enumerate(headers):
+            previous = self._row_by_filename.get(header.filename)
+            if previous is not None and self._mtimes[previous] == mtimes[row]:
+                matrix[row] = self._matrix[previous]
+                continue
+            # Only new or rewritten files are read and embedded again.
+            matrix[row] = self._embed_header(header)
+            self.embedded_files += 1
+        self._filenames = [header.filename for header in headers]
+        self._mtimes = mtimes
+        self._matrix = matrix
+        self._row_by_filename = {filename: row for row, filename in enumerate(self._filenames)}
+        self._save()
+
+    def search(self, query: str, headers: list[MemoryHeader], *, top_k: int) -> list[ScoredMemory]:
+        query_vector = self._dense(embed_text(query))
+        with self._lock:
+            self._refresh(headers)
+            if not headers or not query_vector.any():
+                return []
+            # Matrix rows keep their own order across refreshes, so scores are
+            # gathered back into the order of the headers passed in.
+            rows = numpy.fromiter(
+                (self._row_by_filename[header.filename] for header in headers),
+                dtype=numpy.intp,
+                count=len(headers),
+            )
+            scores = (self._matrix @ query_vector)[rows]
+        order = numpy.argsort(-scores, kind="stable")[:top_k]
+        return [ScoredMemory(header=headers[index], score=float(scores[index])) for index in order]
+
+    def _embed_header(self, header: MemoryHeader) -> numpy.ndarray:
+        buckets = embed_text(header.filename.replace("/", " ").replace("_", " ").replace("-", " "))
+        for bucket, value in embed_text(header.description or "", weight=DESCRIPTION_WEIGHT).items():
+            buckets[bucket] = buckets.get(bucket, 0.0) + value
+        for bucket, value in embed_text(_read_body_prefix(header.file_path)).items():
+            buckets[bucket] = buckets.get(bucket, 0.0) + value
+        return self._dense(buckets)
+
+    def _dense(self, buckets: dict[int, float]) -> numpy.ndarray:
+        vector = numpy.zeros(self.dimensions, dtype=numpy.float32)
+        for bucket, value in buckets.items():
+            vector[bucket] = value
+        norm = numpy.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with numpy.load(self.path, allow_pickle=False) as payload:
+                if int(payload["version"]) != EMBEDDING_INDEX_VERSION or payload["matrix"].shape[1:] != (self.dimensions,):
+                    return
+                self._filenames = [str(filename) for filename in payload["filenames"]]
+                self._mtimes = payload["mtimes"].astype(numpy.float64)
+                self._matrix = payload["matrix"].astype(numpy.float32)
+        except (OSError, KeyError, ValueError):
+            return
+        self._row_by_filename = {filename: row for row, filename in enumerate(self._filenames)}
+
+    def _save(self) -> None:
+        # Callers hold the lock; the unique temp file also keeps processes
+        # sharing the root from renaming each other's partial writes.
+        tmp_path: Path | None = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=self.memory_root,
+                prefix=f"{EMBEDDING_INDEX_FILENAME}.",
+                suffix=".tmp",
+                delete=False,
+            ) as handle:
+                tmp_path = Path(handle.name)
+                numpy.savez(
+                    handle,
+                    version=numpy.array(EMBEDDING_INDEX_VERSION),
+                    filenames=numpy.array(self._filenames, dtype=str),
+                    mtimes=self._mtimes,
+                    matrix=self._matrix,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The on-disk copy only saves re-embedding on the next start.
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            return
+
+
+def _read_body_prefix(path: Path) -> str:
+    try:
+        with path.open("rb") as handle:
+            return handle.read(EMBEDDING_BODY_BYTES).decode("utf-8", errors="ignore")
+    except OSError:
+        return ""
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+from collections.abc import Mapping
 from dataclasses import asdict, dataclass, field
 from datetime import datetime, timezone
+import hashlib
+from itertools import combinations
 import json
 from pathlib import Path
 import re
+import threading
 from typing import Any
 
+from .frontmatter import parse_frontmatter_fields
+from .minhash import estimated_similarity, lsh_band_keys, minhash_signature
+
 
 INDEX_LINE_RE = re.compile(
     r"^\s*-\s*\[(?P<title>[^\]]+)\]\((?P<target>[^)]+)\)\s*(?:—|-)\s*(?P<hook>.+?)\s*$"
@@ -17,6 +24,20 @@ SOFT_INDEX_BYTE_BUDGET = 20_000
 VALID_MEMORY_TYPES = {"user", "feedback", "project", "reference"}
 STATE_FILENAME = ".memory-framework-state.json"
 
+NEAR_DUPLICATE_SIMILARITY = 0.5
+NEAR_DUPLICATE_MERGE_SIMILARITY = 0.8
+LARGE_TOPIC_BYTES = 4_000
+MAX_WORKLIST_ITEMS = 8
+WORKLIST_FILE_BYTES = 4_000
+WORKLIST_TOTAL_BYTES = 24_000
+WORKLIST_KIND_ORDER = [
+    "review merged topic",
+    "review near-duplicate topics",
+    "recently written topic",
+    "index over budget",
+    "large topic",
+]
+
 DEFAULT_CONSOLIDATION_MIN_HOURS = 6
 DEFAULT_CONSOLIDATION_MIN_WRITES = 8
 DEFAULT_CONSOLIDATION_MIN_DISTINCT_FILES = 4
@@ -49,6 +70,7 @@ class MemoryAudit:
     orphan_topic_files: list[str] = field(default_factory=list)
     invalid_frontmatter: list[str] = field(default_factory=list)
     exact_duplicate_topic_files: list[list[str]] = field(default_factory=list)
+    near_duplicate_topic_files: list[list[str]] = field(default_factory=list)
 
     @property
     def has_soft_pressure(self) -> bool:
@@ -59,6 +81,7 @@ class MemoryAudit:
                 bool(self.broken_links),
                 bool(self.malformed_index_lines),
                 bool(self.exact_duplicate_topic_files),
+                bool(self.near_duplicate_topic_files),
             ]
         )
 
@@ -74,6 +97,207 @@ class ConsolidationState:
         return len(set(self.touched_topic_files_since_consolidation))
 
 
+@dataclass(slots=True)
+class ConsolidationWorkItem:
+    kind: str
+    paths: list[str]
+    note: str
+    impact: int
+
+
+@dataclass(slots=True)
+class PreconsolidationResult:
+    removed_exact_duplicates: list[str] = field(default_factory=list)
+    merged_near_duplicates: dict[str, list[str]] = field(default_factory=dict)
+    near_duplicates_for_review: list[list[str]] = field(default_factory=list)
+    changed_paths: list[str] = field(default_factory=list)
+    worklist: list[ConsolidationWorkItem] = field(default_factory=list)
+
+    def format_summary(self) -> str:
+        merged_sources = sum(len(sources) for sources in self.merged_near_duplicates.values())
+        return (
+            f"Local pre-consolidation: removed {len(self.removed_exact_duplicates)} exact duplicate(s), "
+            f"merged {merged_sources} near-duplicate file(s) into {len(self.merged_near_duplicates)} topic(s), "
+            f"left {len(self.near_duplicates_for_review)} near-duplicate group(s) for review, "
+            f"changed {len(self.changed_paths)} path(s); {len(self.worklist)} worklist item(s) remain."
+        )
+
+
+@dataclass(slots=True)
+class TopicRecord:
+    relative: str
+    path: Path
+    mtime_ns: int
+    size: int
+    metadata: dict[str, str]
+    body_hash: str
+    signature: tuple[int, ...] | None
+    frontmatter_normalized: bool
+
+
+@dataclass(slots=True)
+class TopicCatalog:
+    memory_root: Path
+    topics: dict[str, TopicRecord] = field(default_factory=dict)
+    scanned_files: int = 0
+    lsh_buckets: dict[tuple[int, tuple[int, ...]], set[str]] = field(default_factory=dict)
+    # The catalog is shared by every caller for its root, so records and LSH
+    # buckets are only changed or walked under this lock.
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def refresh(self, relative_paths: list[str] | None = None) -> None:
+        from .store import walk_memory_files
+
+        with self._lock:
+            if relative_paths is not None:
+                for relative in relative_paths:
+                    self._rescan(relative)
+                return
+            seen: set[str] = set()
+            for relative, _path, stat in walk_memory_files(self.memory_root):
+                if not relative.startswith("topics/") or not relative.endswith(".md"):
+                    continue
+                seen.add(relative)
+                record = self.topics.get(relative)
+                if record is None or record.mtime_ns != stat.st_mtime_ns or record.size != stat.st_size:
+                    self._rescan(relative)
+            for relative in [relative for relative in self.topics if relative not in seen]:
+                self._drop(relative)
+
+    def paths(self) -> list[Path]:
+        with self._lock:
+            return [self.topics[relative].path for relative in sorted(self.topics)]
+
+    def duplicate_groups(self) -> list[list[str]]:
+        buckets: dict[str, list[str]] = {}
+        with self._lock:
+            for relative in sorted(self.topics):
+                buckets.setdefault(self.topics[relative].body_hash, []).append(relative)
+        return [group for group in buckets.values() if len(group) > 1]
+
+    def duplicate_map(self) -> dict[str, str]:
+        duplicate_map: dict[str, str] = {}
+        for group in self.duplicate_groups():
+            canonical = group[0]
+            for filename in group:
+                duplicate_map[filename] = canonical
+        return duplicate_map
+
+    def near_duplicate_groups(
+        self,
+        *,
+        threshold: float = NEAR_DUPLICATE_SIMILARITY,
+        same_type: bool = False,
+    ) -> list[list[str]]:
+        with self._lock:
+            return self._near_duplicate_groups(threshold, same_type)
+
+    def similarity(self, left: str, right: str) -> float:
+        with self._lock:
+            left_signature = self.topics[left].signature
+            right_signature = self.topics[right].signature
+        if left_signature is None or right_signature is None:
+            return 0.0
+        return estimated_similarity(left_signature, right_signature)
+
+    def _near_duplicate_groups(self, threshold: float, same_type: bool) -> list[list[str]]:
+        # Only topics sharing an LSH bucket are compared, so the cost follows
+        # the number of likely matches rather than every pair of topics.
+        parent: dict[str, str] = {}
+
+        def find(relative: str) -> str:
+            while parent.get(relative, relative) != relative:
+                relative = parent[relative]
+            return relative
+
+        compared: set[tuple[str, str]] = set()
+        for members in self.lsh_buckets.values():
+            if len(members) < 2:
+                continue
+            ordered = sorted(members)
+            for index, left in enumerate(ordered):
+                for right in ordered[index + 1 :]:
+                    if (left, right) in compared:
+                        continue
+                    compared.add((left, right))
+                    if same_type and _topic_type(self.topics[left].metadata) != _topic_type(self.topics[right].metadata):
+                        continue
+                    similarity = estimated_similarity(self.topics[left].signature, self.topics[right].signature)
+                    if similarity >= threshold:
+                        parent[find(right)] = find(left)
+
+        groups: dict[str, list[str]] = {}
+        for relative in sorted(parent):
+            groups.setdefault(find(relative), []).append(relative)
+        return sorted(
+            sorted({*group, root})
+            for root, group in groups.items()
+            # Groups made only of exact copies are already reported as such.
+            if len({self.topics[member].body_hash for member in {*group, root}}) > 1
+        )
+
+    def _rescan(self, relative: str) -> None:
+        with self._lock:
+            path = self.memory_root / relative
+            try:
+                stat = path.stat()
+                text = path.read_text(encoding="utf-8")
+            except (FileNotFoundError, IsADirectoryError):
+                self._drop(relative)
+                return
+            self._drop(relative)
+            self.scanned_files += 1
+            metadata, body = _parse_topic_text(text)
+            record = TopicRecord(
+                relative=relative,
+                path=path,
+                mtime_ns=stat.st_mtime_ns,
+                size=stat.st_size,
+                metadata=metadata,
+                body_hash=hashlib.sha256(_normalize_topic_body_for_dedup(text).encode("utf-8")).hexdigest(),
+                signature=minhash_signature(body),
+                frontmatter_normalized=_render_topic_file(_normalized_topic_metadata(path, metadata, body), body) == text,
+            )
+            self.topics[relative] = record
+            if record.signature is not None:
+                for key in lsh_band_keys(record.signature):
+                    self.lsh_buckets.setdefault(key, set()).add(relative)
+
+    def _drop(self, relative: str) -> None:
+        with self._lock:
+            record = self.topics.pop(relative, None)
+            if record is None or record.signature is None:
+                return
+            for key in lsh_band_keys(record.signature):
+                members = self.lsh_buckets.get(key)
+                if members is None:
+                    continue
+                members.discard(relative)
+                if not members:
+                    del self.lsh_buckets[key]
+
+
+_catalog_cache: dict[Path, TopicCatalog] = {}
+_catalog_cache_lock = threading.Lock()
+
+
+def load_topic_catalog(memory_root: Path) -> TopicCatalog:
+    # One catalog per memory root lives for the process; each load only
+    # re-reads topic files whose mtime or size changed since the last pass.
+    with _catalog_cache_lock:
+        catalog = _catalog_cache.get(memory_root)
+        if catalog is None:
+            catalog = TopicCatalog(memory_root=memory_root)
+            _catalog_cache[memory_root] = catalog
+    catalog.refresh()
+    return catalog
+
+
+def evict_topic_catalog(memory_root: Path) -> None:
+    with _catalog_cache_lock:
+        _catalog_cache.pop(memory_root, None)
+
+
 def parse_memory_index(index_text: str) -> tuple[list[MemoryIndexEntry], list[str]]:
     entries: list[MemoryIndexEntry] = []
     malformed: list[str] = []
@@ -103,11 +327,13 @@ def normalize_memory_index(
     max_lines: int = 200,
     max_bytes: int = 25_000,
     required_targets: list[str] | None = None,
+    catalog: TopicCatalog | None = None,
+    redirects: dict[str, str] | None = None,
 ) -> list[str]:
     index_path = memory_root / "MEMORY.md"
     index_text = index_path.read_text(encoding="utf-8") if index_path.exists() else ""
     entries, _ = parse_memory_index(index_text)
-    duplicate_map = _build_duplicate_topic_map(memory_root)
+    duplicate_map = {**(catalog or load_topic_catalog(memory_root)).duplicate_map(), **(redirects or {})}
 
     canonical_entries: dict[str, MemoryIndexEntry] = {}
     last_seen_order: dict[str, int] = {}
@@ -160,12 +386,12 @@ def normalize_memory_index(
     return []
 
 
-def audit_memory_store(memory_root: Path) -> MemoryAudit:
+def audit_memory_store(memory_root: Path, *, catalog: TopicCatalog | None = None) -> MemoryAudit:
+    catalog = catalog or load_topic_catalog(memory_root)
     index_text = (memory_root / "MEMORY.md").read_text(encoding="utf-8") if (memory_root / "MEMORY.md").exists() else ""
     entries, malformed = parse_memory_index(index_text)
-    topic_paths = _iter_topic_files(memory_root)
-    topic_relatives = [path.relative_to(memory_root).as_posix() for path in topic_paths]
-    duplicate_map = _build_duplicate_topic_map(memory_root)
+    topic_relatives = sorted(catalog.topics)
+    duplicate_map = catalog.duplicate_map()
 
     duplicate_target_counts: dict[str, int] = {}
     duplicate_line_counts: dict[str, int] = {}
@@ -186,21 +412,21 @@ def audit_memory_store(memory_root: Path) -> MemoryAudit:
             broken_links.append(f"line {entry.line_number}: {entry.target}")
 
     invalid_frontmatter: list[str] = []
-    for path in topic_paths:
-        metadata, _ = _read_topic_metadata(path)
+    for relative in topic_relatives:
+        metadata = catalog.topics[relative].metadata
         missing = [key for key in ("name", "description", "type") if not metadata.get(key)]
         invalid_type = metadata.get("type") not in VALID_MEMORY_TYPES
         if missing or invalid_type:
             details = ", ".join(missing + (["invalid type"] if invalid_type else []))
-            invalid_frontmatter.append(f"{path.relative_to(memory_root).as_posix()}: {details}")
+            invalid_frontmatter.append(f"{relative}: {details}")
 
-    exact_duplicates = _group_exact_duplicate_topics(memory_root)
+    exact_duplicates = catalog.duplicate_groups()
     orphan_topic_files = sorted(path for path in topic_relatives if duplicate_map.get(path, path) not in referenced_targets)
 
     stats = MemoryStoreStats(
         index_line_count=len([line for line in index_text.splitlines() if line.strip()]),
         index_bytes=len(index_text.encode("utf-8")),
-        topic_file_count=len(topic_paths),
+        topic_file_count=len(topic_relatives),
     )
     return MemoryAudit(
         stats=stats,
@@ -220,6 +446,7 @@ def audit_memory_store(memory_root: Path) -> MemoryAudit:
         orphan_topic_files=orphan_topic_files,
         invalid_frontmatter=invalid_frontmatter,
         exact_duplicate_topic_files=exact_duplicates,
+        near_duplicate_topic_files=catalog.near_duplicate_groups(),
     )
 
 
@@ -238,6 +465,7 @@ def format_audit_for_prompt(audit: MemoryAudit) -> str:
         f"- orphan topic files: {len(audit.orphan_topic_files)}",
         f"- invalid frontmatter files: {len(audit.invalid_frontmatter)}",
         f"- exact duplicate topic groups: {len(audit.exact_duplicate_topic_files)}",
+        f"- near-duplicate topic groups: {len(audit.near_duplicate_topic_files)}",
     ]
     detail_sections = [
         ("Broken links", audit.broken_links),
@@ -256,29 +484,125 @@ def format_audit_for_prompt(audit: MemoryAudit) -> str:
     if audit.exact_duplicate_topic_files:
         lines.extend(["", "### Exact duplicate topic groups"])
         lines.extend(f"- {', '.join(group)}" for group in audit.exact_duplicate_topic_files[:20])
+    if audit.near_duplicate_topic_files:
+        lines.extend(["", "### Near-duplicate topic groups"])
+        lines.extend(f"- {', '.join(group)}" for group in audit.near_duplicate_topic_files[:20])
     return "\n".join(lines)
 
 
 def apply_write_hygiene(memory_root: Path, *, touched_paths: list[str]) -> list[str]:
+    from .memory_search import update_search_index
+
+    catalog = load_topic_catalog(memory_root)
     changed: set[str] = set()
-    changed.update(_normalize_topic_frontmatter(memory_root))
+    changed.update(_normalize_topic_frontmatter(catalog))
     required_targets = [path for path in touched_paths if path.startswith("topics/") and path.endswith(".md")]
     changed.update(
         normalize_memory_index(
             memory_root,
             required_targets=required_targets,
+            catalog=catalog,
         )
     )
+    update_search_index(memory_root, [*touched_paths, *changed])
     return sorted(changed)
 
 
 def apply_post_consolidation_hygiene(memory_root: Path) -> list[str]:
+    from .memory_search import open_search_index
+
+    catalog = load_topic_catalog(memory_root)
     changed: set[str] = set()
-    changed.update(_normalize_topic_frontmatter(memory_root))
-    changed.update(normalize_memory_index(memory_root))
+    changed.update(_normalize_topic_frontmatter(catalog))
+    changed.update(normalize_memory_index(memory_root, catalog=catalog))
+    # Consolidation is not given a touched-path list, so reconcile by stat.
+    open_search_index(memory_root)
     return sorted(changed)
 
 
+def run_preconsolidation(memory_root: Path) -> PreconsolidationResult:
+    from .memory_search import update_search_index
+
+    # Everything here is decided without a model: exact copies are deleted,
+    # near-duplicates are merged line by line into the newest file, and the
+    # index is rebuilt. What needs judgment is left on a ranked worklist,
+    # including similar topics that were not close enough to merge blindly.
+    catalog = load_topic_catalog(memory_root)
+    result = PreconsolidationResult()
+    changed: set[str] = set()
+    redirects: dict[str, str] = {}
+
+    for group in catalog.duplicate_groups():
+        canonical, duplicates = group[0], group[1:]
+        for duplicate in duplicates:
+            (memory_root / duplicate).unlink(missing_ok=True)
+            redirects[duplicate] = canonical
+        result.removed_exact_duplicates.extend(duplicates)
+        changed.update(duplicates)
+    catalog.refresh(result.removed_exact_duplicates)
+
+    for group in catalog.near_duplicate_groups(threshold=NEAR_DUPLICATE_MERGE_SIMILARITY, same_type=True):
+        # Chained matches can join two files that are not close themselves,
+        # so a group is merged only when every pair clears the bar.
+        if any(
+            catalog.similarity(left, right) < NEAR_DUPLICATE_MERGE_SIMILARITY
+            for left, right in combinations(group, 2)
+        ):
+            continue
+        canonical, sources = _merge_near_duplicate_group(catalog, group)
+        for source in sources:
+            redirects[source] = canonical
+        result.merged_near_duplicates[canonical] = sources
+        changed.update([canonical, *sources])
+        catalog.refresh([canonical, *sources])
+    result.near_duplicates_for_review = catalog.near_duplicate_groups()
+
+    changed.update(_normalize_topic_frontmatter(catalog))
+    audit = audit_memory_store(memory_root, catalog=catalog)
+    changed.update(
+        normalize_memory_index(
+            memory_root,
+            required_targets=audit.orphan_topic_files,
+            catalog=catalog,
+            redirects={source: redirects.get(target, target) for source, target in redirects.items()},
+        ),
+    )
+    result.changed_paths = sorted(changed)
+    # Deleted and merged files must leave the search index even when no
+    # consolidation agent runs afterwards to trigger the post hygiene.
+    update_search_index(memory_root, result.changed_paths)
+    result.worklist = _build_consolidation_worklist(memory_root, catalog, result)
+    return result
+
+
+def format_worklist_for_prompt(memory_root: Path, worklist: list[ConsolidationWorkItem]) -> str:
+    if not worklist:
+        return ""
+    lines = ["## Prioritized worklist", ""]
+    remaining = WORKLIST_TOTAL_BYTES
+    inlined: set[str] = set()
+    for number, item in enumerate(worklist, start=1):
+        lines.append(f"### {number}. {item.kind}: {', '.join(item.paths) or 'MEMORY.md'}")
+        lines.append(item.note)
+        for relative in item.paths:
+            path = memory_root / relative
+            if relative in inlined or not path.is_file():
+                continue
+            text = path.read_text(encoding="utf-8")
+            if remaining <= 0:
+                lines.append(f"(body of `{relative}` not inlined; read it if needed)")
+                continue
+            budget = min(WORKLIST_FILE_BYTES, remaining)
+            body = text.encode("utf-8")[:budget].decode("utf-8", errors="ignore")
+            if len(body) < len(text):
+                body += "\n… (truncated; read the file for the rest)"
+            remaining -= len(body.encode("utf-8"))
+            inlined.add(relative)
+            lines.extend(["", f"`{relative}`:", "```markdown", body.rstrip(), "```"])
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
 def record_memory_activity(memory_root: Path, touched_paths: list[str]) -> ConsolidationState:
     relevant = [path for path in touched_paths if _is_memory_artifact(path)]
     state = _load_state(memory_root)
@@ -291,6 +615,22 @@ def record_memory_activity(memory_root: Path, touched_paths: list[str]) -> Conso
     return state
 
 
+def settle_extraction_writes(
+    memory_root: Path,
+    *,
+    before: Mapping[str, tuple[int, int]],
+    journal: set[str],
+) -> bool:
+    from .store import diff_touched_paths, stat_memory_files
+
+    # The tool journal is exact for agent writes; the stat comparison
+    # catches anything else that moved a file's mtime or size.
+    touched_after_extract = sorted(journal | set(diff_touched_paths(before, stat_memory_files(memory_root))))
+    hygiene_changed = apply_write_hygiene(memory_root, touched_paths=touched_after_extract)
+    record_memory_activity(memory_root, sorted({*touched_after_extract, *hygiene_changed}))
+    return should_run_consolidation(memory_root, audit_memory_store(memory_root))
+
+
 def should_run_consolidation(memory_root: Path, audit: MemoryAudit) -> bool:
     state = _load_state(memory_root)
     hours_since = (datetime.now(tz=timezone.utc).timestamp() - state.last_consolidated_at) / 3600
@@ -312,47 +652,140 @@ def mark_consolidated(memory_root: Path) -> None:
     _save_state(memory_root, state)
 
 
-def _normalize_topic_frontmatter(memory_root: Path) -> list[str]:
+def _normalize_topic_frontmatter(catalog: TopicCatalog) -> list[str]:
     changed: list[str] = []
-    for path in _iter_topic_files(memory_root):
+    for relative in sorted(catalog.topics):
+        if catalog.topics[relative].frontmatter_normalized:
+            continue
+        path = catalog.topics[relative].path
         metadata, body = _read_topic_metadata(path)
-        normalized = {
-            "name": metadata.get("name") or _derive_name_from_path(path),
-            "description": metadata.get("description") or _derive_description(body),
-            "type": metadata.get("type") if metadata.get("type") in VALID_MEMORY_TYPES else "reference",
-        }
-        normalized_text = _render_topic_file(normalized, body)
+        normalized_text = _render_topic_file(_normalized_topic_metadata(path, metadata, body), body)
         current_text = path.read_text(encoding="utf-8")
         if normalized_text != current_text:
             path.write_text(normalized_text, encoding="utf-8")
-            changed.append(path.relative_to(memory_root).as_posix())
+            changed.append(relative)
+    catalog.refresh(changed)
     return changed
 
 
-def _iter_topic_files(memory_root: Path) -> list[Path]:
-    topics_dir = memory_root / "topics"
-    if not topics_dir.exists():
-        return []
-    return sorted(path for path in topics_dir.rglob("*.md") if path.is_file())
+def _merge_near_duplicate_group(catalog: TopicCatalog, group: list[str]) -> tuple[str, list[str]]:
+    # The most recently written file is the base; lines that only exist in
+    # older copies are appended so nothing is lost before review.
+    ordered = sorted(group, key=lambda relative: (catalog.topics[relative].mtime_ns, relative), reverse=True)
+    canonical, sources = ordered[0], ordered[1:]
+    canonical_path = catalog.memory_root / canonical
+    metadata, body = _read_topic_metadata(canonical_path)
+    body_lines = body.splitlines()
+    seen = {" ".join(line.lower().split()) for line in body_lines if line.strip()}
+    for source in sources:
+        source_path = catalog.memory_root / source
+        _, source_body = _read_topic_metadata(source_path)
+        for line in source_body.splitlines():
+            key = " ".join(line.lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                body_lines.append(line)
+        source_path.unlink(missing_ok=True)
+    merged_body = "\n".join(body_lines)
+    canonical_path.write_text(
+        _render_topic_file(_normalized_topic_metadata(canonical_path, metadata, merged_body), merged_body),
+        encoding="utf-8",
+    )
+    return canonical, sorted(sources)
 
 
-def _build_duplicate_topic_map(memory_root: Path) -> dict[str, str]:
-    groups = _group_exact_duplicate_topics(memory_root)
-    duplicate_map: dict[str, str] = {}
-    for group in groups:
-        canonical = sorted(group)[0]
-        for filename in group:
-            duplicate_map[filename] = canonical
-    return duplicate_map
+def _build_consolidation_worklist(
+    memory_root: Path,
+    catalog: TopicCatalog,
+    result: PreconsolidationResult,
+) -> list[ConsolidationWorkItem]:
+    items: list[ConsolidationWorkItem] = []
+    for canonical, sources in result.merged_near_duplicates.items():
+        record = catalog.topics.get(canonical)
+        items.append(
+            ConsolidationWorkItem(
+                kind="review merged topic",
+                paths=[canonical],
+                note=(
+                    f"Merged from {', '.join(sources)}. Remove lines that repeat or contradict each other "
+                    "and make the frontmatter describe the merged content."
+                ),
+                impact=(len(sources) + 1) * (record.size if record else 0),
+            ),
+        )
 
+    for group in result.near_duplicates_for_review:
+        records = [catalog.topics[relative] for relative in group if relative in catalog.topics]
+        items.append(
+            ConsolidationWorkItem(
+                kind="review near-duplicate topics",
+                paths=group,
+                note=(
+                    "Similar enough to be the same memory, but not merged automatically. Merge them if they "
+                    "describe the same thing, keeping the frontmatter type that fits the merged content."
+                ),
+                impact=sum(record.size for record in records),
+            ),
+        )
 
-def _group_exact_duplicate_topics(memory_root: Path) -> list[list[str]]:
-    buckets: dict[str, list[str]] = {}
-    for path in _iter_topic_files(memory_root):
-        content = path.read_text(encoding="utf-8")
-        normalized = _normalize_topic_body_for_dedup(content)
-        buckets.setdefault(normalized, []).append(path.relative_to(memory_root).as_posix())
-    return [sorted(group) for group in buckets.values() if len(group) > 1]
+    state = _load_state(memory_root)
+    merged = set(result.merged_near_duplicates)
+    for relative in sorted(set(state.touched_topic_files_since_consolidation)):
+        record = catalog.topics.get(relative)
+        if record is None or relative in merged:
+            continue
+        items.append(
+            ConsolidationWorkItem(
+                kind="recently written topic",
+                paths=[relative],
+                note="Written since the last consolidation. Convert relative dates and fold it into related topics if one exists.",
+                impact=record.size,
+            ),
+        )
+
+    touched = {path for item in items for path in item.paths}
+    for relative, record in sorted(catalog.topics.items()):
+        if record.size > LARGE_TOPIC_BYTES and relative not in touched:
+            items.append(
+                ConsolidationWorkItem(
+                    kind="large topic",
+                    paths=[relative],
+                    note=f"{record.size} bytes. Tighten it so surfaced memory stays within the prompt cap.",
+                    impact=record.size,
+                ),
+            )
+
+    index_path = memory_root / "MEMORY.md"
+    index_text = index_path.read_text(encoding="utf-8") if index_path.exists() else ""
+    index_lines = len([line for line in index_text.splitlines() if line.strip()])
+    index_bytes = len(index_text.encode("utf-8"))
+    if index_lines > SOFT_INDEX_LINE_BUDGET or index_bytes > SOFT_INDEX_BYTE_BUDGET:
+        items.append(
+            ConsolidationWorkItem(
+                kind="index over budget",
+                paths=[],
+                note=f"MEMORY.md has {index_lines} lines and {index_bytes} bytes. Remove pointers to stale or low-value topics.",
+                impact=max(index_bytes - SOFT_INDEX_BYTE_BUDGET, 0) + 100 * max(index_lines - SOFT_INDEX_LINE_BUDGET, 0),
+            ),
+        )
+
+    # Merges and fresh writes are most likely to hold contradictions, so
+    # they lead; within a kind, bigger files and overruns come first.
+    items.sort(key=lambda item: (WORKLIST_KIND_ORDER.index(item.kind), -item.impact))
+    return items[:MAX_WORKLIST_ITEMS]
+
+
+def _normalized_topic_metadata(path: Path, metadata: dict[str, str], body: str) -> dict[str, str]:
+    return {
+        "name": metadata.get("name") or _derive_name_from_path(path),
+        "description": metadata.get("description") or _derive_description(body),
+        "type": _topic_type(metadata),
+    }
+
+
+def _topic_type(metadata: dict[str, str]) -> str:
+    memory_type = metadata.get("type")
+    return memory_type if memory_type in VALID_MEMORY_TYPES else "reference"
 
 
 def _normalize_topic_body_for_dedup(text: str) -> str:
@@ -372,14 +805,13 @@ def _parse_topic_text(text: str) -> tuple[dict[str, str], str]:
     metadata: dict[str, str] = {}
     body_start = 0
     if len(lines) >= 3 and lines[0].strip() == "---":
-        for index, line in enumerate(lines[1:], start=1):
-            if line.strip() == "---":
-                body_start = index + 1
-                break
-            if ":" not in line:
-                continue
-            key, value = line.split(":", 1)
-            metadata[key.strip()] = value.strip()
+        end_index = next(
+            (index for index, line in enumerate(lines[1:], start=1) if line.strip() == "---"),
+            len(lines),
+        )
+        metadata = parse_frontmatter_fields(lines[1:end_index])
+        if end_index < len(lines):
+            body_start = end_index + 1
     body = "\n".join(lines[body_start:]).strip()
     return metadata, body
 
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from dataclasses import dataclass
+import json
+import os
 from pathlib import Path
 import re
+import tempfile
+import threading
 
+from .frontmatter import read_frontmatter_block
+from .store import walk_memory_files
 
-FRONTMATTER_MAX_LINES = 30
+
+HEADER_CACHE_FILENAME = ".memory-framework-headers.json"
+HEADER_CACHE_VERSION = 1
+
+_cache_write_lock = threading.Lock()
 
 
 @dataclass(slots=True)
@@ -17,46 +28,124 @@ class MemoryHeader:
     memory_type: str | None
 
 
+class MemoryHeaderCache:
+    # Keeps one root's header entries in memory between scans, so a
+    # long-lived process skips re-reading the on-disk cache file each turn.
+    def __init__(self, memory_root: Path) -> None:
+        self.memory_root = memory_root
+        self._entries: dict[str, dict[str, object]] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def entry_count(self) -> int:
+        return len(self._entries) if self._entries is not None else 0
+
+    def scan(self) -> list[MemoryHeader]:
+        with self._lock:
+            if not self.memory_root.exists():
+                return []
+            cached = self._entries if self._entries is not None else _load_header_cache(self.memory_root)
+            headers, self._entries = _scan_headers(self.memory_root, cached)
+            return headers
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = None
+
+
 def scan_memory_headers(memory_root: Path) -> list[MemoryHeader]:
     if not memory_root.exists():
         return []
+    headers, _ = _scan_headers(memory_root, _load_header_cache(memory_root))
+    return headers
+
+
+def format_memory_manifest(headers: list[MemoryHeader]) -> str:
+    return "\n".join(_format_manifest_line(header) for header in headers)
 
-    headers: list[MemoryHeader] = []
-    for path in sorted(memory_root.rglob("*.md")):
-        if path.name == "MEMORY.md":
-            continue
 
-        relative = path.relative_to(memory_root).as_posix()
-        frontmatter = _read_frontmatter_block(path)
+def _scan_headers(
+    memory_root: Path,
+    cached: dict[str, dict[str, object]],
+) -> tuple[list[MemoryHeader], dict[str, dict[str, object]]]:
+    entries: dict[str, dict[str, object]] = {}
+    headers: list[MemoryHeader] = []
+    for relative, path, stat in _walk_markdown_files(memory_root):
+        entry = cached.get(relative)
+        if entry is None or entry.get("mtime_ns") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+            # Only new or changed files are opened; unchanged ones cost one stat.
+            frontmatter = read_frontmatter_block(path)
+            entry = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "description": _extract_frontmatter_value(frontmatter, "description"),
+                "type": _extract_frontmatter_value(frontmatter, "type"),
+            }
+        entries[relative] = entry
         headers.append(
             MemoryHeader(
                 filename=relative,
                 file_path=path,
-                mtime_ms=path.stat().st_mtime * 1000,
-                description=_extract_frontmatter_value(frontmatter, "description"),
-                memory_type=_extract_frontmatter_value(frontmatter, "type"),
+                mtime_ms=stat.st_mtime_ns / 1_000_000,
+                description=entry["description"],
+                memory_type=entry["type"],
             )
         )
 
+    if entries != cached:
+        _save_header_cache(memory_root, entries)
     headers.sort(key=lambda item: item.mtime_ms, reverse=True)
-    return headers
-
-
-def format_memory_manifest(headers: list[MemoryHeader]) -> str:
-    return "\n".join(_format_manifest_line(header) for header in headers)
-
-
-def _read_frontmatter_block(path: Path) -> str:
-    lines = path.read_text(encoding="utf-8").splitlines()
-    limited = lines[:FRONTMATTER_MAX_LINES]
-    if len(limited) >= 2 and limited[0].strip() == "---":
-        end_index = next(
-            (index for index, line in enumerate(limited[1:], start=1) if line.strip() == "---"),
-            None,
-        )
-        if end_index is not None:
-            return "\n".join(limited[1:end_index])
-    return "\n".join(limited)
+    return headers, entries
+
+
+def _walk_markdown_files(memory_root: Path) -> Iterator[tuple[str, Path, os.stat_result]]:
+    for relative, path, stat in walk_memory_files(memory_root):
+        if relative.endswith(".md") and relative.rpartition("/")[2] != "MEMORY.md":
+            yield relative, path, stat
+
+
+def _load_header_cache(memory_root: Path) -> dict[str, dict[str, object]]:
+    path = memory_root / HEADER_CACHE_FILENAME
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != HEADER_CACHE_VERSION:
+        return {}
+    entries = payload.get("entries")
+    if not isinstance(entries, dict):
+        return {}
+    return {
+        relative: entry
+        for relative, entry in entries.items()
+        if isinstance(entry, dict)
+    }
+
+
+def _save_header_cache(memory_root: Path, entries: dict[str, dict[str, object]]) -> None:
+    path = memory_root / HEADER_CACHE_FILENAME
+    payload = {"version": HEADER_CACHE_VERSION, "entries": entries}
+    with _cache_write_lock:
+        tmp_path: Path | None = None
+        try:
+            # A unique temp file per write, so scans in other processes never
+            # replace the cache with each other's half-written file.
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=memory_root,
+                prefix=f"{HEADER_CACHE_FILENAME}.",
+                suffix=".tmp",
+                delete=False,
+            ) as handle:
+                tmp_path = Path(handle.name)
+                handle.write(json.dumps(payload, sort_keys=True) + "\n")
+            tmp_path.replace(path)
+        except OSError:
+            # The cache is an optimization; a read-only root still scans correctly.
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            return
 
 
 def _extract_frontmatter_value(frontmatter: str, key: str) -> str | None:
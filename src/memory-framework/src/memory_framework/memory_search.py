@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import bisect
+import gzip
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from .store import walk_memory_files
+
+SEARCH_INDEX_FILENAME = ".memory-framework-search.json.gz"
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_COMPRESSLEVEL = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_PHRASE_RE = re.compile(r'"([^"]+)"')
+
+_index_cache: dict[Path, MemorySearchIndex] = {}
+_index_cache_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class IndexedDocument:
+    mtime_ns: int
+    size: int
+    length: int
+    terms: dict[str, list[int]]
+
+
+@dataclass(slots=True)
+class SearchHit:
+    path: str
+    score: float
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class MemorySearchIndex:
+    def __init__(self, memory_root: Path) -> None:
+        self.memory_root = memory_root
+        self._documents: dict[str, IndexedDocument] = {}
+        self._postings: dict[str, dict[str, list[int]]] = {}
+        self._total_length = 0
+        self._saved_mtime_ns: int | None = None
+        self._dirty = False
+        self._term_suffixes: list[tuple[str, str]] | None = None
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> Path:
+        return self.memory_root / SEARCH_INDEX_FILENAME
+
+    @property
+    def document_count(self) -> int:
+        return len(self._documents)
+
+    def refresh(self, *, save: bool = True) -> list[str]:
+        # A stat pass catches edits made outside the hygiene hook; only files
+        # whose mtime or size moved are re-read.
+        with self._lock:
+            seen: set[str] = set()
+            stale: list[str] = []
+            for relative, _, stat in walk_memory_files(self.memory_root):
+                seen.add(relative)
+                document = self._documents.get(relative)
+                if document is None or document.mtime_ns != stat.st_mtime_ns or document.size != stat.st_size:
+                    stale.append(relative)
+            stale.extend(relative for relative in self._documents if relative not in seen)
+            self.update(stale, save=save)
+            return stale
+
+    def update(self, relative_paths: Iterable[str], *, save: bool = True) -> None:
+        # Tool calls update in memory only; the hygiene hooks save once per
+        # extraction or consolidation pass, along with anything still unsaved.
+        with self._lock:
+            for relative in sorted(set(relative_paths)):
+                self._dirty |= self._remove_document(relative)
+                path = self.memory_root / relative
+                try:
+                    stat = path.stat()
+                    text = path.read_text(encoding="utf-8")
+                except (FileNotFoundError, IsADirectoryError, UnicodeDecodeError):
+                    continue
+                self._add_document(
+                    relative,
+                    IndexedDocument(
+                        mtime_ns=stat.st_mtime_ns,
+                        size=stat.st_size,
+                        length=0,
+                        terms=_term_positions(tokenize(text)),
+                    ),
+                )
+                self._dirty = True
+            if save and self._dirty:
+                self._save()
+
+    def search(self, query: str, *, limit: int = 10) -> list[SearchHit]:
+        with self._lock:
+            phrases = [tokenize(phrase) for phrase in _PHRASE_RE.findall(query)]
+            phrases = [phrase for phrase in phrases if phrase]
+            terms = tokenize(_PHRASE_RE.sub(" ", query))
+            query_terms = sorted({*terms, *(term for phrase in phrases for term in phrase)})
+            if not query_terms or not self._documents:
+                return []
+
+            candidates: set[str] | None = None
+            for phrase in phrases:
+                matches = self._phrase_documents(phrase)
+                candidates = matches if candidates is None else candidates & matches
+            if candidates is None:
+                candidates = {
+                    relative
+                    for term in query_terms
+                    for relative in self._postings.get(term, {})
+                }
+
+            scores = {relative: self._bm25(relative, query_terms) for relative in candidates}
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+            return [SearchHit(path=relative, score=score) for relative, score in ranked[:limit]]
+
+    def candidate_documents(self, needle: str) -> set[str] | None:
+        # Superset of files that can contain the needle as a case-insensitive
+        # substring. Edge tokens may be partial words: the first must end a
+        # term, the last must start one, and a lone token may sit anywhere.
+        with self._lock:
+            tokens = tokenize(needle)
+            if not tokens:
+                return None
+            candidates: set[str] | None = None
+            for position, token in enumerate(tokens):
+                if 0 < position < len(tokens) - 1:
+                    matches = set(self._postings.get(token, ()))
+                else:
+                    matches = {
+                        relative
+                        for term in self._edge_terms(
+                            token,
+                            ends_term=position == 0 and len(tokens) > 1,
+                            starts_term=position == len(tokens) - 1 and len(tokens) > 1,
+                        )
+                        for relative in self._postings[term]
+                    }
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return set()
+            return candidates
+
+    def _edge_terms(self, token: str, *, ends_term: bool, starts_term: bool) -> set[str]:
+        # Every suffix of every term, sorted, so a term contains the token
+        # exactly when one of its suffixes starts with it; a bisect finds
+        # them without walking the vocabulary.
+        if self._term_suffixes is None:
+            self._term_suffixes = sorted(
+                (term[offset:], term) for term in self._postings for offset in range(len(term))
+            )
+        start = bisect.bisect_left(self._term_suffixes, (token, ""))
+        upper = token + ("\0" if ends_term else "\uffff")
+        end = bisect.bisect_left(self._term_suffixes, (upper, ""), lo=start)
+        return {
+            term
+            for suffix, term in self._term_suffixes[start:end]
+            if not starts_term or len(suffix) == len(term)
+        }
+
+    def _phrase_documents(self, phrase: list[str]) -> set[str]:
+        first, rest = phrase[0], phrase[1:]
+        matches: set[str] = set()
+        for relative, positions in self._postings.get(first, {}).items():
+            following = [set(self._postings.get(term, {}).get(relative, ())) for term in rest]
+            if any(
+                all(start + offset in following[offset - 1] for offset in range(1, len(phrase)))
+                for start in positions
+            ):
+                matches.add(relative)
+        return matches
+
+    def _bm25(self, relative: str, query_terms: list[str]) -> float:
+        document = self._documents[relative]
+        count = len(self._documents)
+        average_length = self._total_length / count if count else 0.0
+        score = 0.0
+        for term in query_terms:
+            postings = self._postings.get(term)
+            if not postings or relative not in postings:
+                continue
+            frequency = len(postings[relative])
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * document.length / average_length) if average_length else BM25_K1
+            score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return score
+
+    def _add_document(self, relative: str, document: IndexedDocument) -> None:
+        document.length = sum(len(positions) for positions in document.terms.values())
+        self._documents[relative] = document
+        self._total_length += document.length
+        for term, positions in document.terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._term_suffixes = None
+            postings[relative] = positions
+
+    def _remove_document(self, relative: str) -> bool:
+        document = self._documents.pop(relative, None)
+        if document is None:
+            return False
+        self._total_length -= document.length
+        for term in document.terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(relative, None)
+            if not postings:
+                del self._postings[term]
+                self._term_suffixes = None
+        return True
+
+    def _load(self) -> None:
+        try:
+            stat = self.path.stat()
+            payload = json.loads(gzip.decompress(self.path.read_bytes()))
+        except (OSError, EOFError, json.JSONDecodeError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != SEARCH_INDEX_VERSION:
+            return
+        self._documents.clear()
+        self._postings.clear()
+        self._term_suffixes = None
+        self._total_length = 0
+        for relative, (mtime_ns, size, terms) in payload.get("documents", {}).items():
+            self._add_document(
+                relative,
+                IndexedDocument(mtime_ns=mtime_ns, size=size, length=0, terms=terms),
+            )
+        self._saved_mtime_ns = stat.st_mtime_ns
+        self._dirty = False
+
+    def _save(self) -> None:
+        # The on-disk form is the forward index; postings are rebuilt on load.
+        payload = {
+            "version": SEARCH_INDEX_VERSION,
+            "documents": {
+                relative: [document.mtime_ns, document.size, document.terms]
+                for relative, document in self._documents.items()
+            },
+        }
+        payload_bytes = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        tmp_path: Path | None = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=self.memory_root,
+                prefix=f"{SEARCH_INDEX_FILENAME}.",
+                suffix=".tmp",
+                delete=False,
+            ) as handle:
+                tmp_path = Path(handle.name)
+                handle.write(gzip.compress(payload_bytes, compresslevel=SEARCH_INDEX_COMPRESSLEVEL))
+            os.replace(tmp_path, self.path)
+            self._saved_mtime_ns = self.path.stat().st_mtime_ns
+            self._dirty = False
+        except OSError:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+
+
+def open_search_index(memory_root: Path, *, refresh: bool = True) -> MemorySearchIndex:
+    with _index_cache_lock:
+        index = _index_cache.get(memory_root)
+        created = index is None
+        if index is None:
+            index = MemorySearchIndex(memory_root)
+            index._load()
+            _index_cache[memory_root] = index
+        else:
+            try:
+                on_disk = index.path.stat().st_mtime_ns
+            except FileNotFoundError:
+                on_disk = None
+            if on_disk is not None and on_disk != index._saved_mtime_ns:
+                index._load()
+    # The first open in a process always catches up with edits made while
+    # no process held the index; later callers choose whether to stat.
+    if refresh or created:
+        index.refresh()
+    return index
+
+
+def evict_search_index(memory_root: Path) -> None:
+    # The on-disk index stays; only the in-process copy is released.
+    with _index_cache_lock:
+        _index_cache.pop(memory_root, None)
+
+
+def update_search_index(memory_root: Path, touched_paths: Iterable[str], *, save: bool = True) -> None:
+    open_search_index(memory_root, refresh=False).update(touched_paths, save=save)
+
+
+def _term_positions(tokens: list[str]) -> dict[str, list[int]]:
+    positions: dict[str, list[int]] = {}
+    for position, token in enumerate(tokens):
+        positions.setdefault(token, []).append(position)
+    return positions
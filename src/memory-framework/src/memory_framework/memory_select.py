@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from dataclasses import dataclass, field
+import threading
+import time
 
 from pydantic_ai import Agent
 
+from .memory_embeddings import MemoryEmbeddingIndex, ScoredMemory
 from .memory_scan import MemoryHeader, format_memory_manifest
+from .selection_cache import SelectionCache
 
 
 MAX_SELECTED_MEMORIES = 5
+PRESELECT_TOP_K = 12
+PRESELECT_ACCEPT_SCORE = 0.15
+PRESELECT_ACCEPT_MARGIN = 0.08
 
 
 SELECT_MEMORIES_SYSTEM_PROMPT = """You are selecting memory files that will clearly help answer a user's current query.
@@ -21,41 +29,313 @@ Return up to 5 filenames that will clearly be useful for the current query.
 - Return only filenames from the provided manifest."""
 
 
+_selection_agents: dict[str, Agent[None, MemorySelectionResult]] = {}
+_selection_agents_lock = threading.Lock()
+
+
 @dataclass(slots=True)
 class MemorySelectionResult:
     selected_filenames: list[str]
 
 
+@dataclass(slots=True)
+class PreselectionStats:
+    turns: int = 0
+    accepted: int = 0
+    llm_calls: int = 0
+    cache_hits: int = 0
+    local_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    turn_seconds: list[float] = field(default_factory=list)
+
+    @property
+    def accept_rate(self) -> float:
+        return self.accepted / self.turns if self.turns else 0.0
+
+    @property
+    def bypass_rate(self) -> float:
+        # Turns answered without the selector model, locally or from the cache.
+        return (self.accepted + self.cache_hits) / self.turns if self.turns else 0.0
+
+    @property
+    def estimated_seconds_saved(self) -> float:
+        if not self.llm_calls:
+            return 0.0
+        average_llm_seconds = self.llm_seconds / self.llm_calls
+        return (self.accepted + self.cache_hits) * average_llm_seconds - self.local_seconds
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.turn_seconds:
+            return 0.0
+        ordered = sorted(self.turn_seconds)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def format_summary(self) -> str:
+        return (
+            f"Memory selection: {self.turns} turns, {self.accepted} accepted locally "
+            f"({self.accept_rate:.0%}), {self.cache_hits} served from the selection cache "
+            f"({self.bypass_rate:.0%} without the selector model), {self.llm_calls} selector calls; "
+            f"local {self.local_seconds * 1000:.1f}ms total, ~{self.estimated_seconds_saved:.1f}s saved; "
+            f"per-turn latency p50 {self.latency_percentile(0.5) * 1000:.0f}ms, "
+            f"p95 {self.latency_percentile(0.95) * 1000:.0f}ms, max {max(self.turn_seconds, default=0.0) * 1000:.0f}ms"
+        )
+
+
+class MemorySelector:
+    def __init__(
+        self,
+        model: str,
+        *,
+        embedding_index: MemoryEmbeddingIndex | None = None,
+        stats: PreselectionStats | None = None,
+        cache: SelectionCache | None = None,
+    ) -> None:
+        self.model = model
+        self.embedding_index = embedding_index
+        self.cache = cache
+        self.stats = stats if stats is not None else PreselectionStats()
+        self.last_latency_seconds = 0.0
+        self._agent = _selection_agent(model)
+        self._manifest_key: tuple[tuple[str, float, str | None, str | None], ...] | None = None
+        self._manifest_text = ""
+        self._lock = threading.Lock()
+
+    def select(self, *, query: str, headers: list[MemoryHeader], already_surfaced: set[str]) -> list[MemoryHeader]:
+        return self.select_scored(query=query, headers=headers, already_surfaced=already_surfaced)[0]
+
+    def select_scored(
+        self,
+        *,
+        query: str,
+        headers: list[MemoryHeader],
+        already_surfaced: set[str],
+    ) -> tuple[list[MemoryHeader], dict[str, float] | None]:
+        # Also returns the local relevance of each selected memory, or None
+        # when preselection did not score them all.
+        started = time.perf_counter()
+        resolved, candidates, scores = _preselect(
+            query=query,
+            headers=headers,
+            already_surfaced=already_surfaced,
+            embedding_index=self.embedding_index,
+            stats=self.stats,
+            stats_lock=self._lock,
+        )
+        if resolved is None:
+            resolved = self._cached_selection(query, candidates)
+        if resolved is None:
+            llm_started = time.perf_counter()
+            result = self._agent.run_sync(self._prompt(query, candidates))
+            self._record_llm_call(time.perf_counter() - llm_started)
+            resolved = self._store_selection(query, candidates, result.output.selected_filenames)
+        self._record_turn(bool(candidates), time.perf_counter() - started)
+        return resolved, _selected_relevance(resolved, scores)
+
+    async def aselect(
+        self,
+        *,
+        query: str,
+        headers: list[MemoryHeader],
+        already_surfaced: set[str],
+    ) -> list[MemoryHeader]:
+        return (await self.aselect_scored(query=query, headers=headers, already_surfaced=already_surfaced))[0]
+
+    async def aselect_scored(
+        self,
+        *,
+        query: str,
+        headers: list[MemoryHeader],
+        already_surfaced: set[str],
+    ) -> tuple[list[MemoryHeader], dict[str, float] | None]:
+        started = time.perf_counter()
+        # The first preselection may embed many files, so keep it off the loop.
+        resolved, candidates, scores = await asyncio.to_thread(
+            _preselect,
+            query=query,
+            headers=headers,
+            already_surfaced=already_surfaced,
+            embedding_index=self.embedding_index,
+            stats=self.stats,
+            stats_lock=self._lock,
+        )
+        if resolved is None:
+            resolved = self._cached_selection(query, candidates)
+        if resolved is None:
+            llm_started = time.perf_counter()
+            result = await self._agent.run(self._prompt(query, candidates))
+            self._record_llm_call(time.perf_counter() - llm_started)
+            resolved = self._store_selection(query, candidates, result.output.selected_filenames)
+        self._record_turn(bool(candidates), time.perf_counter() - started)
+        return resolved, _selected_relevance(resolved, scores)
+
+    def _cached_selection(self, query: str, candidates: list[MemoryHeader]) -> list[MemoryHeader] | None:
+        if self.cache is None:
+            return None
+        filenames = self.cache.get(model=self.model, query=query, candidates=candidates)
+        if filenames is None:
+            return None
+        with self._lock:
+            self.stats.cache_hits += 1
+        return _resolve_selection(filenames, candidates)
+
+    def _store_selection(
+        self,
+        query: str,
+        candidates: list[MemoryHeader],
+        filenames: list[str],
+    ) -> list[MemoryHeader]:
+        selected = _resolve_selection(filenames, candidates)
+        if self.cache is not None:
+            self.cache.put(
+                model=self.model,
+                query=query,
+                candidates=candidates,
+                filenames=[header.filename for header in selected],
+            )
+        return selected
+
+    def _prompt(self, query: str, candidates: list[MemoryHeader]) -> str:
+        # Consecutive turns usually offer the same candidates, so the manifest
+        # is only re-rendered when a candidate's header actually changed.
+        key = tuple(
+            (header.filename, header.mtime_ms, header.description, header.memory_type)
+            for header in candidates
+        )
+        with self._lock:
+            if key != self._manifest_key:
+                self._manifest_key = key
+                self._manifest_text = format_memory_manifest(candidates)
+            manifest = self._manifest_text
+        return f"Query: {query}\n\nAvailable memories:\n{manifest}"
+
+    def _record_llm_call(self, seconds: float) -> None:
+        with self._lock:
+            self.stats.llm_calls += 1
+            self.stats.llm_seconds += seconds
+
+    def _record_turn(self, counted: bool, seconds: float) -> None:
+        # Preselection counts a turn exactly when it leaves candidates to pick
+        # from, which stays true when other threads are counting their turns.
+        with self._lock:
+            self.last_latency_seconds = seconds
+            if counted:
+                self.stats.turn_seconds.append(seconds)
+
+
 def select_relevant_memories(
     *,
     model: str,
     query: str,
     headers: list[MemoryHeader],
     already_surfaced: set[str],
+    embedding_index: MemoryEmbeddingIndex | None = None,
+    stats: PreselectionStats | None = None,
 ) -> list[MemoryHeader]:
+    selector = MemorySelector(model, embedding_index=embedding_index, stats=stats)
+    return selector.select(query=query, headers=headers, already_surfaced=already_surfaced)
+
+
+async def aselect_relevant_memories(
+    *,
+    model: str,
+    query: str,
+    headers: list[MemoryHeader],
+    already_surfaced: set[str],
+    embedding_index: MemoryEmbeddingIndex | None = None,
+    stats: PreselectionStats | None = None,
+) -> list[MemoryHeader]:
+    selector = MemorySelector(model, embedding_index=embedding_index, stats=stats)
+    return await selector.aselect(query=query, headers=headers, already_surfaced=already_surfaced)
+
+
+def _preselect(
+    *,
+    query: str,
+    headers: list[MemoryHeader],
+    already_surfaced: set[str],
+    embedding_index: MemoryEmbeddingIndex | None,
+    stats: PreselectionStats,
+    stats_lock: threading.Lock,
+) -> tuple[list[MemoryHeader] | None, list[MemoryHeader], dict[str, float]]:
+    # Returns the final selection when no model call is needed, otherwise the
+    # candidates the selector model should choose from, plus the local score
+    # of every candidate that was ranked.
     available = [header for header in headers if header.filename not in already_surfaced]
     if not available:
-        return []
+        return [], [], {}
+
+    with stats_lock:
+        stats.turns += 1
+    if embedding_index is None:
+        return None, available, {}
+    started = time.perf_counter()
+    scored = [
+        item
+        for item in embedding_index.search(query, headers, top_k=len(headers))
+        if item.header.filename not in already_surfaced
+    ][:PRESELECT_TOP_K]
+    decision, candidates = _preselection_decision(scored)
+    with stats_lock:
+        stats.local_seconds += time.perf_counter() - started
+    if not scored:
+        # Nothing in the query to match locally; the model sees every candidate.
+        return None, available, {}
+    scores = {item.header.filename: item.score for item in scored}
+    if decision == "accept":
+        with stats_lock:
+            stats.accepted += 1
+        return candidates, candidates, scores
+    return None, candidates, scores
+
+
+def _selected_relevance(selected: list[MemoryHeader], scores: dict[str, float]) -> dict[str, float] | None:
+    if not selected or any(header.filename not in scores for header in selected):
+        return None
+    return {header.filename: scores[header.filename] for header in selected}
+
+
+def _preselection_decision(scored: list[ScoredMemory]) -> tuple[str, list[MemoryHeader]]:
+    # Only a few strong matches well separated from the rest bypass the model.
+    # Weak scores are not proof of irrelevance: the lexical embedding misses
+    # paraphrases, so those turns still go to the selector.
+    confident = [item for item in scored if item.score >= PRESELECT_ACCEPT_SCORE][:MAX_SELECTED_MEMORIES]
+    next_score = scored[len(confident)].score if len(scored) > len(confident) else 0.0
+    if confident and confident[-1].score - next_score >= PRESELECT_ACCEPT_MARGIN:
+        return "accept", [item.header for item in confident]
+    return "llm", [item.header for item in scored]
 
-    agent = Agent(
+
+def _selection_agent(model: str) -> Agent[None, MemorySelectionResult]:
+    # One agent per model string for the whole process: the model, its
+    # provider and the provider's pooled HTTP client are resolved once, and
+    # the output schema is built once.
+    if not isinstance(model, str):
+        return _build_selection_agent(model)
+    with _selection_agents_lock:
+        agent = _selection_agents.get(model)
+        if agent is None:
+            agent = _selection_agents[model] = _build_selection_agent(model)
+        return agent
+
+
+def _build_selection_agent(model: str) -> Agent[None, MemorySelectionResult]:
+    return Agent(
         model,
         instructions=SELECT_MEMORIES_SYSTEM_PROMPT,
         output_type=MemorySelectionResult,
     )
-    manifest = format_memory_manifest(available)
-    result = agent.run_sync(
-        f"Query: {query}\n\nAvailable memories:\n{manifest}"
-    )
 
-    valid_filenames = {header.filename for header in available}
+
+def _resolve_selection(filenames: list[str], candidates: list[MemoryHeader]) -> list[MemoryHeader]:
+    valid_filenames = {header.filename for header in candidates}
     selected = []
     seen: set[str] = set()
-    for filename in result.output.selected_filenames:
+    for filename in filenames:
         if filename in valid_filenames and filename not in seen:
             selected.append(filename)
             seen.add(filename)
         if len(selected) >= MAX_SELECTED_MEMORIES:
             break
 
-    by_filename = {header.filename: header for header in available}
+    by_filename = {header.filename: header for header in candidates}
     return [by_filename[filename] for filename in selected]
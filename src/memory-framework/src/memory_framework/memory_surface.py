@@ -1,61 +1,275 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from pathlib import Path
+import re
+import threading
 
 from .memory_scan import MemoryHeader
+from .tokenizer import count_tokens
 
 
-MAX_SURFACED_MEMORY_LINES = 80
-MAX_SURFACED_MEMORY_BYTES = 8_000
+DEFAULT_SURFACE_TOKEN_BUDGET = 4_000
+MIN_SURFACED_MEMORY_TOKENS = 48
+SURFACE_CACHE_MAX_ENTRIES = 512
+# Local scores are lexical, so a memory the selector model chose for a
+# paraphrase can score near zero; it still gets a real share of the budget.
+MIN_RELEVANCE_WEIGHT = 0.05
 
+NO_SURFACED_MEMORIES = "(no relevant topic memories surfaced for this turn)"
+TRUNCATION_NOTE = (
+    "> This memory file was truncated for the prompt. Use the saved content "
+    "here as context, but remember the original file contains more detail."
+)
+# Blocks, sections and paragraphs are joined with a blank line; budget one
+# token for each join.
+JOIN_TOKENS = 1
+# A cut line ends at a sentence when that keeps at least this much of it.
+SENTENCE_CUT_MIN_FRACTION = 0.8
 
-def surface_selected_memories(headers: list[MemoryHeader]) -> str:
+_HEADING_RE = re.compile(r"^#{1,6}\s")
+_WORD_RE = re.compile(r"\S+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s|$)")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+_prepared_cache: OrderedDict[tuple[Path, float], PreparedMemory] = OrderedDict()
+_prepared_cache_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class PreparedMemory:
+    rendered: str
+    tokens: int
+    heading: str
+    heading_tokens: int
+    sections: list[list[tuple[str, int]]]
+    section_tokens: list[int]
+
+
+def surface_selected_memories(
+    headers: list[MemoryHeader],
+    *,
+    token_budget: int = DEFAULT_SURFACE_TOKEN_BUDGET,
+    relevance: Mapping[str, float] | None = None,
+) -> str:
     if not headers:
-        return "(no relevant topic memories surfaced for this turn)"
+        return NO_SURFACED_MEMORIES
+
+    prepared = [_prepare_memory(header) for header in headers]
+    weights = [
+        max(relevance.get(header.filename, 0.0), MIN_RELEVANCE_WEIGHT) / (rank + 1) if relevance else 1.0 / (rank + 1)
+        for rank, header in enumerate(headers)
+    ]
+    note_tokens = count_tokens(TRUNCATION_NOTE) + JOIN_TOKENS
+    active = list(range(len(headers)))
+    while True:
+        omitted_line = _format_omitted([headers[index] for index in range(len(headers)) if index not in active])
+        available = (
+            token_budget
+            - count_tokens(omitted_line)
+            - JOIN_TOKENS * (len(active) - 1 + (1 if omitted_line else 0))
+        )
+        allotments = _allocate_budget(
+            needs={index: prepared[index].tokens for index in active},
+            weights={index: weights[index] for index in active},
+            budget=max(0, available),
+        )
+        # A memory that can neither fit whole nor keep a useful excerpt is
+        # dropped, lowest rank first, and its share goes to the others.
+        starved = [
+            index
+            for index in active
+            if allotments[index] < prepared[index].tokens
+            and allotments[index] - prepared[index].heading_tokens - JOIN_TOKENS - note_tokens
+            < MIN_SURFACED_MEMORY_TOKENS
+        ]
+        if not starved:
+            break
+        active.remove(max(starved, key=lambda index: (-weights[index], index)))
 
     blocks: list[str] = []
-    for header in headers:
-        content = header.file_path.read_text(encoding="utf-8").strip()
-        truncated_content, truncated = _truncate_memory_content(content)
-        saved_text = datetime.fromtimestamp(
-            header.mtime_ms / 1000,
-            tz=timezone.utc,
-        ).isoformat()
-        suffix = ""
-        if truncated:
-            suffix = (
-                "\n\n> This memory file was truncated for the prompt. Use the saved content "
-                "here as context, but remember the original file contains more detail."
-            )
-        blocks.append(
-            "\n".join(
-                [
-                    f"Memory ({saved_text}): {header.filename}",
-                    "",
-                    truncated_content + suffix,
-                ]
-            )
+    for index in active:
+        memory = prepared[index]
+        if allotments[index] >= memory.tokens:
+            blocks.append(memory.rendered)
+            continue
+        excerpt = _trim_to_budget(
+            memory,
+            allotments[index] - memory.heading_tokens - JOIN_TOKENS - note_tokens,
         )
+        blocks.append(f"{memory.heading}\n\n{excerpt}\n\n{TRUNCATION_NOTE}")
+    if omitted_line:
+        blocks.append(omitted_line)
+    return "\n\n".join(blocks) if blocks else NO_SURFACED_MEMORIES
+
+
+def _allocate_budget(*, needs: dict[int, int], weights: dict[int, float], budget: int) -> dict[int, int]:
+    # Water-filling: every memory is offered a share proportional to its
+    # weight; memories that need less than their share are filled completely
+    # and the surplus is split again among the rest.
+    allotments = dict.fromkeys(needs, 0)
+    remaining = budget
+    unfilled = set(needs)
+    while unfilled and remaining > 0:
+        total_weight = sum(weights[index] for index in unfilled)
+        filled = [
+            index
+            for index in unfilled
+            if needs[index] - allotments[index] <= remaining * weights[index] / total_weight
+        ]
+        if filled:
+            for index in filled:
+                remaining -= needs[index] - allotments[index]
+                allotments[index] = needs[index]
+                unfilled.discard(index)
+            continue
+        for index in unfilled:
+            allotments[index] += int(remaining * weights[index] / total_weight)
+        break
+    return allotments
+
 
-    return "\n\n".join(blocks)
+def _trim_to_budget(memory: PreparedMemory, budget: int) -> str:
+    # Whole sections first; the first section that does not fit contributes
+    # whole paragraphs, and the paragraph that overflows is cut to fill what
+    # is left, unless only a scrap would remain after earlier content.
+    parts: list[str] = []
+    used = 0
+    for section, section_tokens in zip(memory.sections, memory.section_tokens, strict=True):
+        cost = section_tokens + (JOIN_TOKENS if parts else 0)
+        if used + cost <= budget:
+            parts.append("\n\n".join(text for text, _ in section))
+            used += cost
+            continue
+        for text, tokens in section:
+            cost = tokens + (JOIN_TOKENS if parts else 0)
+            if used + cost <= budget:
+                parts.append(text)
+                used += cost
+                continue
+            remaining = budget - used - (JOIN_TOKENS if parts else 0)
+            if not parts or remaining >= MIN_SURFACED_MEMORY_TOKENS:
+                parts.append(_trim_lines(text, remaining))
+            break
+        break
+    return "\n\n".join(part for part in parts if part) or "(excerpt omitted for the token budget)"
 
 
-def _truncate_memory_content(content: str) -> tuple[str, bool]:
-    if not content:
-        return "(empty)", False
+def _trim_lines(text: str, budget: int) -> str:
+    kept: list[str] = []
+    used = 0
+    for line in text.splitlines():
+        tokens = count_tokens(line) + (JOIN_TOKENS if kept else 0)
+        if used + tokens > budget:
+            kept.append(_cut_line(line, budget - used - (JOIN_TOKENS if kept else 0)))
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(line for line in kept if line)
 
+
+def _cut_line(line: str, budget: int) -> str:
+    # The longest prefix that fits, ending on a word boundary; a line with no
+    # spaces to cut at is cut by character. If the prefix ends close enough
+    # after a sentence end, the cut moves back to the sentence end.
+    if budget <= 0:
+        return ""
+    positions = [match.end() for match in _WORD_RE.finditer(line)]
+    if not positions or count_tokens(line[: positions[0]]) > budget:
+        positions = list(range(1, len(line) + 1))
+    low, high = 0, len(positions)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(line[: positions[middle - 1]]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    if not low:
+        return ""
+    cut = line[: positions[low - 1]]
+    sentence_ends = [match.end() for match in _SENTENCE_END_RE.finditer(cut)]
+    if sentence_ends and sentence_ends[-1] >= SENTENCE_CUT_MIN_FRACTION * len(cut):
+        return cut[: sentence_ends[-1]]
+    return cut
+
+
+def _prepare_memory(header: MemoryHeader) -> PreparedMemory:
+    # Rendering and token counting depend only on the file content, so the
+    # result is reused until the file's mtime moves.
+    key = (header.file_path, header.mtime_ms)
+    with _prepared_cache_lock:
+        cached = _prepared_cache.get(key)
+        if cached is not None:
+            _prepared_cache.move_to_end(key)
+            return cached
+
+    content = header.file_path.read_text(encoding="utf-8").strip() or "(empty)"
+    saved_text = datetime.fromtimestamp(header.mtime_ms / 1000, tz=timezone.utc).isoformat()
+    heading = f"Memory ({saved_text}): {header.filename}"
+    rendered = f"{heading}\n\n{content}"
+    sections = [
+        [(paragraph, count_tokens(paragraph)) for paragraph in _split_paragraphs(section)]
+        for section in _split_sections(content)
+    ]
+    prepared = PreparedMemory(
+        rendered=rendered,
+        tokens=count_tokens(rendered),
+        heading=heading,
+        heading_tokens=count_tokens(heading),
+        sections=sections,
+        section_tokens=[
+            sum(tokens for _, tokens in section) + JOIN_TOKENS * (len(section) - 1)
+            for section in sections
+        ],
+    )
+    with _prepared_cache_lock:
+        _prepared_cache[key] = prepared
+        while len(_prepared_cache) > SURFACE_CACHE_MAX_ENTRIES:
+            _prepared_cache.popitem(last=False)
+    return prepared
+
+
+def _split_sections(content: str) -> list[str]:
+    # Frontmatter is its own section, and every Markdown heading outside a
+    # code fence starts a new one.
     lines = content.splitlines()
-    truncated = lines[:MAX_SURFACED_MEMORY_LINES]
-    text = "\n".join(truncated)
-    was_truncated = len(lines) > MAX_SURFACED_MEMORY_LINES
-
-    encoded = text.encode("utf-8")
-    if len(encoded) > MAX_SURFACED_MEMORY_BYTES:
-        candidate = encoded[:MAX_SURFACED_MEMORY_BYTES]
-        cut_at = candidate.rfind(b"\n")
-        if cut_at > 0:
-            candidate = candidate[:cut_at]
-        text = candidate.decode("utf-8", errors="ignore").rstrip()
-        was_truncated = True
-
-    return text, was_truncated
+    sections: list[list[str]] = [[]]
+    start = 0
+    if lines and lines[0].strip() == "---":
+        for index in range(1, len(lines)):
+            if lines[index].strip() == "---":
+                sections = [lines[: index + 1], []]
+                start = index + 1
+                break
+    in_fence = False
+    for line in lines[start:]:
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence and _HEADING_RE.match(line) and any(part.strip() for part in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+    return [text for text in ("\n".join(section).strip() for section in sections) if text]
+
+
+def _split_paragraphs(section: str) -> list[str]:
+    paragraphs: list[list[str]] = [[]]
+    in_fence = False
+    for line in section.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        if not in_fence and not line.strip():
+            if paragraphs[-1]:
+                paragraphs.append([])
+            continue
+        paragraphs[-1].append(line)
+    return ["\n".join(paragraph) for paragraph in paragraphs if paragraph]
+
+
+def _format_omitted(headers: list[MemoryHeader]) -> str:
+    if not headers:
+        return ""
+    names = ", ".join(header.filename for header in headers)
+    return f"(Also selected but not surfaced for the prompt budget: {names})"
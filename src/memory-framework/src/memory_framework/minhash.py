@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+_LANES_PER_DIGEST = 16
+_DIGEST_SEEDS = [bytes([seed]) for seed in range(MINHASH_PERMUTATIONS // _LANES_PER_DIGEST)]
+_UNPACK_LANES = struct.Struct(f"<{_LANES_PER_DIGEST}I").unpack
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, *, size: int = SHINGLE_SIZE) -> set[str]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[index : index + size]) for index in range(len(tokens) - size + 1)}
+
+
+def minhash_signature(text: str) -> tuple[int, ...] | None:
+    # Each seeded 64-byte blake2b digest supplies 16 independent 32-bit hash
+    # lanes, so a shingle costs 8 digests rather than 128 Python-level hashes.
+    encoded = [shingle.encode("utf-8") for shingle in shingles(text)]
+    if not encoded:
+        return None
+    signature: list[int] = []
+    for seed in _DIGEST_SEEDS:
+        lanes = [_UNPACK_LANES(hashlib.blake2b(seed + value, digest_size=64).digest()) for value in encoded]
+        signature.extend(map(min, zip(*lanes, strict=True)))
+    return tuple(signature)
+
+
+def lsh_band_keys(signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+    # With 32 bands of 4 rows, pairs above ~0.42 estimated Jaccard share a
+    # bucket with high probability; candidates are verified afterwards.
+    return [
+        (band, signature[band * LSH_ROWS : (band + 1) * LSH_ROWS])
+        for band in range(LSH_BANDS)
+    ]
+
+
+def estimated_similarity(left: tuple[int, ...], right: tuple[int, ...]) -> float:
+    return sum(1 for a, b in zip(left, right, strict=True) if a == b) / len(left)
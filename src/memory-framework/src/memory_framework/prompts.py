@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import date
+from textwrap import dedent
 
 
 TOPIC_FRONTMATTER_EXAMPLE = """```markdown
@@ -87,6 +88,18 @@ def build_selected_memories_instructions(selected_memories_text: str) -> str:
     return f"Relevant surfaced topic memories for this turn:\n\n{cleaned}"
 
 
+def render_turn_transcript(*, user_text: str, assistant_text: str) -> str:
+    return dedent(
+        f"""\
+        [user]
+        {user_text}
+
+        [assistant]
+        {assistant_text}
+        """,
+    ).strip()
+
+
 def build_extract_prompt(
     *,
     turn_transcript: str,
@@ -140,7 +153,18 @@ Saving a memory is a two-step process:
 """
 
 
-def build_consolidation_prompt(memory_root: str, *, audit_summary: str) -> str:
+def build_consolidation_prompt(memory_root: str, *, audit_summary: str, worklist: str = "") -> str:
+    if worklist.strip():
+        orient = """Exact duplicates, close near-duplicate merges, broken index links, and frontmatter have already been fixed locally; looser near-duplicates are listed on the worklist. Start with the prioritized worklist below; the relevant file bodies are inlined, so only read or list other files when a worklist item needs it.
+
+- Work through the worklist in order
+- Use search to find topic files that cover the same subject before merging"""
+    else:
+        orient = """- List the memory directory
+- Read `MEMORY.md` to understand the current index
+- Skim existing topic files so you improve them rather than creating duplicates
+- Use search to find topic files that cover the same subject before merging"""
+    worklist_section = f"\n\n{worklist.strip()}" if worklist.strip() else ""
     return f"""# Memory Consolidation
 
 You are performing a maintenance pass over the memory files at `{memory_root}`.
@@ -149,9 +173,7 @@ This directory already exists. Write directly to it; do not waste steps checking
 
 ## Phase 1 — Orient
 
-- List the memory directory
-- Read `MEMORY.md` to understand the current index
-- Skim existing topic files so you improve them rather than creating duplicates
+{orient}
 
 ## Phase 2 — Consolidate
 
@@ -173,6 +195,6 @@ Update `MEMORY.md` so it stays under 200 lines and under ~25KB. It is an index,
 - add pointers for newly important memories
 - resolve contradictions between files
 
-{audit_summary.strip()}
+{audit_summary.strip()}{worklist_section}
 
 Return a brief summary of what you consolidated, updated, or pruned. If nothing changed, say so."""
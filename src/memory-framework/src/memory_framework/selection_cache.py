@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from .memory_scan import MemoryHeader
+
+DEFAULT_SELECTION_CACHE_TTL_SECONDS = 600.0
+DEFAULT_SELECTION_CACHE_MAX_ENTRIES = 256
+
+_QUERY_TOKEN_RE = re.compile(r"\w+")
+
+_shared_caches: dict[Path, SelectionCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class CachedSelection:
+    filenames: list[str]
+    stored_at: float
+
+
+def normalize_query(query: str) -> str:
+    # Case, punctuation and spacing differences between otherwise identical
+    # questions should not cost another selector round trip.
+    return " ".join(_QUERY_TOKEN_RE.findall(query.casefold()))
+
+
+def manifest_fingerprint(candidates: list[MemoryHeader]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for header in candidates:
+        for value in (header.filename, repr(header.mtime_ms), header.description or "", header.memory_type or ""):
+            digest.update(value.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+class SelectionCache:
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = DEFAULT_SELECTION_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_SELECTION_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str, str], CachedSelection] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, *, model: str, query: str, candidates: list[MemoryHeader]) -> list[str] | None:
+        key = self._key(model, query, candidates)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry.stored_at > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry.filenames)
+
+    def put(self, *, model: str, query: str, candidates: list[MemoryHeader], filenames: list[str]) -> None:
+        key = self._key(model, query, candidates)
+        with self._lock:
+            self._entries[key] = CachedSelection(filenames=list(filenames), stored_at=self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def format_summary(self) -> str:
+        return (
+            f"Selection cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%} hit rate), {len(self._entries)} entries"
+        )
+
+    @staticmethod
+    def _key(model: str, query: str, candidates: list[MemoryHeader]) -> tuple[str, str, str]:
+        # A changed candidate header changes the fingerprint, so stale
+        # selections are never returned; they simply age out of the LRU.
+        query_hash = hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=16).hexdigest()
+        model_key = model if isinstance(model, str) else f"{type(model).__name__}@{id(model):x}"
+        return model_key, query_hash, manifest_fingerprint(candidates)
+
+
+def shared_selection_cache(memory_root: Path) -> SelectionCache:
+    # Sessions in one process that share a memory root share one cache.
+    with _shared_caches_lock:
+        cache = _shared_caches.get(memory_root)
+        if cache is None:
+            cache = _shared_caches[memory_root] = SelectionCache()
+        return cache
+
+
+def evict_selection_cache(memory_root: Path) -> None:
+    with _shared_caches_lock:
+        _shared_caches.pop(memory_root, None)
@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .agents import build_consolidate_agent, build_extract_agent, build_main_agent
+from .caps import truncate_entrypoint_content
+from .consolidation_runner import prepare_consolidation
+from .deps import MemoryDeps
+from .extraction_runner import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_LATENCY_SECONDS,
+    ExtractionBatcher,
+    ExtractionJob,
+    build_extraction_prompt,
+)
+from .memory_embeddings import MemoryEmbeddingIndex, embeddings_available
+from .memory_maintenance import (
+    apply_post_consolidation_hygiene,
+    evict_topic_catalog,
+    mark_consolidated,
+    settle_extraction_writes,
+)
+from .memory_scan import MemoryHeaderCache
+from .memory_search import evict_search_index
+from .memory_select import MemorySelector
+from .memory_surface import DEFAULT_SURFACE_TOKEN_BUDGET, surface_selected_memories
+from .selection_cache import evict_selection_cache, shared_selection_cache
+from .store import ensure_memory_layout, read_index, stat_memory_files
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_CACHED_HEADERS = 100_000
+DEFAULT_MAX_RESIDENT_ROOTS = 1_000
+
+
+@dataclass(slots=True)
+class MemoryTenant:
+    memory_root: Path
+    header_cache: MemoryHeaderCache
+    selector: MemorySelector
+    batcher: ExtractionBatcher
+    turn_number: int = 0
+    consolidation_requested: bool = False
+    busy: bool = False
+    active_turns: int = 0
+    cached_headers: int = 0
+    last_consolidation_summary: str | None = None
+
+    @property
+    def idle(self) -> bool:
+        return not (self.busy or self.active_turns or self.batcher.pending or self.consolidation_requested)
+
+
+@dataclass(slots=True)
+class MemoryServiceStats:
+    turns: int = 0
+    extraction_batches_run: int = 0
+    extraction_jobs_run: int = 0
+    consolidations_run: int = 0
+    tenants_evicted: int = 0
+
+    def format_summary(self) -> str:
+        return (
+            f"Memory service: {self.turns} turns, {self.extraction_jobs_run} turns in "
+            f"{self.extraction_batches_run} extraction passes, {self.consolidations_run} consolidation passes, "
+            f"{self.tenants_evicted} memory roots evicted from the in-process caches"
+        )
+
+
+class MemoryService:
+    # Serves many memory roots from one process. Maintenance for a root is
+    # serialized by running at most one extraction or consolidation pass per
+    # root at a time on a shared, bounded worker pool.
+    def __init__(
+        self,
+        *,
+        model: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_consolidation_workers: int | None = None,
+        max_cached_headers: int = DEFAULT_MAX_CACHED_HEADERS,
+        max_resident_roots: int = DEFAULT_MAX_RESIDENT_ROOTS,
+        extraction_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        extraction_max_latency: float = DEFAULT_MAX_LATENCY_SECONDS,
+        local_preselect: bool = True,
+        surface_token_budget: int = DEFAULT_SURFACE_TOKEN_BUDGET,
+    ) -> None:
+        self.model = model
+        self.surface_token_budget = surface_token_budget
+        self.main_agent = build_main_agent(model)
+        self.extract_agent = build_extract_agent(model)
+        self.consolidate_agent = build_consolidate_agent(model)
+        self.stats = MemoryServiceStats()
+        self._max_workers = max(1, max_workers)
+        # Consolidation never takes the whole pool, so extraction for other
+        # roots keeps moving while long consolidation passes run.
+        self._max_consolidation_workers = max(
+            1,
+            min(self._max_workers, max_consolidation_workers or max(1, self._max_workers // 2)),
+        )
+        self._max_cached_headers = max_cached_headers
+        self._max_resident_roots = max(1, max_resident_roots)
+        self._extraction_batch_size = extraction_batch_size
+        self._extraction_max_latency = extraction_max_latency
+        self._local_preselect = local_preselect and embeddings_available()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="memory-service")
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._tenants: OrderedDict[Path, MemoryTenant] = OrderedDict()
+        self._extraction_queue: deque[Path] = deque()
+        self._consolidation_queue: deque[Path] = deque()
+        self._in_flight = 0
+        self._consolidations_in_flight = 0
+        self._cached_headers = 0
+        self._flushing = 0
+        self._timer: threading.Timer | None = None
+        self._accepting_submissions = True
+        self._closed = False
+
+    def __enter__(self) -> MemoryService:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def tenant(self, memory_root: Path) -> MemoryTenant:
+        with self._lock:
+            return self._tenant_locked(memory_root)
+
+    def run_turn(
+        self,
+        *,
+        memory_root: Path,
+        user_text: str,
+        message_history: list[Any],
+        already_surfaced: set[str],
+    ) -> tuple[str, list[Any]]:
+        with self._lock:
+            if not self._accepting_submissions:
+                raise RuntimeError("This memory service is closed.")
+            tenant = self._tenant_locked(memory_root)
+            tenant.active_turns += 1
+        try:
+            index_snippet = truncate_entrypoint_content(read_index(memory_root)).content
+            headers = tenant.header_cache.scan()
+            with self._lock:
+                self._cached_headers += tenant.header_cache.entry_count - tenant.cached_headers
+                tenant.cached_headers = tenant.header_cache.entry_count
+            selected_headers, relevance = tenant.selector.select_scored(
+                query=user_text,
+                headers=headers,
+                already_surfaced=already_surfaced,
+            )
+            result = self.main_agent.run_sync(
+                user_text,
+                message_history=message_history,
+                deps=MemoryDeps(
+                    memory_root=memory_root,
+                    index_snippet=index_snippet,
+                    selected_memories_text=surface_selected_memories(
+                        selected_headers,
+                        token_budget=self.surface_token_budget,
+                        relevance=relevance,
+                    ),
+                ),
+            )
+        except BaseException:
+            with self._lock:
+                tenant.active_turns -= 1
+            raise
+
+        already_surfaced.update(header.filename for header in selected_headers)
+        with self._lock:
+            # The turn's job is queued before the tenant is released, so an
+            # eviction can never separate a root from its pending work.
+            tenant.active_turns -= 1
+            self.stats.turns += 1
+            tenant.turn_number += 1
+            self._submit_locked(
+                tenant,
+                ExtractionJob(
+                    turn_number=tenant.turn_number,
+                    user_text=user_text,
+                    assistant_text=result.output,
+                    memory_root=memory_root,
+                ),
+            )
+            self._evict_locked()
+        return result.output, list(result.new_messages())
+
+    def submit_extraction(self, job: ExtractionJob) -> None:
+        with self._lock:
+            if not self._accepting_submissions:
+                return
+            self._submit_locked(self._tenant_locked(job.memory_root), job)
+
+    def request_consolidation(self, memory_root: Path) -> None:
+        with self._lock:
+            if not self._accepting_submissions:
+                return
+            self._request_consolidation_locked(self._tenant_locked(memory_root))
+            self._dispatch_locked()
+
+    def drain(self) -> None:
+        with self._lock:
+            self._flushing += 1
+            try:
+                self._dispatch_locked()
+                while self._in_flight or self._extraction_queue or self._consolidation_queue:
+                    self._idle.wait()
+                    self._dispatch_locked()
+            finally:
+                self._flushing -= 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._accepting_submissions = False
+        self.drain()
+        with self._lock:
+            self._closed = True
+            self._cancel_timer_locked()
+        self._executor.shutdown(wait=True)
+
+    def _tenant_locked(self, memory_root: Path) -> MemoryTenant:
+        tenant = self._tenants.get(memory_root)
+        if tenant is None:
+            ensure_memory_layout(memory_root)
+            tenant = MemoryTenant(
+                memory_root=memory_root,
+                header_cache=MemoryHeaderCache(memory_root),
+                selector=MemorySelector(
+                    self.model,
+                    embedding_index=MemoryEmbeddingIndex(memory_root) if self._local_preselect else None,
+                    cache=shared_selection_cache(memory_root),
+                ),
+                batcher=ExtractionBatcher(
+                    max_batch_size=self._extraction_batch_size,
+                    max_latency_seconds=self._extraction_max_latency,
+                ),
+            )
+            self._tenants[memory_root] = tenant
+        self._tenants.move_to_end(memory_root)
+        return tenant
+
+    def _submit_locked(self, tenant: MemoryTenant, job: ExtractionJob) -> None:
+        if not tenant.batcher.pending:
+            self._extraction_queue.append(tenant.memory_root)
+        tenant.batcher.add(job, now=time.monotonic())
+        self._dispatch_locked()
+
+    def _request_consolidation_locked(self, tenant: MemoryTenant) -> None:
+        # A root waits in the round-robin queue at most once, so a busy
+        # tenant cannot crowd out consolidation for everyone else.
+        if not tenant.consolidation_requested:
+            tenant.consolidation_requested = True
+            self._consolidation_queue.append(tenant.memory_root)
+
+    def _dispatch_locked(self) -> None:
+        if self._closed:
+            return
+        while self._in_flight < self._max_workers:
+            if not self._start_extraction_locked() and not self._start_consolidation_locked():
+                break
+        self._arm_timer_locked()
+
+    def _start_extraction_locked(self) -> bool:
+        now = time.monotonic()
+        for _ in range(len(self._extraction_queue)):
+            memory_root = self._extraction_queue.popleft()
+            tenant = self._tenants[memory_root]
+            batch = [] if tenant.busy else tenant.batcher.take_batch(now=now, force=bool(self._flushing))
+            if not batch:
+                self._extraction_queue.append(memory_root)
+                continue
+            if tenant.batcher.pending:
+                self._extraction_queue.append(memory_root)
+            self._start_locked(tenant, self._run_extraction, batch)
+            return True
+        return False
+
+    def _start_consolidation_locked(self) -> bool:
+        if self._consolidations_in_flight >= self._max_consolidation_workers:
+            return False
+        for _ in range(len(self._consolidation_queue)):
+            memory_root = self._consolidation_queue.popleft()
+            tenant = self._tenants[memory_root]
+            if tenant.busy:
+                self._consolidation_queue.append(memory_root)
+                continue
+            tenant.consolidation_requested = False
+            self._consolidations_in_flight += 1
+            self._start_locked(tenant, self._run_consolidation)
+            return True
+        return False
+
+    def _start_locked(self, tenant: MemoryTenant, run: Any, *args: Any) -> None:
+        tenant.busy = True
+        self._in_flight += 1
+        self._executor.submit(run, tenant, *args)
+
+    def _run_extraction(self, tenant: MemoryTenant, batch: list[ExtractionJob]) -> None:
+        should_consolidate = False
+        try:
+            prompt = build_extraction_prompt(batch)
+            before = stat_memory_files(tenant.memory_root)
+            deps = MemoryDeps(memory_root=tenant.memory_root)
+            self.extract_agent.run_sync(prompt, deps=deps)
+            should_consolidate = settle_extraction_writes(
+                tenant.memory_root,
+                before=before,
+                journal=deps.touched_paths,
+            )
+        except Exception:
+            # Extraction is best-effort, as in the async session.
+            pass
+        finally:
+            with self._lock:
+                self.stats.extraction_batches_run += 1
+                self.stats.extraction_jobs_run += len(batch)
+                if should_consolidate:
+                    self._request_consolidation_locked(tenant)
+                self._finish_locked(tenant)
+
+    def _run_consolidation(self, tenant: MemoryTenant) -> None:
+        try:
+            preconsolidation, prompt = prepare_consolidation(tenant.memory_root)
+            if prompt is None:
+                summary = preconsolidation.format_summary()
+            else:
+                result = self.consolidate_agent.run_sync(prompt, deps=MemoryDeps(memory_root=tenant.memory_root))
+                apply_post_consolidation_hygiene(tenant.memory_root)
+                summary = f"{preconsolidation.format_summary()}\n{result.output}"
+            mark_consolidated(tenant.memory_root)
+            tenant.last_consolidation_summary = summary
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self.stats.consolidations_run += 1
+                self._consolidations_in_flight -= 1
+                self._finish_locked(tenant)
+
+    def _finish_locked(self, tenant: MemoryTenant) -> None:
+        tenant.busy = False
+        self._in_flight -= 1
+        self._dispatch_locked()
+        self._evict_locked()
+        self._idle.notify_all()
+
+    def _arm_timer_locked(self) -> None:
+        # One timer for the whole service, aimed at the earliest moment an
+        # idle root's oldest pending turn reaches the latency bound.
+        self._cancel_timer_locked()
+        if self._closed or self._in_flight >= self._max_workers:
+            return
+        now = time.monotonic()
+        waits = [
+            wait
+            for memory_root in self._extraction_queue
+            if not self._tenants[memory_root].busy
+            and (wait := self._tenants[memory_root].batcher.seconds_until_due(now=now)) is not None
+        ]
+        if not waits:
+            return
+        delay = min(waits)
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch_locked()
+
+    def _cancel_timer_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _evict_locked(self) -> None:
+        # Least recently used idle roots give up their in-process caches once
+        # the service holds too many roots or too many cached headers. Their
+        # on-disk caches remain, so a returning root rebuilds cheaply.
+        if len(self._tenants) <= self._max_resident_roots and self._cached_headers <= self._max_cached_headers:
+            return
+        for memory_root, tenant in list(self._tenants.items()):
+            if len(self._tenants) <= self._max_resident_roots and self._cached_headers <= self._max_cached_headers:
+                break
+            if not tenant.idle:
+                continue
+            del self._tenants[memory_root]
+            self._cached_headers -= tenant.cached_headers
+            tenant.header_cache.clear()
+            evict_search_index(memory_root)
+            evict_topic_catalog(memory_root)
+            evict_selection_cache(memory_root)
+            self.stats.tenants_evicted += 1
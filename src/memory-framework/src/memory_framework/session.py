@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from pathlib import Path
+from typing import Any
+
+from .agents import build_consolidate_agent, build_extract_agent, build_main_agent
+from .caps import truncate_entrypoint_content
+from .consolidation_runner import prepare_consolidation
+from .deps import MemoryDeps
+from .extraction_runner import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_LATENCY_SECONDS,
+    ExtractionBatcher,
+    ExtractionJob,
+    build_extraction_prompt,
+)
+from .memory_embeddings import MemoryEmbeddingIndex
+from .memory_maintenance import (
+    apply_post_consolidation_hygiene,
+    mark_consolidated,
+    settle_extraction_writes,
+)
+from .memory_scan import MemoryHeader, MemoryHeaderCache
+from .memory_select import MemorySelector, PreselectionStats
+from .memory_surface import DEFAULT_SURFACE_TOKEN_BUDGET, surface_selected_memories
+from .selection_cache import shared_selection_cache
+from .store import read_index, stat_memory_files
+
+DEFAULT_SPECULATE_AFTER_SECONDS = 0.5
+
+
+class AsyncMemorySession:
+    def __init__(
+        self,
+        *,
+        memory_root: Path,
+        model: str,
+        embedding_index: MemoryEmbeddingIndex | None = None,
+        selection_stats: PreselectionStats | None = None,
+        speculate_after_seconds: float | None = DEFAULT_SPECULATE_AFTER_SECONDS,
+        extraction_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        extraction_max_latency: float = DEFAULT_MAX_LATENCY_SECONDS,
+        surface_token_budget: int = DEFAULT_SURFACE_TOKEN_BUDGET,
+    ) -> None:
+        self.memory_root = memory_root
+        self.model = model
+        self.surface_token_budget = surface_token_budget
+        self.selector = MemorySelector(
+            model,
+            embedding_index=embedding_index,
+            stats=selection_stats,
+            cache=shared_selection_cache(memory_root),
+        )
+        self.selection_stats = self.selector.stats
+        self.header_cache = MemoryHeaderCache(memory_root)
+        self.speculate_after_seconds = speculate_after_seconds
+        self.main_agent = build_main_agent(model)
+        self.extract_agent = build_extract_agent(model)
+        self.consolidate_agent = build_consolidate_agent(model)
+        self.message_history: list[Any] = []
+        self.already_surfaced: set[str] = set()
+        self.turn_number = 0
+        self.speculative_starts = 0
+        self.speculative_kept = 0
+        self.extraction_batches_run = 0
+        self.extraction_jobs_run = 0
+        self.last_consolidation_summary: str | None = None
+        self._maintenance_lock = asyncio.Lock()
+        self._batcher = ExtractionBatcher(
+            max_batch_size=extraction_batch_size,
+            max_latency_seconds=extraction_max_latency,
+        )
+        self._job_arrived = asyncio.Event()
+        self._flushing = False
+        self._extraction_task: asyncio.Task[None] | None = None
+        self._consolidation_task: asyncio.Task[None] | None = None
+        self._consolidation_requested = False
+        self._closed = False
+
+    async def __aenter__(self) -> AsyncMemorySession:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def run_turn(self, user_text: str) -> str:
+        if self._closed:
+            raise RuntimeError("This memory session is closed.")
+        # The index snippet and header scan load in threads while selection,
+        # which only needs the headers, starts as soon as they are ready.
+        index_task = asyncio.create_task(asyncio.to_thread(self._read_index_snippet))
+        selection_task = asyncio.create_task(self._select(user_text))
+        speculative: asyncio.Task[Any] | None = None
+        try:
+            speculate = self.speculate_after_seconds is not None
+            if speculate:
+                await asyncio.wait({selection_task}, timeout=self.speculate_after_seconds)
+            index_snippet = await index_task
+            if speculate and not selection_task.done():
+                # Selection is slow, so answer from the index alone in the
+                # meantime. The answer is kept only if selection surfaces nothing,
+                # in which case the prompt would have been identical anyway.
+                self.speculative_starts += 1
+                speculative = asyncio.create_task(self._run_main(user_text, index_snippet, [], None))
+            selected, relevance = await selection_task
+            if speculative is not None and not selected:
+                self.speculative_kept += 1
+                result = await speculative
+            else:
+                if speculative is not None:
+                    speculative.cancel()
+                result = await self._run_main(user_text, index_snippet, selected, relevance)
+        finally:
+            for task in (index_task, selection_task, speculative):
+                if task is not None and not task.done():
+                    task.cancel()
+
+        self.already_surfaced.update(header.filename for header in selected)
+        self.message_history.extend(result.new_messages())
+        self.turn_number += 1
+        self._submit_extraction(
+            ExtractionJob(
+                turn_number=self.turn_number,
+                user_text=user_text,
+                assistant_text=result.output,
+                memory_root=self.memory_root,
+            ),
+        )
+        return result.output
+
+    async def drain(self) -> None:
+        self._flushing = True
+        self._job_arrived.set()
+        try:
+            while True:
+                tasks = [
+                    task
+                    for task in (self._extraction_task, self._consolidation_task)
+                    if task is not None and not task.done()
+                ]
+                if not tasks:
+                    break
+                await asyncio.gather(*tasks)
+        finally:
+            self._flushing = False
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self.drain()
+
+    def _read_index_snippet(self) -> str:
+        return truncate_entrypoint_content(read_index(self.memory_root)).content
+
+    async def _select(self, user_text: str) -> tuple[list[MemoryHeader], dict[str, float] | None]:
+        headers = await asyncio.to_thread(self.header_cache.scan)
+        return await self.selector.aselect_scored(
+            query=user_text,
+            headers=headers,
+            already_surfaced=self.already_surfaced,
+        )
+
+    async def _run_main(
+        self,
+        user_text: str,
+        index_snippet: str,
+        selected: list[MemoryHeader],
+        relevance: dict[str, float] | None,
+    ) -> Any:
+        selected_memories_text = await asyncio.to_thread(
+            surface_selected_memories,
+            selected,
+            token_budget=self.surface_token_budget,
+            relevance=relevance,
+        )
+        return await self.main_agent.run(
+            user_text,
+            message_history=self.message_history,
+            deps=MemoryDeps(
+                memory_root=self.memory_root,
+                index_snippet=index_snippet,
+                selected_memories_text=selected_memories_text,
+            ),
+        )
+
+    def _submit_extraction(self, job: ExtractionJob) -> None:
+        loop = asyncio.get_running_loop()
+        self._batcher.add(job, now=loop.time())
+        self._job_arrived.set()
+        if self._extraction_task is None or self._extraction_task.done():
+            self._extraction_task = asyncio.create_task(self._extraction_loop())
+
+    async def _extraction_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._batcher.pending:
+            batch = self._batcher.take_batch(now=loop.time(), force=self._flushing)
+            if not batch:
+                self._job_arrived.clear()
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(
+                        self._job_arrived.wait(),
+                        timeout=self._batcher.seconds_until_due(now=loop.time()),
+                    )
+                continue
+            # Extraction is best-effort, as in MemoryService.
+            with contextlib.suppress(Exception):
+                await self._extract(batch)
+            self.extraction_batches_run += 1
+            self.extraction_jobs_run += len(batch)
+
+    async def _extract(self, jobs: list[ExtractionJob]) -> None:
+        prompt = await asyncio.to_thread(build_extraction_prompt, jobs)
+        async with self._maintenance_lock:
+            before = await asyncio.to_thread(stat_memory_files, self.memory_root)
+            deps = MemoryDeps(memory_root=self.memory_root)
+            await self.extract_agent.run(prompt, deps=deps)
+            should_schedule = await asyncio.to_thread(
+                settle_extraction_writes,
+                self.memory_root,
+                before=before,
+                journal=deps.touched_paths,
+            )
+        if should_schedule:
+            self._schedule_consolidation()
+
+    def _schedule_consolidation(self) -> None:
+        if self._consolidation_task is not None and not self._consolidation_task.done():
+            # Requests that arrive mid-pass collapse into one follow-up pass.
+            self._consolidation_requested = True
+            return
+        self._consolidation_task = asyncio.create_task(self._consolidation_loop())
+
+    async def _consolidation_loop(self) -> None:
+        while True:
+            self._consolidation_requested = False
+            with contextlib.suppress(Exception):
+                self.last_consolidation_summary = await self._consolidate()
+            if not self._consolidation_requested:
+                return
+
+    async def _consolidate(self) -> str:
+        async with self._maintenance_lock:
+            preconsolidation, prompt = await asyncio.to_thread(prepare_consolidation, self.memory_root)
+            if prompt is None:
+                # Nothing left that needs judgment, so the agent is not started.
+                await asyncio.to_thread(mark_consolidated, self.memory_root)
+                return preconsolidation.format_summary()
+            result = await self.consolidate_agent.run(prompt, deps=MemoryDeps(memory_root=self.memory_root))
+            await asyncio.to_thread(apply_post_consolidation_hygiene, self.memory_root)
+            await asyncio.to_thread(mark_consolidated, self.memory_root)
+        return f"{preconsolidation.format_summary()}\n{result.output}"
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import Iterator, Mapping
+import os
 from pathlib import Path
 import re
 
+from .frontmatter import read_frontmatter_block
 from .memory_maintenance import STATE_FILENAME
 
 
@@ -45,6 +48,30 @@ def iter_memory_files(memory_root: Path) -> list[Path]:
     )
 
 
+def walk_memory_files(memory_root: Path) -> Iterator[tuple[str, Path, os.stat_result]]:
+    # Yields (relative posix path, path, stat) with one scandir per directory,
+    # skipping the same framework-internal paths as iter_memory_files.
+    pending = [("", os.fspath(memory_root))]
+    while pending:
+        prefix, directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            relative = prefix + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                pending.append((relative + "/", entry.path))
+            elif entry.name != STATE_FILENAME:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield relative, Path(entry.path), stat
+
+
 def is_internal_file(path: Path, memory_root: Path) -> bool:
     try:
         relative = path.relative_to(memory_root)
@@ -60,12 +87,12 @@ def read_index(memory_root: Path) -> str:
     return index_path.read_text(encoding="utf-8")
 
 
-def snapshot_memory_files(memory_root: Path) -> dict[str, str]:
-    snapshot: dict[str, str] = {}
-    for path in iter_memory_files(memory_root):
-        relative = path.relative_to(memory_root).as_posix()
-        snapshot[relative] = path.read_text(encoding="utf-8")
-    return snapshot
+def stat_memory_files(memory_root: Path) -> dict[str, tuple[int, int]]:
+    return {
+        relative: (stat.st_mtime_ns, stat.st_size)
+        for relative, _, stat in walk_memory_files(memory_root)
+        if relative.rpartition("/")[2] != ".gitkeep"
+    }
 
 
 def format_memory_manifest(memory_root: Path) -> str:
@@ -87,12 +114,12 @@ def format_memory_manifest(memory_root: Path) -> str:
 
 
 def extract_frontmatter_description(path: Path) -> str:
-    text = path.read_text(encoding="utf-8")
+    text = read_frontmatter_block(path)
     match = re.search(r"^description:\s*(.+)$", text, flags=re.MULTILINE)
     return match.group(1).strip() if match else ""
 
 
-def diff_touched_paths(before: dict[str, str], after: dict[str, str]) -> list[str]:
+def diff_touched_paths(before: Mapping[str, object], after: Mapping[str, object]) -> list[str]:
     touched: list[str] = []
     for path in sorted(set(before) | set(after)):
         if before.get(path) != after.get(path):
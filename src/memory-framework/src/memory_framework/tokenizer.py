@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import math
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional exact token counting
+    tiktoken = None
+
+
+TOKENIZER_ENCODING = "o200k_base"
+APPROX_BYTES_PER_TOKEN = 4
+
+_encoding_lock = threading.Lock()
+_encoding: object | None = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _shared_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Without tiktoken, a byte-length estimate errs slightly high for English
+    # prose, which keeps budgeted prompts under their limit.
+    return math.ceil(len(text.encode("utf-8")) / APPROX_BYTES_PER_TOKEN)
+
+
+def tokenizer_name() -> str:
+    return TOKENIZER_ENCODING if _shared_encoding() is not None else f"~{APPROX_BYTES_PER_TOKEN} bytes per token"
+
+
+def _shared_encoding() -> object | None:
+    # One encoding object for the process; loading it can fetch the BPE file,
+    # so a failure falls back to the estimate instead of failing the turn.
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            if tiktoken is not None:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception:
+                    _encoding = None
+            _encoding_loaded = True
+    return _encoding